@@ -12,7 +12,7 @@ kwargs = {'author': '',
                  'Topic :: Scientific/Engineering'],
  'description': '',
  'download_url': '',
- 'entry_points': '[openmdao.component]\nnreltraining2013.nreltraining2013.BEMPerf=nreltraining2013.nreltraining2013:BEMPerf\nnreltraining2013.nreltraining2013.ActuatorDisk=nreltraining2013.nreltraining2013:ActuatorDisk\nnreltraining2013.nreltraining2013.BEM=nreltraining2013.nreltraining2013:BEM\nnreltraining2013.nreltraining2013.BladeElement=nreltraining2013.nreltraining2013:BladeElement\nnreltraining2013.nreltraining2013.AutoBEM=nreltraining2013.nreltraining2013:AutoBEM\n\n[openmdao.container]\nnreltraining2013.nreltraining2013.BEMPerfData=nreltraining2013.nreltraining2013:BEMPerfData\nnreltraining2013.nreltraining2013.BEMPerf=nreltraining2013.nreltraining2013:BEMPerf\nnreltraining2013.nreltraining2013.ActuatorDisk=nreltraining2013.nreltraining2013:ActuatorDisk\nnreltraining2013.nreltraining2013.FlowConditions=nreltraining2013.nreltraining2013:FlowConditions\nnreltraining2013.nreltraining2013.BladeElement=nreltraining2013.nreltraining2013:BladeElement\nnreltraining2013.nreltraining2013.AutoBEM=nreltraining2013.nreltraining2013:AutoBEM\nnreltraining2013.nreltraining2013.BEM=nreltraining2013.nreltraining2013:BEM',
+ 'entry_points': '[openmdao.component]\nnreltraining2013.nreltraining2013.BEMPerf=nreltraining2013.nreltraining2013:BEMPerf\nnreltraining2013.nreltraining2013.ActuatorDisk=nreltraining2013.nreltraining2013:ActuatorDisk\nnreltraining2013.nreltraining2013.BEM=nreltraining2013.nreltraining2013:BEM\nnreltraining2013.nreltraining2013.BladeElement=nreltraining2013.nreltraining2013:BladeElement\nnreltraining2013.nreltraining2013.BladeElementArray=nreltraining2013.nreltraining2013:BladeElementArray\nnreltraining2013.nreltraining2013.AutoBEM=nreltraining2013.nreltraining2013:AutoBEM\nnreltraining2013.power_curve.PowerCurve=nreltraining2013.power_curve:PowerCurve\nnreltraining2013.surrogate.SurrogateBEM=nreltraining2013.surrogate:SurrogateBEM\n\n[openmdao.container]\nnreltraining2013.nreltraining2013.BEMPerfData=nreltraining2013.nreltraining2013:BEMPerfData\nnreltraining2013.nreltraining2013.BEMPerf=nreltraining2013.nreltraining2013:BEMPerf\nnreltraining2013.nreltraining2013.ActuatorDisk=nreltraining2013.nreltraining2013:ActuatorDisk\nnreltraining2013.nreltraining2013.FlowConditions=nreltraining2013.nreltraining2013:FlowConditions\nnreltraining2013.nreltraining2013.BladeElement=nreltraining2013.nreltraining2013:BladeElement\nnreltraining2013.nreltraining2013.BladeElementArray=nreltraining2013.nreltraining2013:BladeElementArray\nnreltraining2013.nreltraining2013.AutoBEM=nreltraining2013.nreltraining2013:AutoBEM\nnreltraining2013.power_curve.PowerCurve=nreltraining2013.power_curve:PowerCurve\nnreltraining2013.surrogate.SurrogateBEM=nreltraining2013.surrogate:SurrogateBEM\nnreltraining2013.nreltraining2013.BEM=nreltraining2013.nreltraining2013:BEM',
  'include_package_data': True,
  'install_requires': ['openmdao.main'],
  'keywords': ['openmdao'],
@@ -20,7 +20,7 @@ kwargs = {'author': '',
  'maintainer': '',
  'maintainer_email': '',
  'name': 'nreltraining2013',
- 'package_data': {'nreltraining2013': []},
+ 'package_data': {'nreltraining2013': ['polars/*.dat']},
  'package_dir': {'': 'src'},
  'packages': ['nreltraining2013'],
  'url': '',
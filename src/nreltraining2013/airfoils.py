@@ -0,0 +1,180 @@
+"""Airfoil polar tables, loaded once per process and shared by every blade element.
+
+Polars are looked up by name. The first request for a name loads
+``polars/<name>.dat`` from this package unless a polar has already been
+registered under that name with register_polar. A polar file has one row per
+angle of attack with the columns alpha (deg), C_L and C_D. A nan marks an
+angle where that coefficient has no table point, and a ``# fill_value: x``
+comment sets the value used outside of the tables.
+"""
+
+__all__ = ['Polar', 'SpanwisePolar', 'load_polar', 'register_polar', 'get_polar', 'DEFAULT_AIRFOIL']
+
+import os
+from math import pi
+
+import numpy as np
+
+from .cache import make_key
+
+DEFAULT_AIRFOIL = 'naca0012'
+
+POLAR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'polars')
+
+_registry = {}
+
+
+def _read_only(values):
+    values = np.array(values, dtype=float)
+    values.flags.writeable = False
+    return values
+
+
+class Polar(object):
+    """Lift and drag tables for a single airfoil, linearly interpolated in the
+    angle of attack (rad). Outside of its table each coefficient is fill_value."""
+
+    def __init__(self, cl_alpha, cl, cd_alpha, cd, fill_value=0.001, name=''):
+        self.name = name
+        self.fill_value = fill_value
+
+        self.cl_alpha = _read_only(cl_alpha)
+        self.cl = _read_only(cl)
+        self.cd_alpha = _read_only(cd_alpha)
+        self.cd = _read_only(cd)
+        for alphas, values in ((self.cl_alpha, self.cl), (self.cd_alpha, self.cd)):
+            if alphas.shape != values.shape or alphas.size < 2 or (np.diff(alphas) <= 0).any():
+                raise ValueError("polar '%s' needs at least two points per coefficient "
+                                 "at increasing angles of attack" % name)
+
+        #hash of the tables, so results cached for one polar are never reused for another
+        self.key = make_key('polar', self.cl_alpha, self.cl, self.cd_alpha, self.cd, self.fill_value)
+
+        #slope of each table segment, padded with the zero slopes outside of the table
+        self._cl_slopes = _read_only(np.hstack((0., np.diff(self.cl)/np.diff(self.cl_alpha), 0.)))
+        self._cd_slopes = _read_only(np.hstack((0., np.diff(self.cd)/np.diff(self.cd_alpha), 0.)))
+
+    def lookup(self, alpha, r=None):
+        """Returns (C_D, C_L) for an array of angles of attack, one
+        interpolation pass per coefficient. r is accepted for compatibility
+        with SpanwisePolar and ignored.
+
+        There is no out argument: np.interp allocates nothing but the array
+        it returns, while evaluating the table segments in place would still
+        allocate the searchsorted indices and a scratch array on every call."""
+        fill = self.fill_value
+        return (np.interp(alpha, self.cd_alpha, self.cd, left=fill, right=fill),
+                np.interp(alpha, self.cl_alpha, self.cl, left=fill, right=fill))
+
+    def slopes(self, alpha, r=None):
+        """Returns (dC_D/dalpha, dC_L/dalpha) for an array of angles of attack"""
+        return (self._cd_slopes[np.searchsorted(self.cd_alpha, alpha, side='right')],
+                self._cl_slopes[np.searchsorted(self.cl_alpha, alpha, side='right')])
+
+    def span_slopes(self, alpha, r=None):
+        """Returns (dC_D/dr, dC_L/dr), always zero for a single airfoil"""
+        zeros = np.zeros(np.shape(alpha))
+        return zeros, zeros
+
+
+class SpanwisePolar(object):
+    """Polars given at a set of radii along the blade. Between two radii the
+    coefficients are blended linearly, inboard of the first radius and
+    outboard of the last the nearest polar is used.
+
+    radii: increasing radii (m) where each polar applies
+    polars: a Polar, or the name of a registered polar, for each radius
+    """
+
+    def __init__(self, radii, polars, name=''):
+        self.name = name
+        self.radii = _read_only(radii)
+        self.polars = [get_polar(polar) for polar in polars]
+        if self.radii.size != len(self.polars) or self.radii.size < 2 or (np.diff(self.radii) <= 0).any():
+            raise ValueError("spanwise polar '%s' needs one polar for each of at least two "
+                             "increasing radii" % name)
+        self.key = make_key('spanwise', self.radii, *[polar.key for polar in self.polars])
+
+    def _weights(self, r, derivative=False):
+        """Weight of every polar at each radius in r, or the derivative of
+        the weights with respect to r"""
+        last = self.radii.size-1
+        i = np.clip(np.searchsorted(self.radii, r, side='right')-1, 0, last-1)
+        width = self.radii[i+1]-self.radii[i]
+        w = np.clip((r-self.radii[i])/width, 0., 1.)
+        if derivative:
+            #the blend is flat outside of the first and last radius
+            dw = np.where((r > self.radii[0]) & (r < self.radii[-1]), 1./width, 0.)
+            return [np.where(i == k, -dw, 0.) + np.where(i == k-1, dw, 0.) for k in range(last+1)]
+        return [np.where(i == k, 1-w, 0.) + np.where(i == k-1, w, 0.) for k in range(last+1)]
+
+    def _blend(self, method, alpha, r, derivative=False):
+        if r is None:
+            raise ValueError("spanwise polar '%s' needs the radius of each station" % self.name)
+        alpha, r = np.broadcast_arrays(alpha, r)
+        C_D = np.zeros(alpha.shape)
+        C_L = np.zeros(alpha.shape)
+        for polar, weight in zip(self.polars, self._weights(r, derivative)):
+            if weight.any():
+                #the coefficients are new arrays, weighted in place
+                cd, cl = getattr(polar, method)(alpha)
+                cd *= weight
+                cl *= weight
+                C_D += cd
+                C_L += cl
+        return C_D, C_L
+
+    def lookup(self, alpha, r=None):
+        """Returns (C_D, C_L) for arrays of angles of attack and station radii"""
+        return self._blend('lookup', alpha, r)
+
+    def slopes(self, alpha, r=None):
+        """Returns (dC_D/dalpha, dC_L/dalpha) for arrays of angles of attack and station radii"""
+        return self._blend('slopes', alpha, r)
+
+    def span_slopes(self, alpha, r=None):
+        """Returns (dC_D/dr, dC_L/dr) for arrays of angles of attack and station radii"""
+        return self._blend('lookup', alpha, r, derivative=True)
+
+
+def load_polar(path, name=None):
+    """Reads a Polar from a file in the format described at the top of this module"""
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+
+    fill_value = 0.001
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#') and line[1:].strip().startswith('fill_value:'):
+                fill_value = float(line.split(':', 1)[1])
+
+    table = np.loadtxt(path, comments='#', ndmin=2)
+    if table.shape[1] != 3:
+        raise ValueError("polar file '%s' must have three columns: alpha (deg), C_L, C_D" % path)
+    alpha = table[:, 0]*pi/180
+    has_cl = ~np.isnan(table[:, 1])
+    has_cd = ~np.isnan(table[:, 2])
+
+    return Polar(alpha[has_cl], table[has_cl, 1], alpha[has_cd], table[has_cd, 2],
+                 fill_value=fill_value, name=name)
+
+
+def register_polar(name, polar):
+    """Makes polar (a Polar or SpanwisePolar) available to get_polar under name"""
+    _registry[name] = polar
+    return polar
+
+
+def get_polar(name):
+    """Returns the polar registered under name, loading it from the package
+    polar directory on first use. Polar objects are passed straight through."""
+    if not isinstance(name, basestring):
+        return name
+    try:
+        return _registry[name]
+    except KeyError:
+        path = os.path.join(POLAR_DIR, name+'.dat')
+        if not os.path.exists(path):
+            raise ValueError("no polar named '%s' is registered or found in %s" % (name, POLAR_DIR))
+        return register_polar(name, load_polar(path, name))
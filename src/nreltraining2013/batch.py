@@ -0,0 +1,64 @@
+"""Vectorized evaluation of many AutoBEM designs in a single pass"""
+
+__all__ = ['DESIGN_VARS', 'PERF_VARS', 'evaluate_designs']
+
+from math import pi
+
+import numpy as np
+
+from .kernel import element_performance, rotor_performance, span_fractions
+from .airfoils import DEFAULT_AIRFOIL
+
+#column order of the design arrays passed to evaluate_designs
+DESIGN_VARS = ('chord_hub', 'chord_tip', 'twist_hub', 'twist_tip', 'rpm', 'r_tip', 'pitch', 'V')
+
+#BEMPerfData variables returned for each design
+PERF_VARS = ('Cp', 'Ct', 'net_thrust', 'net_power', 'J', 'tip_speed_ratio')
+
+
+def evaluate_designs(designs, n_elements=6, r_hub=0.2, B=3, rho=1.225, airfoil=DEFAULT_AIRFOIL, chunk_size=2048,
+                     spacing='linear', quadrature='trapz'):
+    """Evaluate the performance of a whole set of rotor designs at once.
+
+    designs: 2-D array with one design per row and the columns ordered as in
+             DESIGN_VARS (chord_hub, chord_tip, twist_hub, twist_tip, rpm,
+             r_tip, pitch, V). Lengths are in m, angles in deg, rpm in
+             min**-1 and V in m/s, the same units AutoBEM uses.
+
+    The remaining arguments match the AutoBEM inputs that are usually held
+    fixed during a DOE. Stations are distributed along the span exactly as in
+    AutoBEM, and every station of every design is solved in the same
+    vectorized call, chunk_size designs at a time.
+
+    Returns a dict of 1-D arrays keyed by the names in PERF_VARS, in the same
+    order as the rows of designs, plus a boolean 'converged' array that is
+    False for any design where some station has no solution.
+    """
+    designs = np.atleast_2d(np.asarray(designs, dtype=float))
+    if designs.ndim != 2 or designs.shape[1] != len(DESIGN_VARS):
+        raise ValueError("designs must be a 2-D array with %d columns %s, got shape %s" %
+                         (len(DESIGN_VARS), DESIGN_VARS, designs.shape))
+
+    results = dict((name, np.empty(designs.shape[0])) for name in PERF_VARS)
+    results['converged'] = np.empty(designs.shape[0], dtype=bool)
+
+    #fractional position of each station along the span
+    span = span_fractions(n_elements, spacing)
+
+    for start in range(0, designs.shape[0], chunk_size):
+        chunk = designs[start:start+chunk_size]
+        chord_hub, chord_tip, twist_hub, twist_tip, rpm, r_tip, pitch, V = [col[:, np.newaxis] for col in chunk.T]
+
+        r = r_hub + (r_tip-r_hub)*span
+        chord = chord_hub + (chord_tip-chord_hub)*span
+        twist = (twist_hub + (twist_tip-twist_hub)*span + pitch)*pi/180
+        dr = (r_tip-r_hub)/(n_elements-1.)
+
+        elements = element_performance(r, dr, chord, twist, rpm, B, rho, V, airfoil)
+        perf = rotor_performance(elements['delta_Ct'], elements['delta_Cp'], elements['lambda_r'],
+                                 r_tip[:, 0], rpm[:, 0], rho, V[:, 0], quadrature)
+        for name in PERF_VARS:
+            results[name][start:start+chunk_size] = perf[name]
+        results['converged'][start:start+chunk_size] = elements['converged'].all(axis=-1)
+
+    return results
@@ -0,0 +1,539 @@
+"""Timing studies for the rotor models.
+
+Run the whole suite with ``python -m nreltraining2013.benchmarks``. Use
+``--output results.json`` to save the metrics and ``--compare
+baseline.json`` to flag any metric that got worse than a stored run by more
+than ``--tolerance``. ``--help`` lists the other options.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from math import pi
+
+import numpy as np
+
+from .nreltraining2013 import AutoBEM, BladeElement, BEMPerf
+from .kernel import solve_element, element_loads, rotor_performance
+
+
+def _random_elements(n, seed=0):
+    """Inputs for n blade elements spread over the range the DOE and optimizer tests explore"""
+    rand = np.random.RandomState(seed)
+    return [dict(rpm=rand.uniform(60, 150), r=rand.uniform(.2, 5), chord=rand.uniform(.1, 1),
+                 twist=rand.uniform(-5, 30)*pi/180, V_inf=rand.uniform(5, 12)) for i in range(n)]
+
+
+def bench_inflow_solvers(n_elements=300, seed=0):
+    """Residual evaluations and wall time for each BladeElement solver.
+
+    Returns a dict keyed by solver name with the mean and max residual
+    evaluations per element, the number of unconverged elements, and the
+    mean time per BladeElement.execute in seconds.
+    """
+    cases = _random_elements(n_elements, seed)
+    element = BladeElement()
+
+    results = {}
+    for solver in ('fsolve', 'bracket'):
+        element.solver = solver
+        n_iter = []
+        n_failed = 0
+        start = time.time()
+        for inputs in cases:
+            for name, value in inputs.iteritems():
+                setattr(element, name, value)
+            element.execute()
+            n_iter.append(element.n_iter)
+            n_failed += not element.converged
+        elapsed = time.time()-start
+
+        results[solver] = dict(mean_n_iter=np.mean(n_iter), max_n_iter=max(n_iter),
+                               n_unconverged=n_failed, time=elapsed/n_elements)
+    return results
+
+
+def bench_slsqp_gradients():
+    """Cost of the SLSQP optimization from test_AutoBEM_Opt with finite
+    difference gradients and with the analytic derivatives.
+
+    Returns a dict keyed by 'fd' and 'analytic' with the number of times the
+    AutoBEM assembly and each of its BladeElements ran, the optimum Cp and the
+    wall time.
+    """
+    from openmdao.main.api import Assembly, set_as_top
+    from openmdao.lib.drivers.api import SLSQPdriver
+
+    results = {}
+    for mode in ('fd', 'analytic'):
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.add('driver', SLSQPdriver())
+        top.driver.workflow.add('b')
+        top.driver.add_parameter('b.chord_hub', low=.1, high=2)
+        top.driver.add_parameter('b.chord_tip', low=.1, high=2)
+        top.driver.add_parameter('b.rpm', low=20, high=300)
+        top.driver.add_parameter('b.twist_hub', low=-5, high=50)
+        top.driver.add_parameter('b.twist_tip', low=-5, high=50)
+        top.driver.add_objective('-b.data.Cp')
+        top.driver.gradient_options.force_fd = mode == 'fd'
+
+        start = time.time()
+        top.run()
+        elapsed = time.time()-start
+
+        results[mode] = dict(model_runs=top.b.exec_count, element_runs=top.b.BE0.exec_count,
+                             Cp=top.b.data.Cp, time=elapsed)
+    return results
+
+
+def _count_residuals(rotor):
+    """Wraps the execute of every blade element in rotor so that the
+    residual evaluations they use are added up in the returned list"""
+    total = [0]
+    for name in rotor._elements:
+        element = getattr(rotor, name)
+
+        def execute(element=element, execute=element.execute):
+            execute()
+            total[0] += np.sum(element.n_iter)
+        element.execute = execute
+    return total
+
+
+def bench_warm_start(gradients=('fd', 'analytic')):
+    """Residual evaluations spent by the blade elements over the SLSQP
+    optimization from test_AutoBEM_Opt, with and without warm_start.
+
+    Returns a dict keyed by (solver, gradient, warm_start) with the residual
+    evaluations, the number of AutoBEM runs, the optimum Cp and the wall time.
+    """
+    from openmdao.main.api import Assembly, set_as_top
+    from openmdao.lib.drivers.api import SLSQPdriver
+
+    results = {}
+    for solver in ('fsolve', 'bracket'):
+        for mode in gradients:
+            for warm_start in (False, True):
+                top = set_as_top(Assembly())
+                top.add('b', AutoBEM())
+                top.add('driver', SLSQPdriver())
+                top.driver.workflow.add('b')
+                top.driver.add_parameter('b.chord_hub', low=.1, high=2)
+                top.driver.add_parameter('b.chord_tip', low=.1, high=2)
+                top.driver.add_parameter('b.rpm', low=20, high=300)
+                top.driver.add_parameter('b.twist_hub', low=-5, high=50)
+                top.driver.add_parameter('b.twist_tip', low=-5, high=50)
+                top.driver.add_objective('-b.data.Cp')
+                top.driver.gradient_options.force_fd = mode == 'fd'
+
+                top.b.warm_start = warm_start
+                for name in top.b._elements:
+                    getattr(top.b, name).solver = solver
+                total = _count_residuals(top.b)
+
+                start = time.time()
+                top.run()
+                elapsed = time.time()-start
+
+                results[solver, mode, warm_start] = dict(n_iter=total[0], model_runs=top.b.exec_count,
+                                                         Cp=top.b.data.Cp, time=elapsed)
+    return results
+
+
+def bench_parallel_doe(max_workers=None, levels=3, chunk_size=8):
+    """Wall time of the FullFactorial DOE from test_AutoBEM_DOE run through
+    parallel.run_cases with 1 up to max_workers processes (all cores by default).
+
+    Returns a list of (n_workers, time, speedup) tuples.
+    """
+    import multiprocessing
+    from openmdao.lib.doegenerators.api import FullFactorial
+    from .parallel import autobem_top, doe_cases, run_cases
+
+    parameters = [('b.chord_hub', .1, 2), ('b.chord_tip', .1, 2), ('b.rpm', 20, 300),
+                  ('b.twist_hub', -5, 50), ('b.twist_tip', -5, 50)]
+    names = [name for name, low, high in parameters]
+    bounds = [(low, high) for name, low, high in parameters]
+    outputs = ['b.data.tip_speed_ratio', 'b.data.Cp', 'b.data.Ct']
+
+    results = []
+    for n_workers in range(1, (max_workers or multiprocessing.cpu_count())+1):
+        start = time.time()
+        run_cases(autobem_top, names, doe_cases(FullFactorial(levels), bounds), outputs,
+                  n_workers=n_workers, chunk_size=chunk_size)
+        elapsed = time.time()-start
+        results.append((n_workers, elapsed, results[0][1]/elapsed if results else 1.))
+    return results
+
+
+def _best_time(func, repeat=3, number=1):
+    """Best mean time per call of func over repeat rounds of number calls"""
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        for j in range(number):
+            func()
+        elapsed = (time.time()-start)/number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _autobem_top(**kwargs):
+    from openmdao.main.api import Assembly, set_as_top
+    top = set_as_top(Assembly())
+    top.add('b', AutoBEM(**kwargs))
+    top.driver.workflow.add('b')
+    return top
+
+
+def bench_autobem_scaling(sizes=(6, 25, 100, 400), repeat=3):
+    """Construction and run time of AutoBEM as the number of elements grows.
+
+    Returns a dict keyed by (n_elements, vectorize) with the time to build
+    and set up the top assembly and the time of a single run, in seconds.
+    """
+    results = {}
+    for n in sizes:
+        for vectorize in (False, True):
+            tops = []
+
+            def build():
+                top = _autobem_top(n_elements=n, vectorize=vectorize)
+                top.run()
+                tops.append(top)
+            #the first run also checks the configuration, so it counts as construction
+            build_time = _best_time(build, repeat)
+            run_time = _best_time(tops[-1].run, repeat)
+            results[n, vectorize] = dict(build=build_time, run=run_time)
+    return results
+
+
+def _build_memory(args):
+    """Growth of the peak resident memory of this process while building
+    and running a single AutoBEM, in bytes"""
+    import resource
+    n, vectorize = args
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    top = _autobem_top(n_elements=n, vectorize=vectorize)
+    top.run()
+    #ru_maxrss is in kB on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss-before)*1024., len(top.b.list_connections())
+
+
+def bench_autobem_memory(sizes=(6, 25, 100, 400)):
+    """Memory used to build and run AutoBEM, and the number of connections
+    in it, as the number of elements grows.
+
+    Each rotor is built in a fresh process so the peak memory of earlier
+    builds does not hide it. Returns a dict keyed by (n_elements, vectorize)
+    with the memory in bytes and the connection count.
+    """
+    import multiprocessing
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        results = {}
+        for n in sizes:
+            for vectorize in (False, True):
+                memory, connections = pool.apply(_build_memory, ((n, vectorize),))
+                results[n, vectorize] = dict(memory=memory, connections=connections)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def bench_components(n_calls=200, sizes=(6, 100, 400)):
+    """Time per execute of a lone BladeElement, for each solver, and of
+    BEMPerf for several numbers of elements"""
+    results = {}
+    element = BladeElement()
+    for solver in ('fsolve', 'bracket'):
+        element.solver = solver
+        results['BladeElement', solver] = _best_time(element.execute, number=n_calls)
+
+    for n in sizes:
+        perf = BEMPerf(n=n)
+        perf.delta_Ct = np.linspace(.01, .03, n)
+        perf.delta_Cp = np.linspace(0., 1.2, n)
+        perf.lambda_r = np.linspace(.3, 8., n)
+        results['BEMPerf', n] = _best_time(perf.execute, number=n_calls)
+    return results
+
+
+_IMPORT_SCRIPT = """
+import time
+start = time.time()
+import %s
+print(time.time()-start)
+"""
+
+
+def bench_import_time(modules=('nreltraining2013.kernel', 'nreltraining2013.nreltraining2013'), repeat=3):
+    """Time to import each of modules in a fresh interpreter, the best of
+    repeat tries, in seconds"""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+
+    results = {}
+    for module in modules:
+        results[module] = min(float(subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT % module], env=env))
+                              for i in range(repeat))
+    return results
+
+
+def bench_kernel_overhead(n_calls=200, sizes=(6, 100)):
+    """Time per call of the kernel functions behind BladeElement and
+    BEMPerf, next to the time per execute of the components themselves.
+    Returns a dict keyed by component name (and solver or size) with the
+    kernel and component times in seconds."""
+    results = {}
+    element = BladeElement()
+    for solver in ('fsolve', 'bracket'):
+        element.solver = solver
+        element.execute()
+        args = (element.lambda_r, element.sigma, element.twist, element.r, element.airfoil)
+
+        def kernel():
+            solution = solve_element(*args, solver=solver)
+            element_loads(solution['a'], solution['b'], solution['phi'], solution['alpha'], element.r,
+                          element.dr, element.chord, element.rpm, element.B, element.rho, element.V_inf,
+                          element.airfoil)
+
+        results['BladeElement', solver] = dict(kernel=_best_time(kernel, number=n_calls),
+                                               component=_best_time(element.execute, number=n_calls))
+
+    for n in sizes:
+        perf = BEMPerf(n=n)
+        perf.delta_Ct = np.linspace(.01, .03, n)
+        perf.delta_Cp = np.linspace(0., 1.2, n)
+        perf.lambda_r = np.linspace(.3, 8., n)
+
+        def kernel():
+            rotor_performance(perf.delta_Ct, perf.delta_Cp, perf.lambda_r, perf.r, perf.rpm,
+                              perf.free_stream.rho, perf.free_stream.V, perf.quadrature)
+
+        results['BEMPerf', n] = dict(kernel=_best_time(kernel, number=n_calls),
+                                     component=_best_time(perf.execute, number=n_calls))
+    return results
+
+
+def bench_doe(levels=3):
+    """Cases per second of the serial DOEdriver run from test_AutoBEM_DOE"""
+    from openmdao.lib.drivers.doedriver import DOEdriver
+    from openmdao.lib.doegenerators.api import FullFactorial
+    from openmdao.lib.casehandlers.api import ListCaseRecorder
+
+    top = _autobem_top()
+    top.replace('driver', DOEdriver())
+    top.driver.DOEgenerator = FullFactorial(levels)
+    top.driver.recorders = [ListCaseRecorder()]
+    top.driver.case_outputs = ['b.data.tip_speed_ratio', 'b.data.Cp', 'b.data.Ct']
+    top.driver.add_parameter('b.chord_hub', low=.1, high=2)
+    top.driver.add_parameter('b.chord_tip', low=.1, high=2)
+    top.driver.add_parameter('b.rpm', low=20, high=300)
+    top.driver.add_parameter('b.twist_hub', low=-5, high=50)
+    top.driver.add_parameter('b.twist_tip', low=-5, high=50)
+
+    start = time.time()
+    top.run()
+    elapsed = time.time()-start
+    return len(top.driver.recorders[0])/elapsed
+
+
+def bench_performance_map(n_lookups=1000000, seed=0):
+    """Time to build a 61 x 41 PerformanceMap of the default AutoBEM, and
+    the rate of map lookups at random tip speed ratios and pitch angles"""
+    from .performance_map import build_performance_map
+
+    rotor = AutoBEM()
+    start = time.time()
+    performance_map = build_performance_map(rotor, np.linspace(2, 14, 61), np.linspace(-5, 15, 41))
+    build = time.time()-start
+
+    rand = np.random.RandomState(seed)
+    tsr = rand.uniform(2, 14, n_lookups)
+    pitch = rand.uniform(-5, 15, n_lookups)
+    lookup = _best_time(lambda: performance_map(tsr, pitch))
+    return dict(build=build, rate=n_lookups/lookup)
+
+
+#metrics for each benchmark in the suite, as (name, value, units, better) with better 'lower' or 'higher'
+def _metrics_autobem_scaling(quick):
+    results = bench_autobem_scaling((6, 25) if quick else (6, 25, 100, 400), repeat=1 if quick else 3)
+    for (n, vectorize), result in sorted(results.items()):
+        mode = 'vectorized' if vectorize else 'elements'
+        yield 'autobem.%s.n%d.build' % (mode, n), result['build'], 's', 'lower'
+        yield 'autobem.%s.n%d.run' % (mode, n), result['run'], 's', 'lower'
+
+
+def _metrics_autobem_memory(quick):
+    for (n, vectorize), result in sorted(bench_autobem_memory((6, 25) if quick else (6, 25, 100, 400)).items()):
+        mode = 'vectorized' if vectorize else 'elements'
+        yield 'autobem.%s.n%d.memory' % (mode, n), result['memory'], 'bytes', 'lower'
+        yield 'autobem.%s.n%d.connections' % (mode, n), result['connections'], 'connections', 'lower'
+
+
+def _metrics_components(quick):
+    for key, value in sorted(bench_components(20 if quick else 200).items()):
+        yield '%s.%s.execute' % key, value, 's', 'lower'
+
+
+def _metrics_inflow_solvers(quick):
+    for solver, result in sorted(bench_inflow_solvers(60 if quick else 300).items()):
+        yield 'inflow.%s.mean_calls' % solver, result['mean_n_iter'], 'calls', 'lower'
+        yield 'inflow.%s.time' % solver, result['time'], 's', 'lower'
+
+
+def _metrics_doe(quick):
+    yield 'doe.full_factorial.rate', bench_doe(2 if quick else 3), 'cases/s', 'higher'
+
+
+def _metrics_slsqp(quick):
+    for mode, result in sorted(bench_slsqp_gradients().items()):
+        yield 'slsqp.%s.time' % mode, result['time'], 's', 'lower'
+        yield 'slsqp.%s.model_runs' % mode, result['model_runs'], 'runs', 'lower'
+
+
+def _metrics_warm_start(quick):
+    for (solver, mode, warm), result in sorted(bench_warm_start(('fd',) if quick else ('fd', 'analytic')).items()):
+        name = 'warm_start.%s.%s.%s' % (solver, mode, 'warm' if warm else 'cold')
+        yield name+'.residuals', result['n_iter'], 'calls', 'lower'
+
+
+def _metrics_parallel(quick):
+    for n_workers, elapsed, speedup in bench_parallel_doe(levels=2 if quick else 3):
+        yield 'parallel.doe.workers%d.time' % n_workers, elapsed, 's', 'lower'
+
+
+def _metrics_performance_map(quick):
+    result = bench_performance_map(100000 if quick else 1000000)
+    yield 'performance_map.build', result['build'], 's', 'lower'
+    yield 'performance_map.rate', result['rate'], 'lookups/s', 'higher'
+
+
+def _metrics_import_time(quick):
+    for module, elapsed in sorted(bench_import_time(repeat=1 if quick else 3).items()):
+        yield 'import.%s' % module, elapsed, 's', 'lower'
+
+
+def _metrics_kernel_overhead(quick):
+    for key, result in sorted(bench_kernel_overhead(20 if quick else 200).items()):
+        yield 'kernel.%s.%s.call' % key, result['kernel'], 's', 'lower'
+        yield 'kernel.%s.%s.overhead' % key, result['component']-result['kernel'], 's', 'lower'
+
+
+SUITE = OrderedDict([('autobem_scaling', _metrics_autobem_scaling),
+                     ('autobem_memory', _metrics_autobem_memory),
+                     ('components', _metrics_components),
+                     ('inflow_solvers', _metrics_inflow_solvers),
+                     ('doe', _metrics_doe),
+                     ('slsqp', _metrics_slsqp),
+                     ('warm_start', _metrics_warm_start),
+                     ('parallel', _metrics_parallel),
+                     ('performance_map', _metrics_performance_map),
+                     ('import_time', _metrics_import_time),
+                     ('kernel_overhead', _metrics_kernel_overhead)])
+
+
+def run_suite(names=None, quick=False):
+    """Runs the benchmarks in SUITE named in names (all of them by default).
+
+    Returns an OrderedDict mapping each metric name to a dict with its
+    value, units and which direction is better.
+    """
+    metrics = OrderedDict()
+    for name in names or SUITE:
+        if name not in SUITE:
+            raise ValueError("unknown benchmark '%s', choose from %s" % (name, ', '.join(SUITE)))
+        for metric, value, units, better in SUITE[name](quick):
+            metrics[metric] = dict(value=float(value), units=units, better=better)
+    return metrics
+
+
+def save_results(filename, metrics):
+    """Writes metrics to a JSON file along with a description of the machine"""
+    data = dict(metadata=dict(python=platform.python_version(), numpy=np.__version__,
+                              platform=platform.platform(), time=time.strftime('%Y-%m-%d %H:%M:%S')),
+                metrics=metrics)
+    with open(filename, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load_results(filename):
+    with open(filename) as f:
+        return json.load(f)['metrics']
+
+
+def compare_results(metrics, baseline, tolerance=.1):
+    """Compares metrics with a baseline of the same form.
+
+    Returns a list of (name, baseline value, value, ratio, status) for every
+    metric in either, where ratio is value/baseline and status is one of
+    'ok', 'regression', 'improved', 'new' or 'missing'. A metric regresses
+    when it is worse than the baseline by more than the tolerance fraction.
+    """
+    rows = []
+    for name in list(baseline) + [name for name in metrics if name not in baseline]:
+        if name not in metrics:
+            rows.append((name, baseline[name]['value'], None, None, 'missing'))
+            continue
+        if name not in baseline:
+            rows.append((name, None, metrics[name]['value'], None, 'new'))
+            continue
+
+        old, new = baseline[name]['value'], metrics[name]['value']
+        ratio = new/old if old else float('inf') if new else 1.
+        #worse > 1 means the metric moved in the wrong direction
+        worse = ratio if metrics[name]['better'] == 'lower' else 1./ratio if ratio else float('inf')
+        if worse > 1+tolerance:
+            status = 'regression'
+        elif worse < 1./(1+tolerance):
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, old, new, ratio, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the nreltraining2013 rotor models")
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help="benchmarks to run, from: %s (default all)" % ', '.join(SUITE))
+    parser.add_argument('--quick', action='store_true', help="smaller problem sizes, for a fast check")
+    parser.add_argument('--output', metavar='FILE', help="write the metrics to a JSON file")
+    parser.add_argument('--compare', metavar='FILE', help="compare against the metrics in a JSON file")
+    parser.add_argument('--tolerance', type=float, default=.1,
+                        help="fraction a metric may get worse before it counts as a regression (default .1)")
+    args = parser.parse_args(argv)
+
+    import warnings
+    warnings.simplefilter('ignore')  # fsolve complains about the unconverged elements
+
+    metrics = run_suite(args.benchmarks, args.quick)
+    if args.output:
+        save_results(args.output, metrics)
+
+    if not args.compare:
+        print '%-45s %14s  %s' % ('metric', 'value', 'units')
+        for name, metric in metrics.iteritems():
+            print '%-45s %14.6g  %s' % (name, metric['value'], metric['units'])
+        return 0
+
+    rows = compare_results(metrics, load_results(args.compare), args.tolerance)
+    print '%-45s %14s %14s %8s  %s' % ('metric', 'baseline', 'value', 'ratio', 'status')
+    for name, old, new, ratio, status in rows:
+        print '%-45s %14s %14s %8s  %s' % (name, '-' if old is None else '%.6g' % old,
+                                          '-' if new is None else '%.6g' % new,
+                                          '-' if ratio is None else '%.3f' % ratio, status)
+    return 1 if any(row[-1] == 'regression' for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Memoization of model evaluations, used by AutoBEM's result cache"""
+
+__all__ = ['EvaluationCache', 'make_key']
+
+import shelve
+from collections import OrderedDict
+from hashlib import sha1
+
+import numpy as np
+
+
+def make_key(*values):
+    """Hash of a sequence of numbers and strings, suitable as a cache key.
+    Numbers are hashed by their exact float64 bit pattern."""
+    digest = sha1()
+    for value in values:
+        if isinstance(value, basestring):
+            digest.update('s%d:%s' % (len(value), value))
+        else:
+            value = np.asarray(value, dtype=float)
+            digest.update('f%d:' % value.size)
+            digest.update(value.tostring())
+    return digest.hexdigest()
+
+
+class EvaluationCache(object):
+    """Least recently used cache of evaluation results.
+
+    max_size: number of results kept in memory
+    filename: optional shelve file that every result is also written to,
+              so results survive between runs. The file is not limited by
+              max_size, results read back from it are moved into memory.
+
+    hits and misses count the lookups that did and did not find a result.
+    """
+
+    def __init__(self, max_size=128, filename=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1, got %s" % max_size)
+        self.max_size = max_size
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._store = None if filename is None else shelve.open(filename, protocol=2)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or (self._store is not None and key in self._store)
+
+    def get(self, key, default=None):
+        """Returns the result stored under key, or default"""
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            if self._store is None or key not in self._store:
+                self.misses += 1
+                return default
+            value = self._store[key]
+            self._insert(key, value)
+        else:
+            self._entries[key] = value
+
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Stores value under key, evicting the least recently used result
+        from memory if the cache is full"""
+        self._entries.pop(key, None)
+        self._insert(key, value)
+        if self._store is not None:
+            self._store[key] = value
+
+    def _insert(self, key, value):
+        self._entries[key] = value
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every result, including the ones on disk, and resets the counters"""
+        self._entries.clear()
+        if self._store is not None:
+            self._store.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def sync(self):
+        """Writes any buffered results out to the shelve file"""
+        if self._store is not None:
+            self._store.sync()
+
+    def close(self):
+        """Closes the shelve file, the in-memory results remain usable"""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
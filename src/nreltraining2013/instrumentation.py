@@ -0,0 +1,324 @@
+"""Opt-in timing and solver statistics for the components of an assembly,
+and opt-in skipping of components whose inputs have not changed.
+
+While enabled, the execute method of each component in the assembly, and
+of the assembly itself, is wrapped on that instance only. Disabling removes
+the wrappers again, so there is no cost at all when instrumentation is off.
+Instrumentation and ChangeTracker can be enabled and disabled in any order.
+"""
+
+__all__ = ['Instrumentation', 'ChangeTracker']
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from openmdao.main.api import Component, Driver, VariableTree
+
+
+def _components(assembly):
+    for name in assembly.list_containers():
+        obj = getattr(assembly, name)
+        if isinstance(obj, Component) and not isinstance(obj, Driver):
+            yield name, obj
+
+
+def _wrap_execute(comp, wrapper):
+    """Makes wrapper the execute method of comp. wrapper calls wrapper.inner,
+    the execute method it replaces, to run the component. Wrappers that
+    may skip the execute stay outermost, so the others only see real runs."""
+    outer = None
+    inner = comp.execute
+    while getattr(inner, 'skips', False) and not getattr(wrapper, 'skips', False):
+        outer, inner = inner, inner.inner
+    wrapper.inner = inner
+    if outer is None:
+        comp.execute = wrapper
+    else:
+        outer.inner = wrapper
+
+
+def _unwrap_execute(comp, wrapper):
+    """Takes wrapper out of the chain of wrappers around the execute method of comp"""
+    outer = comp.__dict__.get('execute')
+    if outer is wrapper:
+        if hasattr(wrapper.inner, 'inner'):
+            comp.execute = wrapper.inner
+        else:
+            del comp.execute
+        return
+    while outer is not None and getattr(outer, 'inner', None) is not wrapper:
+        outer = getattr(outer, 'inner', None)
+    if outer is not None:
+        outer.inner = wrapper.inner
+
+
+class _Stats(object):
+    """Counters for a single component"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.
+        self.max_time = 0.
+        self.n_iter = 0
+        self.max_n_iter = 0
+        self.unconverged = 0
+
+    def as_dict(self):
+        return OrderedDict([('count', self.count),
+                            ('total_time', self.total_time),
+                            ('mean_time', self.total_time/self.count if self.count else 0.),
+                            ('max_time', self.max_time),
+                            ('n_iter', self.n_iter),
+                            ('max_n_iter', self.max_n_iter),
+                            ('unconverged', self.unconverged)])
+
+
+class Instrumentation(object):
+    """Execution counts and wall times for every component of assembly,
+    plus the residual evaluations (n_iter) and convergence of the
+    components that report them, such as BladeElement.
+
+    Time spent in the assembly outside of its components' execute methods,
+    in the workflow and in passing data along connections, is reported as
+    framework_time.
+    """
+
+    def __init__(self, assembly):
+        self.assembly = assembly
+        self.enabled = False
+        self._stats = OrderedDict()
+        self._assembly_stats = _Stats()
+        self._wrappers = []
+
+    def _wrap(self, comp, stats):
+        def timed_execute():
+            start = time.time()
+            try:
+                timed_execute.inner()
+            finally:
+                elapsed = time.time()-start
+                stats.count += 1
+                stats.total_time += elapsed
+                stats.max_time = max(stats.max_time, elapsed)
+                n_iter = getattr(comp, 'n_iter', None)
+                if n_iter is not None:
+                    stats.n_iter += int(np.sum(n_iter))
+                    stats.max_n_iter = max(stats.max_n_iter, int(np.max(n_iter)))
+                converged = getattr(comp, 'converged', None)
+                if converged is not None:
+                    stats.unconverged += int(np.size(converged) - np.sum(converged))
+        _wrap_execute(comp, timed_execute)
+        self._wrappers.append((comp, timed_execute))
+
+    def enable(self):
+        """Starts collecting statistics, keeping any collected so far"""
+        if self.enabled:
+            return
+        for name, comp in _components(self.assembly):
+            self._wrap(comp, self._stats.setdefault(name, _Stats()))
+        self._wrap(self.assembly, self._assembly_stats)
+        self.enabled = True
+
+    def disable(self):
+        """Stops collecting statistics and removes the wrappers"""
+        if not self.enabled:
+            return
+        for comp, wrapper in self._wrappers:
+            _unwrap_execute(comp, wrapper)
+        self._wrappers = []
+        self.enabled = False
+
+    def reset(self):
+        """Zeroes all of the statistics"""
+        for stats in self._stats.values() + [self._assembly_stats]:
+            stats.__init__()
+
+    def report(self):
+        """Returns the statistics as a dict with
+
+        components: dict of per-component statistics (count, total_time,
+                    mean_time, max_time, n_iter, max_n_iter, unconverged),
+                    keyed by component name in the order they were found
+        assembly: the same statistics for the assembly's own execute
+        framework_time: assembly time not spent inside any component
+        """
+        components = OrderedDict((name, stats.as_dict()) for name, stats in self._stats.iteritems())
+        inside = sum(stats.total_time for stats in self._stats.values())
+        return dict(components=components, assembly=self._assembly_stats.as_dict(),
+                    framework_time=max(self._assembly_stats.total_time - inside, 0.))
+
+    def format_report(self):
+        """The report as a table, slowest components first"""
+        report = self.report()
+        lines = ['%-15s %8s %12s %12s %12s %10s %10s %12s' % ('component', 'count', 'total (s)', 'mean (ms)',
+                                                             'max (ms)', 'n_iter', 'max n_iter', 'unconverged')]
+        rows = sorted(report['components'].items(), key=lambda item: -item[1]['total_time'])
+        for name, stats in rows + [('(assembly)', report['assembly'])]:
+            lines.append('%-15s %8d %12.4f %12.4f %12.4f %10d %10d %12d' % (
+                name, stats['count'], stats['total_time'], stats['mean_time']*1e3, stats['max_time']*1e3,
+                stats['n_iter'], stats['max_n_iter'], stats['unconverged']))
+        lines.append('%-15s %8s %12.4f' % ('(framework)', '', report['framework_time']))
+        return '\n'.join(lines)
+
+
+def _input_values(obj, names):
+    """Current values of the inputs names of obj, variable trees flattened"""
+    values = []
+    for name in names:
+        value = getattr(obj, name)
+        if isinstance(value, VariableTree):
+            values.extend(_input_values(value, sorted(value.list_vars())))
+        elif isinstance(value, np.ndarray):
+            values.append(value.copy())
+        else:
+            values.append(value)
+    return values
+
+
+def _unchanged(old, new, tolerance):
+    """True if every value in new equals the one in old, or for numbers is
+    within the relative tolerance of it"""
+    for a, b in zip(old, new):
+        if isinstance(a, (float, np.ndarray)) and tolerance > 0:
+            if np.shape(a) != np.shape(b) or not np.allclose(b, a, rtol=tolerance, atol=0.):
+                return False
+        elif isinstance(a, np.ndarray):
+            if not np.array_equal(a, b):
+                return False
+        elif a != b:
+            return False
+    return True
+
+
+class _Counts(object):
+    """Counters for a single tracked component"""
+
+    def __init__(self):
+        self.count = 0
+        self.unchanged = 0
+        self.within_tolerance = 0
+
+    def as_dict(self):
+        return OrderedDict([('count', self.count),
+                            ('unchanged', self.unchanged),
+                            ('within_tolerance', self.within_tolerance)])
+
+
+class ChangeTracker(object):
+    """Skips the execute of every component of assembly whose inputs are
+    the same as at its last execute, keeping the outputs of that execute.
+
+    The inputs are compared by value, so a component is skipped even if
+    the framework passed new copies of unchanged values along its
+    connections. With tolerance > 0, the components named in tolerant are
+    also skipped when every number among their inputs is within that
+    relative tolerance of its value at their last execute. Their outputs
+    are then only approximate, with errors of about the same relative size.
+    Such a component is run with its current inputs before its provideJ
+    is called, so analytic derivatives always come from a state that
+    matches the inputs; its outputs then move by up to that tolerance.
+
+    count is the number of times each component executed, unchanged the
+    number of times it was skipped because its inputs had not changed, and
+    within_tolerance the number of times it was skipped because they moved
+    less than tolerance.
+    """
+
+    def __init__(self, assembly, tolerance=0., tolerant=()):
+        self.assembly = assembly
+        self.tolerance = tolerance
+        self.tolerant = set(tolerant)
+        self.enabled = False
+        self._counts = OrderedDict()
+        self._inputs = {}
+        self._wrappers = []
+        #components skipped within tolerance, whose outputs lag their inputs
+        self._stale = set()
+
+    def _wrap(self, name, comp, counts):
+        input_names = comp.list_inputs()
+
+        def run(values):
+            tracked_execute.inner()
+            counts.count += 1
+            #compared against the inputs of the last execute, so small changes can't add up unseen
+            self._inputs[name] = values
+            self._stale.discard(name)
+
+        def tracked_execute():
+            values = _input_values(comp, input_names)
+            last = self._inputs.get(name)
+            if last is not None:
+                if _unchanged(last, values, 0.):
+                    counts.unchanged += 1
+                    self._stale.discard(name)
+                    return
+                if name in self.tolerant and self.tolerance > 0 and _unchanged(last, values, self.tolerance):
+                    counts.within_tolerance += 1
+                    self._stale.add(name)
+                    return
+            run(values)
+        tracked_execute.skips = True
+        _wrap_execute(comp, tracked_execute)
+        self._wrappers.append((comp, tracked_execute))
+
+        if name in self.tolerant and hasattr(comp, 'provideJ'):
+            provideJ = comp.provideJ
+
+            def tracked_provideJ():
+                #the Jacobian has to be taken at outputs that match the current inputs
+                if name in self._stale:
+                    run(_input_values(comp, input_names))
+                return provideJ()
+            comp.provideJ = tracked_provideJ
+
+    def enable(self):
+        """Starts skipping unchanged components. Each one executes at least
+        once after this, since the values of its outputs may not match its
+        inputs yet."""
+        if self.enabled:
+            return
+        self._inputs = {}
+        self._stale = set()
+        for name, comp in _components(self.assembly):
+            self._wrap(name, comp, self._counts.setdefault(name, _Counts()))
+        self.enabled = True
+
+    def disable(self):
+        """Stops skipping components and removes the wrappers"""
+        if not self.enabled:
+            return
+        for comp, wrapper in self._wrappers:
+            _unwrap_execute(comp, wrapper)
+            comp.__dict__.pop('provideJ', None)
+        self._wrappers = []
+        self.enabled = False
+
+    def reset(self):
+        """Zeroes all of the counters"""
+        for counts in self._counts.values():
+            counts.__init__()
+
+    def report(self):
+        """Returns the counters as a dict with
+
+        components: dict of per-component counters (count, unchanged,
+                    within_tolerance), keyed by component name
+        count, skipped: total number of component executes, and of skipped
+                        executes of either kind
+        """
+        components = OrderedDict((name, counts.as_dict()) for name, counts in self._counts.iteritems())
+        return dict(components=components, count=sum(counts.count for counts in self._counts.values()),
+                    skipped=sum(counts.unchanged + counts.within_tolerance for counts in self._counts.values()))
+
+    def format_report(self):
+        """The report as a table"""
+        report = self.report()
+        lines = ['%-15s %8s %10s %17s' % ('component', 'count', 'unchanged', 'within tolerance')]
+        for name, counts in report['components'].iteritems():
+            lines.append('%-15s %8d %10d %17d' % (name, counts['count'], counts['unchanged'],
+                                                  counts['within_tolerance']))
+        lines.append('%-15s %8d %10s %17s' % ('(total)', report['count'], '', report['skipped']))
+        return '\n'.join(lines)
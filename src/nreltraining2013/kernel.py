@@ -0,0 +1,770 @@
+"""Rotor physics on plain NumPy arrays.
+
+The blade element, rotor integration and actuator disk math behind the
+components in nreltraining2013.nreltraining2013. This module only imports
+NumPy and the airfoil tables, not OpenMDAO, so worker processes and short
+batch jobs that just need the physics start quickly. scipy is imported the
+first time solve_element needs it.
+"""
+
+__all__ = ['actuator_disk', 'actuator_disk_derivatives', 'betz_optimum', 'weibull_bins',
+           'span_fractions', 'quadrature_weights', 'span_integral',
+           'coeff_lookup', 'coeff_slopes', 'inflow_residual', 'solve_inflow', 'solve_element',
+           'element_loads', 'element_performance', 'element_derivatives',
+           'rotor_performance', 'rotor_performance_derivatives', 'adaptive_performance',
+           'DISK_DERIV_INPUTS', 'DISK_DERIV_OUTPUTS', 'BETZ_A', 'BETZ_CP',
+           'ELEMENT_DERIV_INPUTS', 'ELEMENT_DERIV_OUTPUTS', 'PERF_DERIV_INPUTS', 'PERF_DERIV_OUTPUTS',
+           'SPACINGS', 'QUADRATURES', 'SOLVERS']
+
+from math import pi
+
+import numpy as np
+
+from .airfoils import get_polar, DEFAULT_AIRFOIL
+
+#variables with analytic derivatives in ActuatorDisk, in the order used by actuator_disk_derivatives
+DISK_DERIV_INPUTS = ('a', 'Area', 'rho', 'Vu')
+DISK_DERIV_OUTPUTS = ('Vr', 'Vd', 'Ct', 'thrust', 'Cp', 'power', 'power_opt')
+
+#Betz optimum of the actuator disk
+BETZ_A = 1/3.
+BETZ_CP = 16/27.
+
+#variables with analytic derivatives in BladeElement, in the order used by element_derivatives
+ELEMENT_DERIV_INPUTS = ('r', 'dr', 'twist', 'chord', 'rpm', 'rho', 'V_inf')
+ELEMENT_DERIV_OUTPUTS = ('delta_Ct', 'delta_Cp', 'lambda_r', 'a', 'b', 'phi', 'alpha', 'V_0', 'V_1', 'V_2')
+
+#variables with analytic derivatives in BEMPerf, in the order used by rotor_performance_derivatives.
+#delta_Ct, delta_Cp and lambda_r have one column per station
+PERF_DERIV_INPUTS = ('r', 'rpm', 'V_inf', 'rho', 'delta_Ct', 'delta_Cp', 'lambda_r')
+PERF_DERIV_OUTPUTS = ('Ct', 'Cp', 'net_thrust', 'net_power', 'J', 'tip_speed_ratio')
+
+#station layouts along the span, see span_fractions
+SPACINGS = ('linear', 'cosine', 'tip')
+
+#rules for integrating the element data along the span, see quadrature_weights
+QUADRATURES = ('trapz', 'simpson')
+
+#single station solvers, see solve_element
+SOLVERS = ('fsolve', 'bracket')
+
+#imaginary step used for complex step derivatives of the quadrature weights
+_COMPLEX_STEP = 1e-30
+
+#inflow angles are bracketed inside (0, pi/2)
+_PHI_MIN = 1e-6
+_PHI_MAX = pi/2 - 1e-6
+_GROWTH = 1.25
+_N_SCAN = 60
+_GOLDEN = (5**.5-1)/2
+_N_GOLDEN = 30
+#warm starts march from the previous solution in steps that start small and grow quickly
+_WARM_GROWTH = 1.001
+_WARM_EXPAND = 4.
+_N_WARM = 6
+
+
+def actuator_disk(a, Vu, Area, rho):
+    """ActuatorDisk calculations for any number of operating points at once.
+
+    All arguments broadcast against each other. Returns a dict keyed by the
+    ActuatorDisk output names, including the Betz optimum a_opt, Cp_opt and
+    power_opt.
+    """
+    qA = .5*rho*Area*Vu**2
+
+    Vd = Vu*(1-2 * a)
+    Vr = .5*(Vu + Vd)
+
+    Ct = 4*a*(1-a)
+    Cp = Ct*(1-a)
+
+    return dict(Vr=Vr, Vd=Vd, Ct=Ct, thrust=Ct*qA, Cp=Cp, power=Cp*qA*Vu,
+                a_opt=BETZ_A, Cp_opt=BETZ_CP, power_opt=BETZ_CP*qA*Vu)
+
+
+def actuator_disk_derivatives(a, Vu, Area, rho):
+    """Derivatives of the actuator_disk outputs with respect to its inputs.
+
+    All arguments broadcast against each other. Returns a dict keyed by the
+    names in DISK_DERIV_OUTPUTS, each holding an array with a trailing axis
+    ordered as DISK_DERIV_INPUTS.
+    """
+    a, Vu, Area, rho = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (a, Vu, Area, rho)])
+    zero = np.zeros(a.shape)
+    qA = .5*rho*Area*Vu**2
+
+    Ct = 4*a*(1-a)
+    Cp = Ct*(1-a)
+    dCt_da = 4-8*a
+    dCp_da = 4*(1-a)*(1-3*a)
+
+    def row(*columns):
+        return np.concatenate([column[..., np.newaxis] for column in np.broadcast_arrays(*columns)], axis=-1)
+
+    #columns are a, Area, rho, Vu
+    return dict(Vr=row(-Vu, zero, zero, 1-a),
+                Vd=row(-2*Vu, zero, zero, 1-2*a),
+                Ct=row(dCt_da, zero, zero, zero),
+                thrust=row(dCt_da*qA, Ct*.5*rho*Vu**2, Ct*.5*Area*Vu**2, Ct*rho*Area*Vu),
+                Cp=row(dCp_da, zero, zero, zero),
+                power=row(dCp_da*qA*Vu, Cp*.5*rho*Vu**3, Cp*.5*Area*Vu**3, 1.5*Cp*rho*Area*Vu**2),
+                power_opt=row(zero, BETZ_CP*.5*rho*Vu**3, BETZ_CP*.5*Area*Vu**3, 1.5*BETZ_CP*rho*Area*Vu**2))
+
+
+def betz_optimum(Vu, Area, rho):
+    """Actuator disk outputs at the Betz limit a = 1/3, where Cp peaks at 16/27.
+    All arguments broadcast against each other."""
+    return actuator_disk(BETZ_A, Vu, Area, rho)
+
+
+def weibull_bins(wind_speeds, k, c):
+    """Fraction of the time the wind blows in the bin around each of
+    wind_speeds for a Weibull distribution with shape k and scale c. Bins
+    end halfway between neighboring speeds and extend half a step past the
+    first and last speed."""
+    wind_speeds = np.asarray(wind_speeds, dtype=float)
+    mid = .5*(wind_speeds[1:]+wind_speeds[:-1])
+    edges = np.hstack((2*wind_speeds[0]-mid[0], mid, 2*wind_speeds[-1]-mid[-1]))
+    cdf = 1-np.exp(-(np.maximum(edges, 0)/c)**k)
+    return np.diff(cdf)
+
+
+def span_fractions(n, spacing='linear'):
+    """Positions of n stations along the span, as fractions of the way from
+    the hub (0) to the tip (1). 'linear' spaces them evenly, 'cosine'
+    clusters them towards both the hub and the tip, and 'tip' clusters them
+    towards the tip only, where the loading changes fastest."""
+    if spacing not in SPACINGS:
+        raise ValueError("spacing must be one of %s, not '%s'" % (SPACINGS, spacing))
+    span = np.linspace(0., 1., n)
+    if spacing == 'cosine':
+        return .5*(1-np.cos(pi*span))
+    if spacing == 'tip':
+        return np.sin(.5*pi*span)
+    return span
+
+
+def quadrature_weights(x, quadrature='trapz'):
+    """Weights w for integrating any y sampled at the points x, the integral
+    being (w*y).sum(axis=-1). x must increase along its last axis.
+
+    'trapz' is the trapezoidal rule. 'simpson' integrates the parabola
+    through each pair of intervals, which need not be the same width, and
+    with an odd number of intervals integrates the last one with the
+    parabola through the last three points. With fewer than three points
+    'simpson' falls back to 'trapz'. x may be complex, for complex step
+    derivatives of the weights.
+    """
+    if quadrature not in QUADRATURES:
+        raise ValueError("quadrature must be one of %s, not '%s'" % (QUADRATURES, quadrature))
+    x = np.asarray(x)
+    h = np.diff(x, axis=-1)
+    w = np.zeros(x.shape, dtype=h.dtype)
+    n = x.shape[-1]
+    if quadrature == 'trapz' or n < 3:
+        w[..., :-1] += .5*h
+        w[..., 1:] += .5*h
+        return w
+
+    end = 2*((n-1)//2)
+    h0 = h[..., 0:end:2]
+    h1 = h[..., 1:end:2]
+    width = h0+h1
+    w[..., 0:end:2] += width/6*(2-h1/h0)
+    w[..., 1:end:2] += width**3/(6*h0*h1)
+    w[..., 2:end+1:2] += width/6*(2-h0/h1)
+    if end < n-1:
+        h0 = h[..., -2]
+        h1 = h[..., -1]
+        w[..., -1] += h1*(2*h1+3*h0)/(6*(h0+h1))
+        w[..., -2] += h1*(h1+3*h0)/(6*h0)
+        w[..., -3] -= h1**3/(6*h0*(h0+h1))
+    return w
+
+
+def span_integral(y, x, quadrature='trapz'):
+    """Integral of y over x along the last axis, see quadrature_weights"""
+    if quadrature == 'trapz':
+        return np.trapz(y, x=x, axis=-1)
+    return (quadrature_weights(x, quadrature)*y).sum(axis=-1)
+
+
+def _trapz_derivatives(y, x):
+    """Derivatives of np.trapz(y, x=x) with respect to each element of y and x"""
+    width = np.diff(x)
+    dy = np.zeros(y.shape)
+    dy[:-1] += .5*width
+    dy[1:] += .5*width
+
+    height = y[:-1]+y[1:]
+    dx = np.zeros(x.shape)
+    dx[:-1] -= .5*height
+    dx[1:] += .5*height
+    return dy, dx
+
+
+def _integral_derivatives(y, x, quadrature='trapz'):
+    """Derivatives of span_integral(y, x, quadrature) with respect to each element of y and x"""
+    if quadrature == 'trapz':
+        return _trapz_derivatives(y, x)
+    n = x.shape[0]
+    #row i of the weights has x[i] bumped by an imaginary step
+    bumped = quadrature_weights(x + 1j*_COMPLEX_STEP*np.eye(n), quadrature)
+    return quadrature_weights(x, quadrature), bumped.dot(y).imag/_COMPLEX_STEP
+
+
+def coeff_lookup(alpha, r=None, airfoil=DEFAULT_AIRFOIL):
+    """Vectorized lift and drag lookup, returns (C_D, C_L) for an array of angles of attack.
+    r is only needed by polars that vary along the span."""
+    return get_polar(airfoil).lookup(alpha, r)
+
+
+def coeff_slopes(alpha, r=None, airfoil=DEFAULT_AIRFOIL):
+    """Slopes of the piecewise linear polars, returns (dC_D/dalpha, dC_L/dalpha).
+    Outside of the tables the coefficients are constant, so the slopes are zero."""
+    return get_polar(airfoil).slopes(alpha, r)
+
+
+def inflow_residual(phi, lambda_r, sigma, twist, r=None, airfoil=DEFAULT_AIRFOIL):
+    """Blade element equations restated as a single residual in the inflow angle phi.
+
+    Returns the residual along with the induction factors, angle of attack and
+    airfoil coefficients that go with phi. The residual is zero wherever
+    (a, b) is a fixed point of the iteration solve_element does with 'fsolve'.
+    """
+    alpha = pi/2-twist-phi
+    C_D, C_L = coeff_lookup(alpha, r, airfoil)
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+
+    k = sigma*C_L*sin_phi/(4*cos_phi**2)
+    a = k/(1+k)
+    b = sigma*C_L*(1-a)/(4*lambda_r*cos_phi)
+    R = cos_phi*(1+k) - sin_phi/(lambda_r*(1+b))
+
+    return R, a, b, alpha, C_D, C_L
+
+
+def solve_inflow(lambda_r, sigma, twist, r=None, airfoil=DEFAULT_AIRFOIL, phi_start=None,
+                 growth=_GROWTH, n_scan=_N_SCAN, tol=1e-12, max_iter=50):
+    """Solve the blade element equations for the inflow angle at any number of
+    stations at once.
+
+    The march starts from the no-induction angle arctan(lambda_r), where the
+    residual is positive for non-negative lift, and grows tan(phi) by a factor
+    of growth per step until the residual changes sign (marching down instead
+    if the residual starts out negative). The bracketed root is then refined
+    with the Illinois variant of regula falsi, so convergence is guaranteed
+    once a sign change has been found.
+
+    r, the station radii, only matters for polars that vary along the span.
+
+    phi_start warm starts the solve, typically from the angles found for a
+    nearby design. Those stations first march from phi_start in small steps,
+    and any of them that is not bracketed within a few steps (or has a nan
+    phi_start) falls back to the cold march described above.
+
+    Returns (phi, converged, n_iter), each with the broadcast shape of the
+    inputs. n_iter counts the residual evaluations spent on each station.
+    Stations where no sign change is found within n_scan steps have no
+    solution; they are flagged as not converged and left at the angle where
+    the residual comes closest to zero, which is also where fsolve stalls.
+    """
+    stations = np.broadcast_arrays(*([lambda_r, sigma, twist] + ([] if r is None else [r])))
+    shape = stations[0].shape
+    stations = [np.array(x, dtype=float).ravel() for x in stations]
+    polar = get_polar(airfoil)
+
+    def residual(phi, idx):
+        return inflow_residual(phi, *[x[idx] for x in stations], airfoil=polar)[0]
+
+    phi = np.empty(stations[0].shape)
+    converged = np.zeros(phi.shape, dtype=bool)
+    n_iter = np.zeros(phi.shape, dtype=int)
+    cold = np.arange(phi.size)
+
+    if phi_start is not None:
+        guess = np.array(np.broadcast_arrays(phi_start, stations[0])[0], dtype=float).ravel()
+        warm = np.flatnonzero(np.isfinite(guess))
+        start = np.clip(guess[warm], _PHI_MIN, _PHI_MAX)
+        result = _march_and_refine(residual, warm, start, _WARM_GROWTH, _N_WARM, tol, max_iter, _WARM_EXPAND)
+        phi[warm], converged[warm], n_iter[warm], bracketed = result[:4]
+        cold = np.setdiff1d(cold, warm[bracketed])
+
+    start = np.clip(np.arctan(stations[0][cold]), _PHI_MIN, _PHI_MAX)
+    cold_phi, cold_converged, cold_n_iter, bracketed, left, right = \
+        _march_and_refine(residual, cold, start, growth, n_scan, tol, max_iter)
+
+    failed = np.flatnonzero(~bracketed)
+    if failed.size:
+        cold_phi[failed] = _closest_approach(left[failed], right[failed],
+                                             *[x[cold[failed]] for x in stations], airfoil=polar)
+        cold_n_iter[failed] += _N_GOLDEN + 2
+
+    phi[cold] = cold_phi
+    converged[cold] = cold_converged
+    n_iter[cold] += cold_n_iter
+
+    return phi.reshape(shape), converged.reshape(shape), n_iter.reshape(shape)
+
+
+def _march_and_refine(residual, idx, start, growth, n_scan, tol, max_iter, expand=1.):
+    """March and Illinois refinement for solve_inflow at the stations idx.
+    Each step of the march raises the growth factor to the power expand.
+
+    Returns (phi, converged, n_iter, bracketed, left, right), where left and
+    right surround the closest approach of the residual to zero along the
+    march for the stations that were never bracketed.
+    """
+    R_start = residual(start, idx)
+    n_iter = np.ones(start.shape, dtype=int)
+
+    #negative lift can put the no-induction angle past the root
+    factor = np.where(R_start < 0, 1./growth, growth)
+
+    lo, R_lo = start.copy(), R_start.copy()
+    hi, R_hi = start.copy(), R_start.copy()
+    bracketed = R_start == 0
+    marching = ~bracketed
+
+    #closest approach of the residual to zero along the march, with the
+    #points on either side of it, in case there is no sign change
+    best, left, right = start.copy(), start.copy(), start.copy()
+    best_R = np.abs(R_start)
+
+    for i in range(n_scan):
+        todo = np.flatnonzero(marching)
+        if not todo.size:
+            break
+        lo[todo] = hi[todo]
+        R_lo[todo] = R_hi[todo]
+        hi[todo] = np.clip(np.arctan(np.tan(lo[todo])*factor[todo]), _PHI_MIN, _PHI_MAX)
+        R_hi[todo] = residual(hi[todo], idx[todo])
+        n_iter[todo] += 1
+        factor[todo] **= expand
+
+        after_best = todo[right[todo] == best[todo]]
+        right[after_best] = hi[after_best]
+        closer = todo[np.abs(R_hi[todo]) < best_R[todo]]
+        best_R[closer] = np.abs(R_hi[closer])
+        left[closer] = lo[closer]
+        best[closer] = right[closer] = hi[closer]
+
+        bracketed[todo] = R_hi[todo]*R_start[todo] <= 0
+        #the march ends early when it runs into either end of the interval
+        marching[todo] = ~bracketed[todo] & (hi[todo] != lo[todo])
+
+    phi = hi.copy()
+    converged = R_hi == 0
+
+    #Illinois iteration, (x0, f0) and (x1, f1) always straddle the root
+    x0, f0, x1, f1 = lo, R_lo, hi, R_hi
+    active = bracketed & ~converged
+    for i in range(max_iter):
+        todo = np.flatnonzero(active)
+        if not todo.size:
+            break
+        x = x1[todo] - f1[todo]*(x1[todo]-x0[todo])/(f1[todo]-f0[todo])
+        f = residual(x, idx[todo])
+        n_iter[todo] += 1
+
+        flip = f*f1[todo] < 0
+        f0[todo[~flip]] *= .5
+        swap = todo[flip]
+        x0[swap] = x1[swap]
+        f0[swap] = f1[swap]
+        x1[todo] = x
+        f1[todo] = f
+
+        done = (f == 0) | (np.abs(x1[todo]-x0[todo]) < tol)
+        phi[todo] = x
+        converged[todo[done]] = True
+        active[todo[done]] = False
+
+    return phi, converged, n_iter, bracketed, left, right
+
+
+def _closest_approach(x0, x1, lambda_r, sigma, twist, r=None, airfoil=DEFAULT_AIRFOIL):
+    """Golden section search for the inflow angle between x0 and x1 where the
+    magnitude of the residual is smallest"""
+
+    def f(phi):
+        return np.abs(inflow_residual(phi, lambda_r, sigma, twist, r, airfoil)[0])
+
+    c = x1 - _GOLDEN*(x1-x0)
+    d = x0 + _GOLDEN*(x1-x0)
+    f_c, f_d = f(c), f(d)
+    for i in range(_N_GOLDEN):
+        lower = f_c < f_d
+        x1 = np.where(lower, d, x1)
+        x0 = np.where(lower, x0, c)
+        new = np.where(lower, x1 - _GOLDEN*(x1-x0), x0 + _GOLDEN*(x1-x0))
+        f_new = f(new)
+        c, d = np.where(lower, new, d), np.where(lower, c, new)
+        f_c, f_d = np.where(lower, f_new, f_d), np.where(lower, f_c, f_new)
+
+    return .5*(x0+x1)
+
+
+def solve_element(lambda_r, sigma, twist, r=None, airfoil=DEFAULT_AIRFOIL, solver='fsolve', guess=(0.2, 0.01),
+                  warm=None):
+    """Solve the blade element equations for a single station.
+
+    'fsolve' iterates on the induction factors (a, b) together, starting
+    from guess. 'bracket' finds the inflow angle with a bracketed root find.
+    warm is the (a, b, phi) of an earlier solution to start from instead;
+    if that does not converge, the solve starts over cold.
+
+    Returns a dict with the induction factors a and b, the inflow angle phi,
+    the angle of attack alpha, the residual evaluations n_iter and whether
+    the solver converged.
+    """
+    if solver not in SOLVERS:
+        raise ValueError("solver must be one of %s, not '%s'" % (SOLVERS, solver))
+    if solver == 'bracket':
+        return _solve_bracket(lambda_r, sigma, twist, r, airfoil, None if warm is None else warm[2])
+
+    n_iter = 0
+    solution = None
+    if warm is not None:
+        solution = _solve_fsolve(lambda_r, sigma, twist, r, airfoil, warm[:2])
+        n_iter = solution['n_iter']
+    #cold start when there is nothing to warm start from or the warm start diverged
+    if solution is None or not solution['converged']:
+        solution = _solve_fsolve(lambda_r, sigma, twist, r, airfoil, list(guess))
+        solution['n_iter'] += n_iter
+    return solution
+
+
+def _solve_fsolve(lambda_r, sigma, twist, r, airfoil, X0):
+    """fsolve on the fixed point of the (a, b) iteration, phi and alpha are
+    those of the last iterate it evaluated"""
+    from scipy.optimize import fsolve
+
+    last = {}
+
+    def iteration(X):
+        phi = np.arctan(lambda_r*(1+X[1])/(1-X[0]))
+        alpha = pi/2-twist-phi
+        C_D, C_L = coeff_lookup(alpha, r, airfoil)
+        a = 1./(1 + 4.*(np.cos(phi)**2)/(sigma*C_L*np.sin(phi)))
+        b = (sigma*C_L) / (4 * lambda_r * np.cos(phi)) * (1 - a)
+        last.update(phi=phi, alpha=alpha)
+        return (X[0]-a), (X[1]-b)
+
+    result, info, ier, msg = fsolve(iteration, X0, full_output=True)
+    return dict(a=result[0], b=result[1], phi=last['phi'], alpha=last['alpha'],
+                n_iter=info['nfev'], converged=ier == 1)
+
+
+def _solve_bracket(lambda_r, sigma, twist, r, airfoil, phi_start=None):
+    """Scalar version of solve_inflow, using brentq once the root is bracketed"""
+    from scipy.optimize import brentq
+
+    args = (lambda_r, sigma, twist, r, airfoil)
+
+    def residual(phi):
+        return inflow_residual(phi, *args)[0]
+
+    n_iter = 0
+    march = None
+    if phi_start is not None:
+        march = _march_scalar(residual, min(max(phi_start, _PHI_MIN), _PHI_MAX),
+                              _WARM_GROWTH, _N_WARM, _WARM_EXPAND)
+        n_iter += march[4]
+        #not bracketed near the previous solution, fall back to a cold start
+        if march[2]*march[3] > 0:
+            march = None
+    if march is None:
+        march = _march_scalar(residual, min(max(np.arctan(lambda_r), _PHI_MIN), _PHI_MAX),
+                              _GROWTH, _N_SCAN)
+        n_iter += march[4]
+    lo, hi, R_start, R_hi, count, left, right = march
+
+    if R_hi == 0:
+        phi, converged = hi, True
+    elif R_hi*R_start < 0:
+        phi, info = brentq(residual, lo, hi, xtol=1e-12, full_output=True)
+        n_iter += info.function_calls
+        converged = info.converged
+    else:
+        phi = _closest_approach(left, right, *args)
+        n_iter += _N_GOLDEN + 2
+        converged = False
+
+    R, a, b, alpha, C_D, C_L = inflow_residual(phi, *args)
+    return dict(a=a, b=b, phi=phi, alpha=alpha, n_iter=n_iter, converged=converged)
+
+
+def _march_scalar(residual, start, growth, n_scan, expand=1.):
+    """Scalar version of the march in _march_and_refine.
+
+    Returns (lo, hi, R_start, R_hi, n_iter, left, right), where the residual
+    changes sign between lo and hi if R_hi*R_start <= 0, and left and right
+    surround its closest approach to zero otherwise.
+    """
+    R_start = residual(start)
+    factor = growth if R_start >= 0 else 1./growth
+    n_iter = 1
+
+    lo = hi = best = left = right = start
+    R_hi = R_start
+    best_R = abs(R_start)
+    for i in range(n_scan):
+        lo = hi
+        hi = min(max(np.arctan(np.tan(lo)*factor), _PHI_MIN), _PHI_MAX)
+        R_hi = residual(hi)
+        n_iter += 1
+        factor **= expand
+
+        if right == best:
+            right = hi
+        if abs(R_hi) < best_R:
+            best_R, left, best, right = abs(R_hi), lo, hi, hi
+
+        if R_hi*R_start <= 0 or hi == lo:
+            break
+
+    return lo, hi, R_start, R_hi, n_iter, left, right
+
+
+def element_loads(a, b, phi, alpha, r, dr, chord, rpm, B, rho, V_inf, airfoil=DEFAULT_AIRFOIL):
+    """Velocities and section coefficients of blade elements with a solved
+    inflow. All arguments broadcast against each other. Returns a dict with
+    V_0, V_1, V_2, delta_Ct and delta_Cp."""
+    omega_r = rpm*2*pi/60.0*r
+    lambda_r = omega_r/V_inf
+
+    V_0 = V_inf - a*V_inf
+    V_2 = omega_r-b*omega_r
+    V_1 = (V_0**2+V_2**2)**.5
+
+    q_c = B*.5*(rho*V_1**2)*chord*dr
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+    C_D, C_L = coeff_lookup(alpha, r, airfoil)
+    delta_Ct = q_c*(C_L*cos_phi-C_D*sin_phi)/(.5*rho*(V_inf**2)*(pi*r**2))
+    delta_Cp = b*(1-a)*lambda_r**3*(1-C_D/C_L*np.tan(phi))
+
+    return dict(V_0=V_0, V_1=V_1, V_2=V_2, delta_Ct=delta_Ct, delta_Cp=delta_Cp)
+
+
+def element_performance(r, dr, chord, twist, rpm, B, rho, V_inf, airfoil=DEFAULT_AIRFOIL, phi_start=None):
+    """BladeElement calculations for any number of stations at once.
+
+    All arguments broadcast against each other, phi_start is passed on to
+    solve_inflow as a warm start. Returns a dict with the
+    BladeElement outputs (V_0, V_1, V_2, omega, sigma, alpha, delta_Ct,
+    delta_Cp, a, b, lambda_r, phi) as arrays, along with the converged and
+    n_iter arrays from solve_inflow.
+    """
+    sigma = B*chord / (2 * np.pi * r)
+    omega = rpm*2*pi/60.0
+    omega_r = omega*r
+    lambda_r = omega_r/V_inf
+
+    phi, converged, n_iter = solve_inflow(lambda_r, sigma, twist, r, airfoil, phi_start)
+    R, a, b, alpha, C_D, C_L = inflow_residual(phi, lambda_r, sigma, twist, r, airfoil)
+
+    results = element_loads(a, b, phi, alpha, r, dr, chord, rpm, B, rho, V_inf, airfoil)
+    results.update(omega=omega, sigma=sigma, alpha=alpha, a=a, b=b, lambda_r=lambda_r, phi=phi,
+                   converged=converged, n_iter=n_iter)
+    return results
+
+
+def element_derivatives(phi, r, dr, chord, twist, rpm, B, rho, V_inf, airfoil=DEFAULT_AIRFOIL):
+    """Derivatives of the converged BladeElement outputs with respect to its inputs.
+
+    phi must be a solution of inflow_residual. Its own sensitivity comes from
+    the implicit function theorem, dphi/dx = -(dR/dx)/(dR/dphi), and is
+    chained into every other output. All arguments broadcast against each
+    other. Returns a dict keyed by the names in ELEMENT_DERIV_OUTPUTS, each
+    holding an array with a trailing axis ordered as ELEMENT_DERIV_INPUTS.
+    """
+    phi, r, dr, chord, twist, rpm, rho, V_inf = np.broadcast_arrays(phi, r, dr, chord, twist, rpm, rho, V_inf)
+
+    def col(x):
+        return np.asarray(x)[..., np.newaxis]
+
+    #seed vectors, phi first followed by ELEMENT_DERIV_INPUTS
+    d_phi, d_r, d_dr, d_twist, d_chord, d_rpm, d_rho, d_V = np.eye(8)
+
+    omega = rpm*2*pi/60.0
+    D_omega = 2*pi/60.0*d_rpm
+    omega_r = omega*r
+    D_omega_r = col(r)*D_omega + col(omega)*d_r
+    lambda_r = omega_r/V_inf
+    D_lambda_r = D_omega_r/col(V_inf) - col(lambda_r/V_inf)*d_V
+    sigma = B*chord / (2 * np.pi * r)
+    D_sigma = col(B/(2*np.pi*r))*d_chord - col(sigma/r)*d_r
+
+    alpha = pi/2-twist-phi
+    D_alpha = -d_twist - d_phi
+    polar = get_polar(airfoil)
+    C_D, C_L = polar.lookup(alpha, r)
+    dC_D, dC_L = polar.slopes(alpha, r)
+    #polars blended along the span also change with r
+    dC_D_dr, dC_L_dr = polar.span_slopes(alpha, r)
+    D_CD = col(dC_D)*D_alpha + col(dC_D_dr)*d_r
+    D_CL = col(dC_L)*D_alpha + col(dC_L_dr)*d_r
+
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+    tan_phi = np.tan(phi)
+    D_cos = -col(sin_phi)*d_phi
+    D_sin = col(cos_phi)*d_phi
+    D_tan = col(1/cos_phi**2)*d_phi
+
+    k = sigma*C_L*sin_phi/(4*cos_phi**2)
+    D_k = ((col(C_L*sin_phi)*D_sigma + col(sigma*sin_phi)*D_CL + col(sigma*C_L)*D_sin)/col(4*cos_phi**2)
+           - col(2*k/cos_phi)*D_cos)
+    a = k/(1+k)
+    D_a = D_k/col((1+k)**2)
+    b = sigma*C_L*(1-a)/(4*lambda_r*cos_phi)
+    D_b = ((col(C_L*(1-a))*D_sigma + col(sigma*(1-a))*D_CL - col(sigma*C_L)*D_a)/col(4*lambda_r*cos_phi)
+           - col(b)*(D_lambda_r/col(lambda_r) + D_cos/col(cos_phi)))
+
+    q = lambda_r*(1+b)
+    D_q = col(1+b)*D_lambda_r + col(lambda_r)*D_b
+    D_R = col(1+k)*D_cos + col(cos_phi)*D_k - D_sin/col(q) + col(sin_phi/q**2)*D_q
+
+    V_0 = V_inf - a*V_inf
+    D_V0 = col(1-a)*d_V - col(V_inf)*D_a
+    V_2 = omega_r-b*omega_r
+    D_V2 = col(1-b)*D_omega_r - col(omega_r)*D_b
+    V_1 = (V_0**2+V_2**2)**.5
+    D_V1 = (col(V_0)*D_V0 + col(V_2)*D_V2)/col(V_1)
+
+    F = C_L*cos_phi-C_D*sin_phi
+    D_F = col(cos_phi)*D_CL + col(C_L)*D_cos - col(sin_phi)*D_CD - col(C_D)*D_sin
+    num = B*V_1**2*chord*dr*F
+    D_num = B*(col(2*V_1*chord*dr*F)*D_V1 + col(V_1**2*dr*F)*d_chord + col(V_1**2*chord*F)*d_dr
+               + col(V_1**2*chord*dr)*D_F)
+    den = pi*V_inf**2*r**2
+    D_den = pi*(col(2*V_inf*r**2)*d_V + col(2*V_inf**2*r)*d_r)
+    delta_Ct = num/den
+    D_Ct = (D_num - col(delta_Ct)*D_den)/col(den)
+
+    G = 1-C_D/C_L*tan_phi
+    D_G = -(col(tan_phi/C_L)*D_CD + col(C_D/C_L)*D_tan - col(C_D*tan_phi/C_L**2)*D_CL)
+    D_Cp = (col((1-a)*lambda_r**3*G)*D_b - col(b*lambda_r**3*G)*D_a
+            + col(3*b*(1-a)*lambda_r**2*G)*D_lambda_r + col(b*(1-a)*lambda_r**3)*D_G)
+
+    #chain the implicit sensitivity of phi into each total derivative
+    dphi_dx = -D_R[..., 1:]/D_R[..., :1]
+    partials = dict(delta_Ct=D_Ct, delta_Cp=D_Cp, lambda_r=D_lambda_r, a=D_a, b=D_b, phi=d_phi*np.ones_like(D_a),
+                    alpha=D_alpha*np.ones_like(D_a), V_0=D_V0, V_1=D_V1, V_2=D_V2)
+    return dict((name, partial[..., 1:] + partial[..., :1]*dphi_dx) for name, partial in partials.iteritems())
+
+
+def rotor_performance(delta_Ct, delta_Cp, lambda_r, r, rpm, rho, V_inf, quadrature='trapz'):
+    """BEMPerf calculations, integrating the element data along the last axis.
+
+    Returns a dict keyed by the BEMPerfData variable names.
+    """
+    norm = (.5*rho*(V_inf**2)*(pi*r**2))
+    Ct = span_integral(delta_Ct, lambda_r, quadrature)
+    Cp = span_integral(delta_Cp, lambda_r, quadrature) * 8. / lambda_r.max(axis=-1)**2
+
+    omega = rpm*2*pi/60
+    return dict(net_thrust=Ct*norm, net_power=Cp*norm*V_inf, Ct=Ct, Cp=Cp,
+                J=V_inf/(rpm/60.0*2*r), tip_speed_ratio=omega*r/V_inf)
+
+
+def rotor_performance_derivatives(delta_Ct, delta_Cp, lambda_r, r, rpm, rho, V_inf, quadrature='trapz'):
+    """Derivatives of the rotor_performance outputs for a single rotor with
+    the stations along the 1-D arrays delta_Ct, delta_Cp and lambda_r.
+
+    Returns a dict keyed by the names in PERF_DERIV_OUTPUTS, each holding a
+    row with the columns ordered as PERF_DERIV_INPUTS.
+    """
+    n = lambda_r.shape[0]
+    zeros = np.zeros(n)
+
+    norm = (.5*rho*(V_inf**2)*(pi*r**2))
+    dnorm_dr = rho*(V_inf**2)*pi*r
+    dnorm_dV = rho*V_inf*(pi*r**2)
+    dnorm_drho = .5*(V_inf**2)*(pi*r**2)
+    lambda_max = lambda_r.max()
+    Ct = span_integral(delta_Ct, lambda_r, quadrature)
+    Cp = span_integral(delta_Cp, lambda_r, quadrature) * 8. / lambda_max**2
+
+    dCt_dy, dCt_dx = _integral_derivatives(delta_Ct, lambda_r, quadrature)
+    dCp_dy, dCp_dx = _integral_derivatives(delta_Cp, lambda_r, quadrature)
+    dCp_dy *= 8. / lambda_max**2
+    dCp_dx *= 8. / lambda_max**2
+    dCp_dx[lambda_r.argmax()] -= 2*Cp/lambda_max
+
+    J = V_inf/(rpm/60.0*2*r)
+    tip_speed_ratio = rpm*2*pi/60*r/V_inf
+
+    #columns are r, rpm, V, rho, delta_Ct[n], delta_Cp[n], lambda_r[n]
+    return dict(
+        Ct=np.hstack(([0, 0, 0, 0], dCt_dy, zeros, dCt_dx)),
+        Cp=np.hstack(([0, 0, 0, 0], zeros, dCp_dy, dCp_dx)),
+        net_thrust=np.hstack(([Ct*dnorm_dr, 0, Ct*dnorm_dV, Ct*dnorm_drho], dCt_dy*norm, zeros, dCt_dx*norm)),
+        net_power=np.hstack(([Cp*dnorm_dr*V_inf, 0, Cp*(dnorm_dV*V_inf+norm), Cp*dnorm_drho*V_inf],
+                             zeros, dCp_dy*norm*V_inf, dCp_dx*norm*V_inf)),
+        J=np.hstack(([-J/r, -J/rpm, J/V_inf, 0], zeros, zeros, zeros)),
+        tip_speed_ratio=np.hstack(([tip_speed_ratio/r, tip_speed_ratio/rpm, -tip_speed_ratio/V_inf, 0],
+                                   zeros, zeros, zeros)),
+    )
+
+
+def adaptive_performance(r_hub, r_tip, chord_hub, chord_tip, twist_hub, twist_tip, pitch, rpm, B, rho, V_inf,
+                         airfoil=DEFAULT_AIRFOIL, n_start=6, spacing='tip', quadrature='simpson',
+                         tol=1e-4, max_elements=200):
+    """AutoBEM performance, with stations inserted along the span until Cp settles.
+
+    The arguments match the AutoBEM inputs, with angles in deg. Starts from
+    n_start stations placed by spacing. Each pass then bisects the intervals
+    whose share of the Cp integral changes by at least half as much as the
+    worst one, solving only the new stations, until Cp changes by less than
+    tol from one pass to the next or max_elements stations are in use. All
+    stations keep the mean spacing of the n_start stations as their dr, so
+    Ct stays that of an n_start element AutoBEM.
+
+    Returns the rotor_performance dict plus r, the radii of the stations,
+    n_elements, n_passes, and converged, which is False if Cp did not settle
+    or some station has no solution.
+    """
+    dr = (r_tip-r_hub)/(n_start-1.)
+
+    def solve(span):
+        r = r_hub + (r_tip-r_hub)*span
+        chord = chord_hub + (chord_tip-chord_hub)*span
+        twist = (twist_hub + (twist_tip-twist_hub)*span + pitch)*pi/180
+        return element_performance(r, dr, chord, twist, rpm, B, rho, V_inf, airfoil)
+
+    span = span_fractions(n_start, spacing)
+    elements = solve(span)
+    perf = rotor_performance(elements['delta_Ct'], elements['delta_Cp'], elements['lambda_r'],
+                             r_tip, rpm, rho, V_inf, quadrature)
+    settled = False
+    n_passes = 0
+    while span.size < max_elements:
+        indicator = np.abs(np.diff(elements['delta_Cp']))*np.diff(elements['lambda_r'])
+        split = np.nonzero(indicator >= .5*indicator.max())[0]
+        if span.size + split.size > max_elements:
+            split = np.sort(split[np.argsort(-indicator[split])[:max_elements-span.size]])
+
+        new_span = .5*(span[split]+span[split+1])
+        new = solve(new_span)
+        order = np.argsort(np.hstack((span, new_span)))
+        span = np.hstack((span, new_span))[order]
+        for name, value in elements.items():
+            if np.ndim(value):
+                elements[name] = np.hstack((value, new[name]))[order]
+
+        previous = perf['Cp']
+        perf = rotor_performance(elements['delta_Ct'], elements['delta_Cp'], elements['lambda_r'],
+                                 r_tip, rpm, rho, V_inf, quadrature)
+        n_passes += 1
+        if abs(perf['Cp']-previous) < tol:
+            settled = True
+            break
+
+    perf.update(r=r_hub + (r_tip-r_hub)*span, n_elements=span.size, n_passes=n_passes,
+                converged=settled and bool(elements['converged'].all()))
+    return perf
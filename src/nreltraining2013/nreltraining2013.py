@@ -1,14 +1,28 @@
-__all__ = ['ActuatorDisk', 'BEM', 'AutoBEM', 'BladeElement', 'BEMPerf', 'BEMPerfData']
+__all__ = ['ActuatorDisk', 'ActuatorDiskArray', 'BEM', 'AutoBEM', 'BladeElement', 'BladeElementArray',
+           'BEMPerf', 'BEMPerfData', 'SpanDistribution', 'AdaptiveBEM',
+           'solve_inflow', 'element_performance', 'element_derivatives',
+           'rotor_performance', 'adaptive_performance', 'span_fractions', 'quadrature_weights',
+           'actuator_disk', 'actuator_disk_derivatives', 'betz_optimum',
+           'AUTO_VECTORIZE_ELEMENTS', 'SPACINGS', 'QUADRATURES']
 
-from math import pi, cos, sin, tan
+from math import pi
 
 import numpy as np
-from scipy.optimize import fsolve
-from scipy.interpolate import interp1d
 
 from openmdao.main.api import Component, Assembly, VariableTree
-from openmdao.lib.datatypes.api import Float, Int, Array, VarTree
-from openmdao.lib.components.api import LinearDistribution
+from openmdao.lib.datatypes.api import Float, Int, Array, VarTree, Enum, Bool, Str
+
+from .airfoils import DEFAULT_AIRFOIL, get_polar
+from .cache import EvaluationCache, make_key
+from .instrumentation import Instrumentation, ChangeTracker
+from .kernel import (actuator_disk, actuator_disk_derivatives, betz_optimum, span_fractions, quadrature_weights,
+                     coeff_lookup, coeff_slopes, inflow_residual, solve_inflow, solve_element, element_loads,
+                     element_performance, element_derivatives, rotor_performance, rotor_performance_derivatives,
+                     adaptive_performance, DISK_DERIV_INPUTS, DISK_DERIV_OUTPUTS, BETZ_A, BETZ_CP,
+                     ELEMENT_DERIV_INPUTS, ELEMENT_DERIV_OUTPUTS, PERF_DERIV_OUTPUTS, SPACINGS, QUADRATURES, SOLVERS)
+
+#AutoBEM switches to a single BladeElementArray above this many elements
+AUTO_VECTORIZE_ELEMENTS = 50
 
 
 class ActuatorDisk(Component):
@@ -28,22 +42,67 @@ class ActuatorDisk(Component):
     Cp = Float(iotype="out", desc="Power Coefficient")
     power = Float(iotype="out", desc="Power produced by the rotor", units="W")
 
+    #closed form optimum
+    a_opt = Float(BETZ_A, iotype="out", desc="Induced Velocity Factor that maximizes power (Betz limit)")
+    Cp_opt = Float(BETZ_CP, iotype="out", desc="Power Coefficient at the Betz limit")
+    power_opt = Float(iotype="out", desc="Power produced at the Betz limit", units="W")
+
     def execute(self):
-        #we use 'a' and 'V0' a lot, so make method local variables
+        for name, value in actuator_disk(self.a, self.Vu, self.Area, self.rho).iteritems():
+            setattr(self, name, value)
+
+    def list_deriv_vars(self):
+        return DISK_DERIV_INPUTS, DISK_DERIV_OUTPUTS
 
-        a = self.a
-        Vu = self.Vu
+    def provideJ(self):
+        derivs = actuator_disk_derivatives(self.a, self.Vu, self.Area, self.rho)
+        self.J = np.array([derivs[name] for name in DISK_DERIV_OUTPUTS])
+        return self.J
 
-        qA = .5*self.rho*self.Area*Vu**2
 
-        self.Vd = Vu*(1-2 * a)
-        self.Vr = .5*(self.Vu + self.Vd)
+class ActuatorDiskArray(Component):
+    """ActuatorDisk for n operating points at once, for sweeps over a, Vu, Area and rho"""
 
-        self.Ct = 4*a*(1-a)
-        self.thrust = self.Ct*qA
+    #closed form optimum
+    a_opt = Float(BETZ_A, iotype="out", desc="Induced Velocity Factor that maximizes power (Betz limit)")
+    Cp_opt = Float(BETZ_CP, iotype="out", desc="Power Coefficient at the Betz limit")
+
+    #this lets the size of the arrays vary for different numbers of operating points
+    def __init__(self, n=10):
+        super(ActuatorDiskArray, self).__init__()
+
+        inputs = [('a', "Induced Velocity Factor", .5, None),
+                  ('Area', "Rotor disk area", 10., "m**2"),
+                  ('rho', "air density", 1.225, "kg/m**3"),
+                  ('Vu', "Freestream air velocity, upstream of rotor", 10., "m/s")]
+        for name, desc, value, units in inputs:
+            self.add(name, Array(iotype='in', desc='%s at %d operating points' % (desc, n),
+                                 default_value=value*np.ones((n,)), shape=(n,), dtype=Float, units=units))
+
+        outputs = [('Vr', "Air velocity at rotor exit plane", "m/s"),
+                   ('Vd', "Slipstream air velocity, dowstream of rotor", "m/s"),
+                   ('Ct', "Thrust Coefficient", None),
+                   ('thrust', "Thrust produced by the rotor", "N"),
+                   ('Cp', "Power Coefficient", None),
+                   ('power', "Power produced by the rotor", "W"),
+                   ('power_opt', "Power produced at the Betz limit", "W")]
+        for name, desc, units in outputs:
+            self.add(name, Array(iotype='out', desc='%s at %d operating points' % (desc, n),
+                                 default_value=np.zeros((n,)), shape=(n,), dtype=Float, units=units))
+
+    def execute(self):
+        for name, value in actuator_disk(self.a, self.Vu, self.Area, self.rho).iteritems():
+            setattr(self, name, value)
 
-        self.Cp = self.Ct*(1-a)
-        self.power = self.Cp*qA*Vu
+    def list_deriv_vars(self):
+        return DISK_DERIV_INPUTS, DISK_DERIV_OUTPUTS
+
+    def provideJ(self):
+        """Each operating point only depends on its own inputs, so every block is diagonal"""
+        derivs = actuator_disk_derivatives(self.a, self.Vu, self.Area, self.rho)
+        self.J = np.vstack([np.hstack([np.diag(derivs[name][:, i]) for i in range(len(DISK_DERIV_INPUTS))])
+                            for name in DISK_DERIV_OUTPUTS])
+        return self.J
 
 
 class FlowConditions(VariableTree):
@@ -70,6 +129,8 @@ class BEMPerf(Component):
     rpm = Float(2100, iotype="in", desc="rotations per minute", low=0, units="min**-1")
 
     free_stream = VarTree(FlowConditions(), iotype="in")
+    quadrature = Enum('trapz', QUADRATURES, iotype="in",
+                      desc="rule used to integrate along the span, see quadrature_weights")
 
     data = VarTree(BEMPerfData(), iotype="out")
 
@@ -91,21 +152,64 @@ class BEMPerf(Component):
 
     def execute(self):
         self.data = BEMPerfData()  # empty the variable tree
+        perf = rotor_performance(self.delta_Ct, self.delta_Cp, self.lambda_r, self.r, self.rpm,
+                                 self.free_stream.rho, self.free_stream.V, self.quadrature)
+        for name, value in perf.iteritems():
+            setattr(self.data, name, value)
+
+    def list_deriv_vars(self):
+        return (('r', 'rpm', 'free_stream.V', 'free_stream.rho', 'delta_Ct', 'delta_Cp', 'lambda_r'),
+                tuple('data.'+name for name in PERF_DERIV_OUTPUTS))
+
+    def provideJ(self):
+        derivs = rotor_performance_derivatives(self.delta_Ct, self.delta_Cp, self.lambda_r, self.r, self.rpm,
+                                               self.free_stream.rho, self.free_stream.V, self.quadrature)
+        self.J = np.array([derivs[name] for name in PERF_DERIV_OUTPUTS])
+        return self.J
+
+
+class SpanDistribution(Component):
+    """Drop-in for LinearDistribution that provides analytic derivatives.
+
+    The spacing input places the output values along the span, see
+    span_fractions. delta is the mean spacing, which is the spacing of
+    every element for the default 'linear' spacing.
+    """
+
+    #units are set per instance, so all of the variables are added in __init__
+    def __init__(self, n=10, units=None):
+        super(SpanDistribution, self).__init__()
+
+        self._n = n
+        self.add('start', Float(iotype="in", desc="value of the first element of the output array", units=units))
+        self.add('end', Float(iotype="in", desc="value of the last element of the output array", units=units))
+        self.add('offset', Float(0, iotype="in", desc="value added to every element of the output array",
+                                 units=units))
+        self.add('spacing', Enum('linear', SPACINGS, iotype="in",
+                                 desc="how the elements are spread from start to end, see span_fractions"))
+        self.add('output', Array(iotype='out', desc='%d values spread from start to end' % n,
+                                 default_value=np.zeros((n,)), shape=(n,), dtype=Float, units=units))
+        self.add('delta', Float(iotype="out", desc="mean spacing between the elements of the output array",
+                                units=units))
 
-        V_inf = self.free_stream.V
-        rho = self.free_stream.rho
-
-        norm = (.5*rho*(V_inf**2)*(pi*self.r**2))
-        self.data.Ct = np.trapz(self.delta_Ct, x=self.lambda_r)
-        self.data.net_thrust = self.data.Ct*norm
+    def execute(self):
+        if self.spacing == 'linear':
+            self.output = np.linspace(self.start, self.end, self._n) + self.offset
+        else:
+            self.output = self.start + (self.end-self.start)*span_fractions(self._n, self.spacing) + self.offset
+        self.delta = (self.end-self.start)/(self._n-1)
 
-        self.data.Cp = np.trapz(self.delta_Cp, x=self.lambda_r) * 8. / self.lambda_r.max()**2
-        self.data.net_power = self.data.Cp*norm*V_inf
+    def list_deriv_vars(self):
+        return ('start', 'end', 'offset'), ('output', 'delta')
 
-        self.data.J = V_inf/(self.rpm/60.0*2*self.r)
+    def provideJ(self):
+        span = span_fractions(self._n, self.spacing)
+        step = 1./(self._n-1)
 
-        omega = self.rpm*2*pi/60
-        self.data.tip_speed_ratio = omega*self.r/self.free_stream.V
+        #columns are start, end, offset
+        self.J = np.vstack((np.column_stack((1-span, span, np.ones(self._n))),
+                            [-step, step, 0]))
+        return self.J
 
 
 class BEM(Assembly):
@@ -128,8 +232,38 @@ class BEM(Assembly):
     def __init__(self):
         super(BEM, self).__init__()
         self.add('free_stream', FlowConditions())
+        self.instrumentation = None
+        self.change_tracker = None
+
+    def instrument(self, enabled=True):
+        """Turns the collection of timing and solver statistics for the
+        components of this rotor on or off. Returns the Instrumentation that
+        holds them, see its report and format_report methods."""
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation(self)
+        if enabled:
+            self.instrumentation.enable()
+        else:
+            self.instrumentation.disable()
+        return self.instrumentation
+
+    def track_changes(self, enabled=True, tolerance=None):
+        """Turns the skipping of components whose inputs have not changed
+        since their last run on or off. With a tolerance, blade elements
+        whose inputs all moved by less than that relative amount are skipped
+        as well. Returns the ChangeTracker that counts the skipped runs."""
+        if self.change_tracker is None:
+            self.change_tracker = ChangeTracker(self, tolerant=self._elements)
+        if tolerance is not None:
+            self.change_tracker.tolerance = tolerance
+        if enabled:
+            self.change_tracker.enable()
+        else:
+            self.change_tracker.disable()
+        return self.change_tracker
 
     def configure(self):
+        self._elements = ['BE0', 'BE1', 'BE2']
         self.add('BE0', BladeElement())
         self.add('BE1', BladeElement())
         self.add('BE2', BladeElement())
@@ -156,10 +290,44 @@ class BEM(Assembly):
 
 
 class AutoBEM(BEM):
-    """Blade Rotor with user specified number BladeElements"""
-
-    def __init__(self, n_elements=6):
+    """Blade Rotor with user specified number BladeElements.
+
+    With vectorize=True all of the stations are handled by a single
+    BladeElementArray component named 'blade' instead of one BladeElement
+    component per station. That layout needs a fixed number of components
+    and whole-array connections, so it stays cheap to build at any
+    resolution. vectorize=None uses it for more than AUTO_VECTORIZE_ELEMENTS
+    stations. The default, vectorize=False, keeps one BladeElement (BE0,
+    BE1, ...) per station, solved with fsolve, at any size.
+
+    The spacing input places the stations along the span (see
+    span_fractions) and quadrature picks the rule perf integrates them with
+    (see quadrature_weights). The Cp integrand has kinks from the linearly
+    interpolated polars, so neither is more accurate than the defaults in
+    general. Every element keeps the mean station spacing as its dr.
+
+    With cache_size > 0 the rotor keeps the BEMPerfData of its last
+    cache_size distinct input sets in result_cache, an EvaluationCache, and
+    skips its workflow when the inputs repeat. Besides the inputs the cache
+    key covers the layout, warm_start and the tables of the airfoil polar,
+    not just its name. cache_file additionally
+    stores every result in a shelve file that later runs can reuse. On a
+    cache hit only data is updated, the internal components keep the values
+    of their last run. The cached data is not connected to perf, so
+    gradients of a cached rotor have to be taken with finite differences.
+    """
+
+    airfoil = Str(DEFAULT_AIRFOIL, iotype="in", desc="name of the airfoil polar used by every blade element")
+    warm_start = Bool(False, iotype="in", desc="seed each blade element solve from its previous solution")
+    spacing = Enum('linear', SPACINGS, iotype="in", desc="how the stations are spread along the span")
+    quadrature = Enum('trapz', QUADRATURES, iotype="in", desc="rule used to integrate along the span")
+
+    def __init__(self, n_elements=6, vectorize=False, cache_size=0, cache_file=None):
         self._n_elements = n_elements
+        if vectorize is None:
+            vectorize = n_elements > AUTO_VECTORIZE_ELEMENTS
+        self._vectorize = vectorize
+        self.result_cache = EvaluationCache(cache_size, cache_file) if cache_size > 0 else None
         super(AutoBEM, self).__init__()
 
     def configure(self):
@@ -168,28 +336,60 @@ class AutoBEM(BEM):
 
         n_elements = self._n_elements
 
-        self.add('radius_dist', LinearDistribution(n=n_elements, units="m"))
+        self.add('radius_dist', SpanDistribution(n=n_elements, units="m"))
         self.connect('r_hub', 'radius_dist.start')
         self.connect('r_tip', 'radius_dist.end')
 
-        self.add('chord_dist', LinearDistribution(n=n_elements, units="m"))
+        self.add('chord_dist', SpanDistribution(n=n_elements, units="m"))
         self.connect('chord_hub', 'chord_dist.start')
         self.connect('chord_tip', 'chord_dist.end')
 
-        self.add('twist_dist', LinearDistribution(n=n_elements, units="deg"))
+        self.add('twist_dist', SpanDistribution(n=n_elements, units="deg"))
         self.connect('twist_hub', 'twist_dist.start')
         self.connect('twist_tip', 'twist_dist.end')
         self.connect('pitch', 'twist_dist.offset')
 
+        self.connect('spacing', 'radius_dist.spacing')
+        self.connect('spacing', 'chord_dist.spacing')
+        self.connect('spacing', 'twist_dist.spacing')
+
         self.driver.workflow.add('chord_dist')
         self.driver.workflow.add('radius_dist')
         self.driver.workflow.add('twist_dist')
 
         self.add('perf', BEMPerf(n=n_elements))
-        self.create_passthrough('perf.data')
+        if self.result_cache is None:
+            self.create_passthrough('perf.data')
+        else:
+            #filled in by execute, from the cache or from perf
+            self.add('data', VarTree(BEMPerfData(), iotype="out"))
         self.connect('r_tip', 'perf.r')
         self.connect('rpm', 'perf.rpm')
         self.connect('free_stream', 'perf.free_stream')
+        self.connect('quadrature', 'perf.quadrature')
+
+        if self._vectorize:
+            self._elements = ['blade']
+            self.add('blade', BladeElementArray(n=n_elements))
+            self.driver.workflow.add('blade')
+            self.connect('radius_dist.output', 'blade.r')
+            self.connect('radius_dist.delta', 'blade.dr')
+            self.connect('twist_dist.output', 'blade.twist')
+            self.connect('chord_dist.output', 'blade.chord')
+
+            self.connect('B', 'blade.B')
+            self.connect('rpm', 'blade.rpm')
+            self.connect('airfoil', 'blade.airfoil')
+            self.connect('warm_start', 'blade.warm_start')
+
+            self.connect('free_stream.rho', 'blade.rho')
+            self.connect('free_stream.V', 'blade.V_inf')
+            self.connect('blade.delta_Ct', 'perf.delta_Ct')
+            self.connect('blade.delta_Cp', 'perf.delta_Cp')
+            self.connect('blade.lambda_r', 'perf.lambda_r')
+
+            self.driver.workflow.add('perf')
+            return
 
         self._elements = []
         for i in range(n_elements):
@@ -204,6 +404,8 @@ class AutoBEM(BEM):
 
             self.connect('B', name+'.B')
             self.connect('rpm', name+'.rpm')
+            self.connect('airfoil', name+'.airfoil')
+            self.connect('warm_start', name+'.warm_start')
 
             self.connect('free_stream.rho', name+'.rho')
             self.connect('free_stream.V', name+'.V_inf')
@@ -214,6 +416,25 @@ class AutoBEM(BEM):
 
         self.driver.workflow.add('perf')
 
+    def execute(self):
+        if self.result_cache is None:
+            super(AutoBEM, self).execute()
+            return
+
+        #the layout and warm starts change the solver path, the polar is hashed by its tables
+        key = make_key(self._n_elements, self._vectorize, self.warm_start, get_polar(self.airfoil).key,
+                       self.spacing, self.quadrature, self.r_hub, self.r_tip, self.chord_hub, self.chord_tip,
+                       self.twist_hub, self.twist_tip, self.pitch, self.rpm, self.B,
+                       self.free_stream.rho, self.free_stream.V)
+        perf = self.result_cache.get(key)
+        if perf is None:
+            super(AutoBEM, self).execute()
+            perf = dict((name, getattr(self.perf.data, name)) for name in self.perf.data.list_vars())
+            self.result_cache.put(key, perf)
+
+        for name, value in perf.iteritems():
+            setattr(self.data, name, value)
+
 
 class BladeElement(Component):
     """Calculations for a single radial slice of a rotor blade"""
@@ -231,6 +452,12 @@ class BladeElement(Component):
     rho = Float(1.225, iotype="in", desc="air density", units="kg/m**3")
     V_inf = Float(7, iotype="in", desc="free stream air velocity", units="m/s")
 
+    airfoil = Str(DEFAULT_AIRFOIL, iotype="in", desc="name of the airfoil polar, see airfoils.get_polar")
+    warm_start = Bool(False, iotype="in",
+                      desc="seed the solve from the last converged solution instead of a_init, b_init")
+    solver = Enum('fsolve', SOLVERS, iotype="in",
+                  desc="'fsolve' iterates on (a, b) together, 'bracket' does a bracketed root find in phi")
+
     #outputs
     V_0 = Float(iotype="out", desc="axial flow at propeller disk", units="m/s")
     V_1 = Float(iotype="out", desc="local flow velocity", units="m/s")
@@ -244,51 +471,173 @@ class BladeElement(Component):
     b = Float(iotype="out", desc="converged value for radial inflow factor")
     lambda_r = Float(8, iotype="out", desc="local tip speed ratio")
     phi = Float(1.487, iotype="out", desc="relative flow angle onto blades", units="rad")
+    n_iter = Int(iotype="out", desc="residual evaluations used by the solver")
+    converged = Bool(True, iotype="out", desc="False if the solver did not find a solution")
 
     def __init__(self):
         super(BladeElement, self).__init__()
 
-        #rough linear interpolation from naca 0012 airfoil data
-        rad = np.array([0., 13., 15, 20, 30])*pi/180
-        self.cl_interp = interp1d(rad, [0, 1.3, .8, .7, 1.1], fill_value=0.001, bounds_error=False)
-
-        rad = np.array([0., 10, 20, 30, 40])*pi/180
-        self.cd_interp = interp1d(rad, [0., 0., 0.3, 0.6, 1.], fill_value=0.001, bounds_error=False)
-
-    def _coeff_lookup(self, i):
-        C_L = self.cl_interp(i)
-        C_D = self.cd_interp(i)
-        return C_D, C_L
+        #last converged (a, b, phi), used by warm_start
+        self._warm = None
 
     def execute(self):
         self.sigma = self.B*self.chord / (2 * np.pi * self.r)
         self.omega = self.rpm*2*pi/60.0
-        omega_r = self.omega*self.r
-        self.lambda_r = self.omega*self.r/self.V_inf  # need lambda_r for iterates
-
-        result = fsolve(self._iteration, [self.a_init, self.b_init])
-        self.a = result[0]
-        self.b = result[1]
-
-        self.V_0 = self.V_inf - self.a*self.V_inf
-        self.V_2 = omega_r-self.b*omega_r
-        self.V_1 = (self.V_0**2+self.V_2**2)**.5
-
-        q_c = self.B*.5*(self.rho*self.V_1**2)*self.chord*self.dr
-        cos_phi = cos(self.phi)
-        sin_phi = sin(self.phi)
-        C_D, C_L = self._coeff_lookup(self.alpha)
-        self.delta_Ct = q_c*(C_L*cos_phi-C_D*sin_phi)/(.5*self.rho*(self.V_inf**2)*(pi*self.r**2))
-        self.delta_Cp = self.b*(1-self.a)*self.lambda_r**3*(1-C_D/C_L*tan(self.phi))
-
-    def _iteration(self, X):
-        self.phi = np.arctan(self.lambda_r*(1+X[1])/(1-X[0]))
-        self.alpha = pi/2-self.twist-self.phi
-        C_D, C_L = self._coeff_lookup(self.alpha)
-        self.a = 1./(1 + 4.*(np.cos(self.phi)**2)/(self.sigma*C_L*np.sin(self.phi)))
-        self.b = (self.sigma*C_L) / (4 * self.lambda_r * np.cos(self.phi)) * (1 - self.a)
-
-        return (X[0]-self.a), (X[1]-self.b)
+        self.lambda_r = self.omega*self.r/self.V_inf
+
+        warm = self._warm if self.warm_start else None
+        solution = solve_element(self.lambda_r, self.sigma, self.twist, self.r, self.airfoil, self.solver,
+                                 (self.a_init, self.b_init), warm)
+        for name, value in solution.iteritems():
+            setattr(self, name, value)
+        if self.converged:
+            self._warm = (self.a, self.b, self.phi)
+
+        loads = element_loads(self.a, self.b, self.phi, self.alpha, self.r, self.dr, self.chord,
+                              self.rpm, self.B, self.rho, self.V_inf, self.airfoil)
+        for name, value in loads.iteritems():
+            setattr(self, name, value)
+
+    def list_deriv_vars(self):
+        return ELEMENT_DERIV_INPUTS, ELEMENT_DERIV_OUTPUTS
+
+    def provideJ(self):
+        """Analytic derivatives of the converged element, see element_derivatives"""
+        derivs = element_derivatives(self.phi, self.r, self.dr, self.chord, self.twist,
+                                     self.rpm, self.B, self.rho, self.V_inf, self.airfoil)
+        self.J = np.array([derivs[name] for name in ELEMENT_DERIV_OUTPUTS])
+        return self.J
+
+class BladeElementArray(Component):
+    """Calculations for all radial slices of a rotor blade, solved together with array math"""
+
+    #inputs
+    rpm = Float(106.952, iotype="in", desc="rotations per minute", low=0, units="min**-1")
+    dr = Float(1., iotype="in", desc="width of the blade elements", units="m")
+    B = Int(3, iotype="in", desc="Number of blade elements")
+
+    rho = Float(1.225, iotype="in", desc="air density", units="kg/m**3")
+    V_inf = Float(7, iotype="in", desc="free stream air velocity", units="m/s")
+    airfoil = Str(DEFAULT_AIRFOIL, iotype="in", desc="name of the airfoil polar, see airfoils.get_polar")
+    warm_start = Bool(False, iotype="in", desc="seed each station from its last converged inflow angle")
+
+    #outputs
+    omega = Float(iotype="out", desc="average angular velocity for the elements", units="rad/s")
+
+    #this lets the size of the arrays vary for different numbers of elements
+    def __init__(self, n=10):
+        super(BladeElementArray, self).__init__()
+
+        self._n = n
+        #last converged inflow angles, nan where a station did not converge
+        self._warm_phi = None
+
+        self.add('r', Array(iotype='in', desc='mean radius of %d blade elements' % n,
+                            default_value=np.linspace(.2, 5., n), shape=(n,), dtype=Float, units="m"))
+        self.add('twist', Array(iotype='in', desc='local twist angle of %d blade elements' % n,
+                                default_value=np.zeros((n,)), shape=(n,), dtype=Float, units="rad"))
+        self.add('chord', Array(iotype='in', desc='local chord length of %d blade elements' % n,
+                                default_value=np.ones((n,)), shape=(n,), dtype=Float, units="m"))
+
+        outputs = [('V_0', "axial flow at propeller disk", "m/s"),
+                   ('V_1', "local flow velocity", "m/s"),
+                   ('V_2', "angular flow at propeller disk", "m/s"),
+                   ('sigma', "local solidity", None),
+                   ('alpha', "local angle of attack", "rad"),
+                   ('delta_Ct', "section thrust coefficient", "N"),
+                   ('delta_Cp', "section power coefficent", None),
+                   ('a', "converged value for axial inflow factor", None),
+                   ('b', "converged value for radial inflow factor", None),
+                   ('lambda_r', "local tip speed ratio", None),
+                   ('phi', "relative flow angle onto blades", "rad")]
+        for name, desc, units in outputs:
+            self.add(name, Array(iotype='out', desc='%s of %d blade elements' % (desc, n),
+                                 default_value=np.zeros((n,)), shape=(n,), dtype=Float, units=units))
+
+        self.add('n_iter', Array(iotype='out', desc='residual evaluations used for %d blade elements' % n,
+                                 default_value=np.zeros((n,), dtype=int), shape=(n,), dtype=int))
+        self.add('converged', Array(iotype='out', desc='False for any of %d blade elements without a solution' % n,
+                                    default_value=np.ones((n,), dtype=bool), shape=(n,), dtype=bool))
+
+    def execute(self):
+        results = element_performance(self.r, self.dr, self.chord, self.twist,
+                                      self.rpm, self.B, self.rho, self.V_inf, self.airfoil,
+                                      self._warm_phi if self.warm_start else None)
+        self._warm_phi = np.where(results['converged'], results['phi'], np.nan)
+        self.omega = results.pop('omega')
+        for name, value in results.iteritems():
+            setattr(self, name, value)
+
+    def list_deriv_vars(self):
+        return ELEMENT_DERIV_INPUTS, ELEMENT_DERIV_OUTPUTS
+
+    def provideJ(self):
+        """Analytic derivatives of the converged elements. Each station only
+        depends on its own r, twist and chord, so those blocks are diagonal."""
+        derivs = element_derivatives(self.phi, self.r, self.dr, self.chord, self.twist,
+                                     self.rpm, self.B, self.rho, self.V_inf, self.airfoil)
+        rows = []
+        for name in ELEMENT_DERIV_OUTPUTS:
+            partials = derivs[name]
+            rows.append(np.hstack([np.diag(partials[:, i]) if var in ('r', 'twist', 'chord') else partials[:, i:i+1]
+                                   for i, var in enumerate(ELEMENT_DERIV_INPUTS)]))
+        self.J = np.vstack(rows)
+        return self.J
+
+
+class AdaptiveBEM(Component):
+    """Rotor like AutoBEM, solved with as many blade elements as it takes
+    for data.Cp to settle to within tol, see adaptive_performance.
+
+    The number of elements can change from run to run, so the stations are
+    solved inside this one component rather than by connected BladeElements,
+    and gradients have to be taken with finite differences.
+    """
+
+    #rotor inputs, as in BEM
+    r_hub = Float(0.2, iotype="in", desc="blade hub radius", units="m", low=0)
+    twist_hub = Float(29, iotype="in", desc="twist angle at the hub radius", units="deg")
+    chord_hub = Float(.7, iotype="in", desc="chord length at the rotor hub", units="m", low=.05)
+    r_tip = Float(5, iotype="in", desc="blade tip radius", units="m")
+    twist_tip = Float(-3.58, iotype="in", desc="twist angle at the tip radius", units="deg")
+    chord_tip = Float(.187, iotype="in", desc="chord length at the rotor hub", units="m", low=.05)
+    pitch = Float(0, iotype="in", desc="overall blade pitch", units="deg")
+    rpm = Float(107, iotype="in", desc="rotations per minute", low=0, units="min**-1")
+    B = Int(3, iotype="in", desc="number of blades", low=1)
+    airfoil = Str(DEFAULT_AIRFOIL, iotype="in", desc="name of the airfoil polar used by every blade element")
+
+    free_stream = VarTree(FlowConditions(), iotype="in")
+
+    #refinement inputs
+    n_start = Int(6, iotype="in", desc="number of elements before any are inserted", low=2)
+    spacing = Enum('tip', SPACINGS, iotype="in", desc="how the starting elements are spread along the span")
+    quadrature = Enum('simpson', QUADRATURES, iotype="in", desc="rule used to integrate along the span")
+    tol = Float(1e-4, iotype="in", desc="change in Cp between passes that ends the refinement", low=0)
+    max_elements = Int(200, iotype="in", desc="most elements the refinement may use", low=2)
+
+    #outputs
+    data = VarTree(BEMPerfData(), iotype="out")
+    n_elements = Int(iotype="out", desc="number of elements in the refined blade")
+    converged = Bool(True, iotype="out", desc="False if Cp did not settle or some element has no solution")
+
+    def __init__(self):
+        super(AdaptiveBEM, self).__init__()
+
+        #needed initialization for VTs
+        self.add('data', BEMPerfData())
+        self.add('free_stream', FlowConditions())
+
+    def execute(self):
+        results = adaptive_performance(self.r_hub, self.r_tip, self.chord_hub, self.chord_tip,
+                                       self.twist_hub, self.twist_tip, self.pitch, self.rpm, self.B,
+                                       self.free_stream.rho, self.free_stream.V, self.airfoil,
+                                       self.n_start, self.spacing, self.quadrature, self.tol, self.max_elements)
+        self.data = BEMPerfData()  # empty the variable tree
+        for name in self.data.list_vars():
+            setattr(self.data, name, results[name])
+        self.n_elements = results['n_elements']
+        self.converged = results['converged']
+
 
 if __name__ == "__main__":
 
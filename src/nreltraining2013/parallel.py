@@ -0,0 +1,278 @@
+"""Evaluation of DOE cases, and multi-start optimization, on a pool of local processes.
+
+Each worker process builds its own copy of the model once, from a factory
+function, and then runs whole chunks of cases on it. Results come back in
+case order and are handed to the usual case recorders, so a
+ListCaseRecorder or CSVCaseRecorder ends up holding the same cases as it
+would after a serial DOEdriver run. run_multistart runs one local
+optimization per worker task instead, from a set of starting points.
+"""
+
+__all__ = ['autobem_top', 'doe_cases', 'run_cases', 'run_multistart']
+
+import multiprocessing
+import traceback
+from itertools import islice
+
+import numpy as np
+from scipy.optimize import fmin_slsqp
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.main.case import Case
+from openmdao.lib.doegenerators.api import LatinHypercube
+
+from .nreltraining2013 import AutoBEM
+
+#model owned by the current worker process
+_top = None
+
+#best objective reached by any finished multi-start run, shared by the workers
+_best = None
+
+
+def autobem_top(**kwargs):
+    """Top level assembly holding a single AutoBEM named 'b', as in the DOE
+    tests. Keyword arguments are passed on to AutoBEM."""
+    top = Assembly()
+    top.add('b', AutoBEM(**kwargs))
+    top.driver.workflow.add('b')
+    return top
+
+
+def doe_cases(generator, bounds):
+    """Scales the normalized cases of a DOEgenerator, such as FullFactorial,
+    to the (low, high) bounds of each parameter, the way DOEdriver does"""
+    generator.num_parameters = len(bounds)
+    for case in generator:
+        yield [low + (high-low)*value for value, (low, high) in zip(case, bounds)]
+
+
+def _init_worker(factory):
+    global _top
+    _top = set_as_top(factory())
+
+
+def _run_chunk(args):
+    parameters, outputs, chunk = args
+    results = []
+    for values in chunk:
+        try:
+            for name, value in zip(parameters, values):
+                _top.set(name, value)
+            _top.run()
+            results.append((values, [_top.get(name) for name in outputs], None))
+        except Exception:
+            results.append((values, [None]*len(outputs), traceback.format_exc()))
+    return results
+
+
+def _chunks(cases, chunk_size):
+    cases = iter(cases)
+    while True:
+        chunk = [list(values) for values in islice(cases, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_cases(factory, parameters, cases, outputs, recorders=(), n_workers=None, chunk_size=8):
+    """Runs every case on a model built by factory and records the results.
+
+    factory: picklable callable, such as a module level function or a
+             functools.partial of one, that returns a new top level assembly
+    parameters: paths of the inputs set for each case, e.g. 'b.rpm'
+    cases: iterable with one sequence of parameter values per case
+    outputs: paths of the outputs recorded for each case, e.g. 'b.data.Cp'
+    recorders: case recorders that get each Case, in case order
+    n_workers: number of worker processes, defaults to the number of cores.
+               With n_workers=1 the cases run in this process.
+    chunk_size: number of cases sent to a worker at a time
+
+    Returns the list of recorded Cases. A case that raises is recorded with
+    its traceback in msg and None for its outputs, like in DOEdriver.
+    """
+    global _top
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if n_workers < 1 or chunk_size < 1:
+        raise ValueError("n_workers and chunk_size must be at least 1, got %s and %s" % (n_workers, chunk_size))
+
+    parameters = list(parameters)
+    outputs = list(outputs)
+    jobs = ((parameters, outputs, chunk) for chunk in _chunks(cases, chunk_size))
+
+    #built here first, so a factory that raises fails at once instead of in every pool worker,
+    #which a Python 2 Pool would keep replacing forever
+    top = set_as_top(factory())
+    pool = None if n_workers == 1 else multiprocessing.Pool(n_workers, initializer=_init_worker,
+                                                             initargs=(factory,))
+    saved = _top
+    recorded = []
+    try:
+        if pool is None:
+            _top = top
+            results = (_run_chunk(job) for job in jobs)
+        else:
+            results = pool.imap(_run_chunk, jobs)
+
+        for recorder in recorders:
+            recorder.startup()
+
+        for chunk_results in results:
+            for values, output_values, msg in chunk_results:
+                case = Case(inputs=zip(parameters, values), outputs=zip(outputs, output_values), msg=msg)
+                for recorder in recorders:
+                    recorder.record(case)
+                recorded.append(case)
+    finally:
+        if pool is None:
+            _top = saved
+        else:
+            #every result has been collected unless recording failed
+            pool.terminate()
+            pool.join()
+        #also after a failure, so recorders that buffer keep the cases recorded so far
+        for recorder in recorders:
+            recorder.close()
+
+    return recorded
+
+
+class _Dominated(Exception):
+    """Raised to stop a local optimization that is clearly worse than the best one"""
+    pass
+
+
+def _init_multistart(factory, best):
+    global _best
+    _init_worker(factory)
+    _best = best
+
+
+def _optimize(args):
+    """One SLSQP run from start. The parameters are scaled to the unit box
+    and the objective is always minimized, its sign flipped to maximize."""
+    parameters, objective, sign, start, max_iter, tol, min_iter, margin = args
+    names = [parameter[0] for parameter in parameters]
+    low = np.array([parameter[1] for parameter in parameters], dtype=float)
+    width = np.array([parameter[2] for parameter in parameters], dtype=float) - low
+    state = dict(n_eval=0, n_iter=0, x=None, f=None, last=np.inf)
+
+    def evaluate(u):
+        #SLSQP can step slightly outside its bounds in the line search
+        u = np.clip(u, 0., 1.)
+        if state['x'] is None or (u != state['x']).any():
+            for name, value in zip(names, low + width*u):
+                _top.set(name, value)
+            _top.run()
+            state['n_eval'] += 1
+            state['x'] = np.array(u)
+            state['f'] = sign*_top.get(objective)
+        return state['f']
+
+    def gradient(u):
+        evaluate(u)
+        J = _top.driver.workflow.calc_gradient(inputs=names, outputs=[objective])
+        return sign*np.asarray(J)[0]*width
+
+    def callback(u):
+        f = evaluate(u)
+        state['n_iter'] += 1
+        gap = f - _best.value
+        #clearly dominated: well above a finished optimum and no longer closing the gap quickly
+        if state['n_iter'] >= min_iter and gap > margin*abs(_best.value) and state['last']-f < gap:
+            raise _Dominated()
+        state['last'] = f
+
+    u0 = np.clip((np.asarray(start, dtype=float) - low)/width, 0., 1.)
+    result = dict(start=list(start), x=None, objective=None, n_iter=0, n_eval=0, status='failed', msg=None)
+    try:
+        u, f, n_iter, mode, message = fmin_slsqp(evaluate, u0, bounds=[(0., 1.)]*len(names), fprime=gradient,
+                                                 iter=max_iter, acc=tol, iprint=0, full_output=True,
+                                                 callback=callback)
+        u = np.clip(u, 0., 1.)
+        f = evaluate(u)
+        if not np.isfinite(f):
+            raise ValueError("%s is %s at the end of the run" % (objective, f))
+        result['status'] = 'converged' if mode == 0 else 'stopped'
+        result['msg'] = message
+        with _best.get_lock():
+            _best.value = min(_best.value, f)
+    except _Dominated:
+        result['status'] = 'cancelled'
+        u, f = state['x'], state['f']
+    except Exception:
+        result['msg'] = traceback.format_exc()
+        return result
+
+    result.update(x=list(low + width*u), objective=sign*f, n_iter=state['n_iter'], n_eval=state['n_eval'])
+    return result
+
+
+def run_multistart(factory, parameters, objective, n_starts=8, starts=None, maximize=False, n_workers=None,
+                   max_iter=100, tol=1e-6, min_iter=3, margin=.1):
+    """Runs a local SLSQP optimization from each of several starting points
+    and collects the local optima they reach.
+
+    factory: picklable callable that returns a new top level assembly, as
+             for run_cases. Gradients come from its driver's workflow.
+    parameters: (path, low, high) of each design variable
+    objective: path of the output to minimize, or to maximize with maximize=True
+    n_starts: number of Latin hypercube starting points, when starts is None
+    starts: sequences of parameter values to start from instead
+    n_workers: number of worker processes, defaults to the number of cores.
+               With n_workers=1 the runs happen in this process, one after another.
+    max_iter, tol: SLSQP iteration limit and accuracy, on the scaled design variables
+    min_iter, margin: a run is cancelled once it has done min_iter iterations
+                      if its objective is worse than the best optimum any
+                      run has finished with by more than margin times that
+                      optimum, and its last iteration improved it by less
+                      than the difference. Which runs get cancelled depends
+                      on the order runs finish in.
+
+    Returns a dict with
+
+    best: result of the run that found the best objective, None if all failed
+    results: result of every run, in the order of the starts. Each is a dict
+             with start, x (the final parameter values), objective, n_iter,
+             n_eval, status ('converged', 'stopped' at max_iter or for another
+             SLSQP reason, 'cancelled' or 'failed') and msg (the SLSQP exit
+             message, or the traceback of a failed run)
+    optima: final parameter values of the runs that were not cancelled or
+            failed, one row per run, the distribution of local optima
+    objectives: the objective at each row of optima
+    """
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if n_workers < 1:
+        raise ValueError("n_workers must be at least 1, got %s" % n_workers)
+
+    parameters = [tuple(parameter) for parameter in parameters]
+    if starts is None:
+        starts = doe_cases(LatinHypercube(n_starts), [(low, high) for name, low, high in parameters])
+    sign = -1. if maximize else 1.
+    jobs = [(parameters, objective, sign, list(start), max_iter, tol, min_iter, margin) for start in starts]
+
+    global _top, _best
+    best = multiprocessing.Value('d', np.inf)
+    if n_workers == 1:
+        saved = _top, _best
+        _init_multistart(factory, best)
+        try:
+            results = [_optimize(job) for job in jobs]
+        finally:
+            _top, _best = saved
+    else:
+        pool = multiprocessing.Pool(n_workers, initializer=_init_multistart, initargs=(factory, best))
+        try:
+            results = pool.map(_optimize, jobs, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    finished = [result for result in results if result['status'] in ('converged', 'stopped')]
+    ranked = sorted(finished or [result for result in results if result['objective'] is not None],
+                    key=lambda result: sign*result['objective'])
+    return dict(best=ranked[0] if ranked else None, results=results,
+                optima=np.array([result['x'] for result in finished]).reshape(-1, len(parameters)),
+                objectives=np.array([result['objective'] for result in finished]))
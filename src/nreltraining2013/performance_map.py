@@ -0,0 +1,157 @@
+"""Cp and Ct maps over tip speed ratio and pitch for a fixed rotor geometry"""
+
+__all__ = ['GEOMETRY_VARS', 'PerformanceMap', 'build_performance_map', 'geometry_key']
+
+import json
+import os
+from math import pi
+
+import numpy as np
+
+from .airfoils import get_polar
+from .batch import DESIGN_VARS, evaluate_designs
+from .cache import make_key
+
+#AutoBEM inputs that fix the rotor a map is valid for, along with its number of elements
+GEOMETRY_VARS = ('r_hub', 'chord_hub', 'chord_tip', 'twist_hub', 'twist_tip', 'r_tip', 'B', 'airfoil',
+                 'spacing', 'quadrature')
+
+#free stream velocity the map is computed at. The blade element solution
+#depends only on the tip speed ratio, not on the wind speed itself
+_V_REF = 8.
+
+
+def _geometry(rotor):
+    geometry = dict((name, getattr(rotor, name)) for name in GEOMETRY_VARS)
+    geometry['n_elements'] = rotor._n_elements
+    return geometry
+
+
+def geometry_key(rotor, tsr, pitch):
+    """Key of the map for the geometry of rotor, an AutoBEM, over the grids tsr and pitch.
+    The airfoil polar is hashed by its tables, not just its name."""
+    geometry = _geometry(rotor)
+    geometry['airfoil'] = get_polar(geometry['airfoil']).key
+    return make_key(*([geometry[name] for name in sorted(geometry)] + [tsr, pitch]))
+
+
+def _locate(grid, x):
+    """Cell of grid each x falls in, and the fractional position inside it.
+    The position is nan for x outside the grid."""
+    i = np.clip(np.searchsorted(grid, x, side='right')-1, 0, len(grid)-2)
+    t = (x-grid[i])/(grid[i+1]-grid[i])
+    with np.errstate(invalid='ignore'):
+        t[(t < 0) | (t > 1)] = np.nan
+    return i, t
+
+
+class PerformanceMap(object):
+    """Cp and Ct of one rotor over a grid of tip speed ratios and pitch
+    angles (deg).
+
+    Calling the map with arrays of tip speed ratio and pitch interpolates
+    Cp and Ct bilinearly, with plain array math and no model runs. Points
+    outside the grid get nan. converged is False where some blade element
+    of the rotor had no solution.
+    """
+
+    def __init__(self, tsr, pitch, Cp, Ct, converged, geometry, key=None):
+        self.tsr = np.asarray(tsr, dtype=float)
+        self.pitch = np.asarray(pitch, dtype=float)
+        shape = (self.tsr.size, self.pitch.size)
+        self.Cp = np.asarray(Cp, dtype=float).reshape(shape)
+        self.Ct = np.asarray(Ct, dtype=float).reshape(shape)
+        self.converged = np.asarray(converged, dtype=bool).reshape(shape)
+        self.geometry = geometry
+        self.key = key
+
+    def __call__(self, tsr, pitch):
+        """Interpolated Cp and Ct at each pair of tsr and pitch, which are
+        broadcast against each other"""
+        tsr, pitch = np.broadcast_arrays(np.asarray(tsr, dtype=float), np.asarray(pitch, dtype=float))
+        i, t = _locate(self.tsr, tsr.ravel())
+        j, u = _locate(self.pitch, pitch.ravel())
+
+        #flat index of the lower corner of each cell, and the weights of its four corners
+        k = i*self.pitch.size + j
+        w00 = (1-t)*(1-u)
+        w01 = (1-t)*u
+        w10 = t*(1-u)
+        w11 = t*u
+        k10 = k + self.pitch.size
+
+        results = []
+        for table in (self.Cp.ravel(), self.Ct.ravel()):
+            value = w00*table[k] + w01*table[k+1] + w10*table[k10] + w11*table[k10+1]
+            results.append(value.reshape(tsr.shape))
+        return tuple(results)
+
+    def loads(self, V, rpm, pitch, rho=1.225):
+        """Net power (W) and thrust (N) of the rotor at free stream velocity
+        V (m/s), rpm (min**-1), pitch (deg) and air density rho (kg/m**3)"""
+        V = np.asarray(V, dtype=float)
+        r_tip = self.geometry['r_tip']
+        Cp, Ct = self(np.asarray(rpm)*2*pi/60*r_tip/V, pitch)
+        norm = .5*rho*V**2*pi*r_tip**2
+        return Cp*norm*V, Ct*norm
+
+    def save(self, filename):
+        """Writes the map to filename as an uncompressed npz file"""
+        with open(filename, 'wb') as f:
+            np.savez(f, tsr=self.tsr, pitch=self.pitch, Cp=self.Cp, Ct=self.Ct, converged=self.converged,
+                     geometry=np.array(json.dumps(self.geometry, sort_keys=True)),
+                     key=np.array(self.key or ''))
+
+    @classmethod
+    def load(cls, filename):
+        """Reads a map written by save"""
+        data = np.load(filename)
+        try:
+            return cls(data['tsr'], data['pitch'], data['Cp'], data['Ct'], data['converged'],
+                       json.loads(str(data['geometry'])), str(data['key']) or None)
+        finally:
+            data.close()
+
+
+def build_performance_map(rotor, tsr, pitch, directory=None):
+    """Returns the PerformanceMap of rotor, an AutoBEM, over the increasing
+    grids tsr and pitch (deg).
+
+    All grid points are solved in one evaluate_designs call using the
+    rotor's current geometry, number of elements, spacing and quadrature.
+    With a directory, the map is saved there under a name made from the
+    hash of the geometry and grids, and later calls for the same rotor
+    and grids read it back instead of solving it again.
+    """
+    tsr = np.asarray(tsr, dtype=float)
+    pitch = np.asarray(pitch, dtype=float)
+    for name, grid in (('tsr', tsr), ('pitch', pitch)):
+        if grid.ndim != 1 or grid.size < 2 or not (np.diff(grid) > 0).all():
+            raise ValueError("%s must be an increasing 1-D grid of at least 2 values" % name)
+
+    key = geometry_key(rotor, tsr, pitch)
+    filename = None
+    if directory is not None:
+        filename = os.path.join(directory, 'map_%s.npz' % key)
+        if os.path.exists(filename):
+            return PerformanceMap.load(filename)
+
+    geometry = _geometry(rotor)
+    grid_tsr, grid_pitch = [a.ravel() for a in np.meshgrid(tsr, pitch, indexing='ij')]
+    designs = np.empty((grid_tsr.size, len(DESIGN_VARS)))
+    designs[:] = [getattr(rotor, name) if name in geometry else 0. for name in DESIGN_VARS]
+    designs[:, DESIGN_VARS.index('rpm')] = grid_tsr*_V_REF/rotor.r_tip*60/(2*pi)
+    designs[:, DESIGN_VARS.index('pitch')] = grid_pitch
+    designs[:, DESIGN_VARS.index('V')] = _V_REF
+
+    perf = evaluate_designs(designs, n_elements=rotor._n_elements, r_hub=rotor.r_hub, B=rotor.B,
+                            airfoil=rotor.airfoil, spacing=rotor.spacing, quadrature=rotor.quadrature)
+    performance_map = PerformanceMap(tsr, pitch, perf['Cp'], perf['Ct'], perf['converged'], geometry, key)
+
+    if filename is not None:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        #written aside and renamed so a crash never leaves a half written map
+        performance_map.save(filename+'.tmp')
+        os.rename(filename+'.tmp', filename)
+    return performance_map
@@ -0,0 +1,103 @@
+"""Power curve and annual energy production of an AutoBEM style rotor"""
+
+__all__ = ['PowerCurve', 'weibull_bins']
+
+import numpy as np
+
+from openmdao.main.api import Component
+from openmdao.lib.datatypes.api import Float, Int, Array, Enum, Str
+
+from .airfoils import DEFAULT_AIRFOIL
+#weibull_bins lives in the kernel, so batch jobs can use it without OpenMDAO
+from .kernel import SPACINGS, QUADRATURES, weibull_bins
+from .batch import evaluate_designs
+
+HOURS_PER_YEAR = 8760.
+
+
+class PowerCurve(Component):
+    """Power curve of the AutoBEM rotor over a set of wind speeds, and the
+    annual energy production (AEP) it gives for a wind speed distribution.
+
+    All wind speeds are solved together in one vectorized evaluate_designs
+    call, so AEP can be used as an optimizer objective in place of data.Cp.
+    """
+
+    #rotor inputs, as in BEM
+    r_hub = Float(0.2, iotype="in", desc="blade hub radius", units="m", low=0)
+    twist_hub = Float(29, iotype="in", desc="twist angle at the hub radius", units="deg")
+    chord_hub = Float(.7, iotype="in", desc="chord length at the rotor hub", units="m", low=.05)
+    r_tip = Float(5, iotype="in", desc="blade tip radius", units="m")
+    twist_tip = Float(-3.58, iotype="in", desc="twist angle at the tip radius", units="deg")
+    chord_tip = Float(.187, iotype="in", desc="chord length at the rotor hub", units="m", low=.05)
+    pitch = Float(0, iotype="in", desc="overall blade pitch", units="deg")
+    rpm = Float(107, iotype="in", desc="rotations per minute", low=0, units="min**-1")
+    B = Int(3, iotype="in", desc="number of blades", low=1)
+    rho = Float(1.225, iotype="in", desc="air density", units="kg/m**3")
+    airfoil = Str(DEFAULT_AIRFOIL, iotype="in", desc="name of the airfoil polar used by every blade element")
+    spacing = Enum('linear', SPACINGS, iotype="in", desc="how the stations are spread along the span")
+    quadrature = Enum('trapz', QUADRATURES, iotype="in", desc="rule used to integrate along the span")
+
+    #power curve and wind inputs
+    rated_power = Float(0., iotype="in", desc="generator rating the power is capped at, 0 for no cap",
+                        units="W", low=0)
+    wind_model = Enum('weibull', ('weibull', 'histogram'), iotype="in",
+                      desc="'weibull' uses weibull_k and weibull_c, 'histogram' uses wind_hist")
+    weibull_k = Float(2., iotype="in", desc="Weibull shape factor", low=0)
+    weibull_c = Float(8., iotype="in", desc="Weibull scale factor", units="m/s", low=0)
+
+    #outputs
+    AEP = Float(iotype="out", desc="annual energy production", units="kW*h")
+    mean_power = Float(iotype="out", desc="power averaged over the wind distribution", units="W")
+    capacity_factor = Float(iotype="out", desc="mean_power over rated_power, 0 without a rating")
+
+    def __init__(self, wind_speeds=np.arange(3., 26.), n_elements=6):
+        super(PowerCurve, self).__init__()
+
+        wind_speeds = np.array(wind_speeds, dtype=float)
+        n = wind_speeds.size
+        self._n_elements = n_elements
+
+        self.add('wind_speeds', Array(iotype='in', desc='free stream velocities of the power curve',
+                                      default_value=wind_speeds, shape=(n,), dtype=Float, units="m/s"))
+        self.add('wind_hist', Array(iotype='in', desc='fraction of the year the wind blows at each of wind_speeds',
+                                    default_value=np.zeros((n,)), shape=(n,), dtype=Float))
+
+        self.add('power', Array(iotype='out', desc='power at each wind speed, after the rated power cap',
+                                default_value=np.zeros((n,)), shape=(n,), dtype=Float, units="W"))
+        self.add('Cp', Array(iotype='out', desc='power coefficient at each wind speed',
+                             default_value=np.zeros((n,)), shape=(n,), dtype=Float))
+        self.add('Ct', Array(iotype='out', desc='thrust coefficient at each wind speed',
+                             default_value=np.zeros((n,)), shape=(n,), dtype=Float))
+        self.add('thrust', Array(iotype='out', desc='net axial thrust at each wind speed',
+                                 default_value=np.zeros((n,)), shape=(n,), dtype=Float, units="N"))
+        self.add('converged', Array(iotype='out', desc='False at wind speeds where some blade element has no solution',
+                                    default_value=np.ones((n,), dtype=bool), shape=(n,), dtype=bool))
+
+    def execute(self):
+        designs = np.empty((self.wind_speeds.size, 8))
+        designs[:] = [self.chord_hub, self.chord_tip, self.twist_hub, self.twist_tip,
+                      self.rpm, self.r_tip, self.pitch, 0.]
+        designs[:, 7] = self.wind_speeds
+
+        perf = evaluate_designs(designs, n_elements=self._n_elements, r_hub=self.r_hub, B=self.B,
+                                rho=self.rho, airfoil=self.airfoil, spacing=self.spacing,
+                                quadrature=self.quadrature)
+        self.Cp = perf['Cp']
+        self.Ct = perf['Ct']
+        self.thrust = perf['net_thrust']
+        self.converged = perf['converged']
+
+        #the rotor does not draw power from the grid to keep turning
+        power = np.maximum(perf['net_power'], 0.)
+        if self.rated_power > 0:
+            power = np.minimum(power, self.rated_power)
+        self.power = power
+
+        if self.wind_model == 'weibull':
+            freq = weibull_bins(self.wind_speeds, self.weibull_k, self.weibull_c)
+        else:
+            freq = self.wind_hist
+        self.mean_power = np.dot(freq, power)
+        self.AEP = self.mean_power*HOURS_PER_YEAR/1000.
+        self.capacity_factor = self.mean_power/self.rated_power if self.rated_power > 0 else 0.
@@ -0,0 +1,250 @@
+"""Case recording to a binary, column-per-file store that can be memory mapped.
+
+A store is a directory holding one raw little-endian file per recorded
+variable and a ``meta.json`` file describing them. Cases are buffered
+chunk_size at a time and appended to the column files, so memory use stays
+bounded however many cases are recorded, and a store can be appended to by
+later runs. load_columns maps selected columns straight into NumPy arrays
+without reading the rest of the store, and append_columns writes whole
+arrays to a store without going through cases.
+"""
+
+__all__ = ['ColumnarCaseRecorder', 'load_columns', 'append_columns']
+
+import json
+import os
+
+import numpy as np
+
+META_FILE = 'meta.json'
+
+#column that records whether a case failed, a case fails when it has a msg
+FAILED = 'case_failed'
+
+
+def _read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def _write_meta(path, meta):
+    #written aside and renamed so a crash never leaves a half written file
+    filename = os.path.join(path, META_FILE)
+    with open(filename+'.tmp', 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.rename(filename+'.tmp', filename)
+
+
+def _new_column(name, iotype, value, index):
+    value = np.asarray(value)
+    return dict(name=name, iotype=iotype, dtype=value.dtype.newbyteorder('<').str,
+                shape=list(value.shape), file='col%04d.bin' % index)
+
+
+def _create_store(path, columns, skipped=()):
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    meta = dict(n_cases=0, columns=columns, skipped=list(skipped))
+    for column in columns:
+        open(os.path.join(path, column['file']), 'wb').close()
+    _write_meta(path, meta)
+    return meta
+
+
+def _open_store(path):
+    """Metadata of the store at path, None if there is no store yet"""
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    meta = _read_meta(path)
+    #drop anything a run stopped in the middle of an append left past the last recorded case
+    for column in meta['columns']:
+        size = meta['n_cases']*np.dtype(column['dtype']).itemsize*int(np.prod(column['shape']))
+        with open(os.path.join(path, column['file']), 'r+b') as f:
+            f.truncate(size)
+    return meta
+
+
+def _append(path, meta, chunk):
+    """Appends chunk, one sequence of rows per column of meta, to the store"""
+    arrays = []
+    for column, rows in zip(meta['columns'], chunk):
+        data = np.asarray(rows, dtype=column['dtype'])
+        if data.shape[1:] != tuple(column['shape']):
+            raise ValueError("'%s' has shape %s, the store expects %s" %
+                             (column['name'], data.shape[1:], tuple(column['shape'])))
+        arrays.append(data)
+    n_rows = set(len(data) for data in arrays)
+    if len(n_rows) > 1:
+        raise ValueError("columns appended to %s have different lengths %s" % (path, sorted(n_rows)))
+
+    for column, data in zip(meta['columns'], arrays):
+        with open(os.path.join(path, column['file']), 'ab') as f:
+            data.tofile(f)
+    meta['n_cases'] += n_rows.pop() if n_rows else 0
+    _write_meta(path, meta)
+
+
+def append_columns(path, columns):
+    """Appends the arrays in columns, a dict keyed by column name, to the
+    store at path. All arrays need the same number of rows. A new store gets
+    the columns in the order of the dict, so pass an OrderedDict to choose
+    it. Returns the number of rows in the store."""
+    meta = _open_store(path)
+    if meta is None:
+        meta = _create_store(path, [_new_column(name, None, np.asarray(value)[0], i)
+                                    for i, (name, value) in enumerate(columns.items())])
+    try:
+        chunk = [columns[column['name']] for column in meta['columns']]
+    except KeyError as err:
+        raise KeyError("no values for column %s of the store at %s" % (err, path))
+    _append(path, meta, chunk)
+    return meta['n_cases']
+
+
+def load_columns(path, names=None, mmap=True):
+    """Returns a dict of arrays for the columns of the store at path that
+    are named in names (all of them by default). Each array has one row
+    per case. With mmap=True the arrays are read-only memory maps of the
+    column files, otherwise they are read into memory."""
+    meta = _read_meta(path)
+    n_cases = meta['n_cases']
+    columns = dict((column['name'], column) for column in meta['columns'])
+    if names is None:
+        names = [column['name'] for column in meta['columns']]
+
+    arrays = {}
+    for name in names:
+        if name not in columns:
+            raise KeyError("no column '%s' in the case store at %s" % (name, path))
+        column = columns[name]
+        shape = (n_cases,) + tuple(column['shape'])
+        filename = os.path.join(path, column['file'])
+        if mmap and n_cases:
+            arrays[name] = np.memmap(filename, dtype=column['dtype'], mode='r', shape=shape)
+        else:
+            count = int(np.prod(shape))
+            arrays[name] = np.fromfile(filename, dtype=column['dtype'], count=count).reshape(shape)
+    return arrays
+
+
+def _missing(column):
+    """Row recorded for a value a failed case does not have, NaN for float columns and zero otherwise"""
+    dtype = np.dtype(column['dtype'])
+    return np.full(column['shape'], np.nan if dtype.kind == 'f' else 0, dtype=dtype)
+
+
+class ColumnarCaseRecorder(object):
+    """Records cases to a columnar store in the directory path.
+
+    The columns are fixed by the first case recorded to a new store that
+    has a value for every variable, every numeric input and output becomes
+    one column. Values that are not numbers or arrays of numbers are left
+    out and listed in the metadata. Failed cases, whose outputs are None,
+    are held back until such a case arrives, and their missing values are
+    recorded as NaN (zero in integer columns). If the first chunk_size cases
+    all lack values, the columns are fixed by the first of them and the
+    variables without a value are left out. Recording to an existing store
+    appends to it, as long as the cases have the same variables.
+    """
+
+    def __init__(self, path, chunk_size=1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._meta = None
+        self._buffers = None
+        self._n_buffered = 0
+        #cases recorded before the columns are known, None until startup
+        self._pending = None
+
+    def startup(self):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self._meta = _open_store(self.path)
+        self._pending = []
+        if self._meta is not None:
+            self._buffers = [[] for column in self._meta['columns']]
+
+    def _create(self, case):
+        columns = []
+        skipped = []
+        for iotype in ('in', 'out'):
+            for name, value in case.items(iotype=iotype):
+                if value is None or np.asarray(value).dtype.kind not in 'biuf':
+                    skipped.append(name)
+                    continue
+                columns.append(_new_column(name, iotype, value, len(columns)))
+        columns.append(_new_column(FAILED, None, False, len(columns)))
+
+        self._meta = _create_store(self.path, columns, skipped)
+        self._buffers = [[] for column in columns]
+        pending, self._pending = self._pending, []
+        for case in pending:
+            self._buffer(case)
+
+    def _buffer(self, case):
+        values = dict(case.items())
+        for column, buf in zip(self._meta['columns'], self._buffers):
+            if column['name'] == FAILED:
+                buf.append(case.msg is not None)
+                continue
+            try:
+                value = values[column['name']]
+            except KeyError:
+                raise KeyError("case has no value for '%s', recorded in every earlier case of %s" %
+                               (column['name'], self.path))
+            buf.append(_missing(column) if value is None else value)
+        self._n_buffered += 1
+
+    def record(self, case):
+        """Buffers case, writing the buffered cases out every chunk_size cases"""
+        if self._pending is None:
+            self.startup()
+
+        if self._meta is None:
+            self._pending.append(case)
+            complete = all(value is not None for name, value in case.items())
+            if not complete and len(self._pending) < self.chunk_size:
+                return
+            self._create(case if complete else self._pending[0])
+        else:
+            self._buffer(case)
+
+        if self._n_buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Appends the buffered cases to the column files"""
+        if not self._n_buffered:
+            return
+        _append(self.path, self._meta, self._buffers)
+        for buf in self._buffers:
+            del buf[:]
+        self._n_buffered = 0
+
+    def close(self):
+        if self._meta is None and self._pending:
+            self._create(self._pending[0])
+        if self._meta is not None:
+            self.flush()
+
+    def __len__(self):
+        return (self._meta['n_cases'] if self._meta else 0) + self._n_buffered + len(self._pending or ())
+
+    def get_iterator(self):
+        """Iterates over the recorded cases, read back from the store"""
+        self.close()
+        if self._meta is None:
+            return iter([])
+        return self._iterate(self._meta['columns'], load_columns(self.path))
+
+    def _iterate(self, columns, arrays):
+        #imported here so that load_columns and append_columns work without OpenMDAO
+        from openmdao.main.case import Case
+
+        inputs = [column['name'] for column in columns if column['iotype'] == 'in']
+        outputs = [column['name'] for column in columns if column['iotype'] == 'out']
+        for i in range(len(arrays[FAILED])):
+            def values(names):
+                return [(name, arrays[name][i].tolist()) for name in names]
+            yield Case(inputs=values(inputs), outputs=values(outputs),
+                       msg='case failed' if arrays[FAILED][i] else None)
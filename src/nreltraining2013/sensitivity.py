@@ -0,0 +1,261 @@
+"""Sobol sensitivity indices of rotor performance from batched quasi-Monte Carlo samples"""
+
+__all__ = ['SENSITIVITY_VARS', 'sobol_sequence', 'sobol_indices', 'sobol_analysis']
+
+import multiprocessing
+
+import numpy as np
+
+from .batch import DESIGN_VARS, PERF_VARS, evaluate_designs
+
+#AutoBEM inputs that can be varied, along with the free stream conditions
+SENSITIVITY_VARS = DESIGN_VARS[:-1] + ('free_stream.V', 'free_stream.rho')
+
+#Joe and Kuo's degree s and coefficients a of the primitive polynomial, and
+#the initial direction numbers m, for dimensions 2 to 25 of the Sobol sequence
+_DIRECTIONS = ((1, 0, (1,)),
+               (2, 1, (1, 3)),
+               (3, 1, (1, 3, 1)),
+               (3, 2, (1, 1, 1)),
+               (4, 1, (1, 1, 3, 3)),
+               (4, 4, (1, 3, 5, 13)),
+               (5, 2, (1, 1, 5, 5, 17)),
+               (5, 4, (1, 1, 5, 5, 5)),
+               (5, 7, (1, 1, 7, 11, 19)),
+               (5, 11, (1, 1, 5, 1, 1)),
+               (5, 13, (1, 1, 1, 3, 11)),
+               (5, 14, (1, 3, 5, 5, 31)),
+               (6, 1, (1, 3, 3, 9, 7, 49)),
+               (6, 13, (1, 1, 1, 15, 21, 21)),
+               (6, 16, (1, 3, 1, 13, 27, 49)),
+               (6, 19, (1, 1, 1, 15, 7, 5)),
+               (6, 22, (1, 3, 1, 15, 13, 25)),
+               (6, 25, (1, 1, 5, 5, 19, 61)),
+               (7, 1, (1, 3, 7, 11, 23, 15, 103)),
+               (7, 4, (1, 3, 7, 13, 13, 15, 69)),
+               (7, 7, (1, 1, 3, 13, 7, 35, 63)),
+               (7, 8, (1, 3, 5, 9, 1, 25, 53)),
+               (7, 14, (1, 3, 1, 13, 9, 35, 107)),
+               (7, 19, (1, 3, 1, 5, 27, 61, 31)))
+
+_BITS = 32
+
+
+def _direction_numbers(d):
+    """Direction numbers of the first d dimensions, one column per dimension"""
+    if d > len(_DIRECTIONS)+1:
+        raise ValueError("the Sobol sequence has at most %d dimensions, got %d" % (len(_DIRECTIONS)+1, d))
+    V = np.zeros((_BITS, d), dtype=np.uint64)
+    V[:, 0] = [1 << (_BITS-1-i) for i in range(_BITS)]
+    for j, (s, a, m) in enumerate(_DIRECTIONS[:d-1], 1):
+        v = [m[i] << (_BITS-1-i) for i in range(s)]
+        for i in range(s, _BITS):
+            value = v[i-s] ^ (v[i-s] >> s)
+            for k in range(1, s):
+                value ^= ((a >> (s-1-k)) & 1)*v[i-k]
+            v.append(value)
+        V[:, j] = v
+    return V
+
+
+def sobol_sequence(n, d, start=0):
+    """Points start to start+n-1 of the d dimensional Sobol sequence, as an
+    (n, d) array in [0, 1). Any 2**k points starting at a multiple of 2**k
+    place exactly one point in each interval of width 2**-k along every
+    dimension."""
+    V = _direction_numbers(d)
+    index = np.arange(start, start+n, dtype=np.uint64)
+    #Gray code order, so each point differs from the last in one direction number
+    gray = index ^ (index >> np.uint64(1))
+    x = np.zeros((n, d), dtype=np.uint64)
+    for i in range(_BITS):
+        bit = ((gray >> np.uint64(i)) & np.uint64(1)).astype(bool)
+        x[bit] ^= V[i]
+    return x/2.**_BITS
+
+
+def sobol_indices(fA, fB, fAB, resample=None):
+    """First order and total Sobol indices from the model values on the
+    sample matrices A and B, and on the matrices AB whose column i is taken
+    from B and the rest from A.
+
+    fA, fB: model values of the N rows of A and B
+    fAB: (d, N) array, row i holds the values of the AB matrix of input i
+    resample: optional (n, N) array of row indices. The indices are then
+              computed once for each row of resample, from those rows of the
+              samples, and come back as (n, d) arrays.
+
+    Returns the first order indices (Saltelli 2010) and total indices
+    (Jansen 1999).
+    """
+    fA, fB, fAB = np.asarray(fA), np.asarray(fB), np.asarray(fAB)
+    if resample is None:
+        first, total = _indices(fA[np.newaxis], fB[np.newaxis], fAB[np.newaxis])
+        return first[0], total[0]
+
+    #a few resamples at a time, so memory use stays near that of the samples
+    step = max(1, 4000000//fAB.size)
+    results = [_indices(fA[rows], fB[rows], fAB[:, rows].transpose(1, 0, 2))
+               for rows in (resample[start:start+step] for start in range(0, len(resample), step))]
+    return np.vstack([first for first, total in results]), np.vstack([total for first, total in results])
+
+
+def _indices(fA, fB, fAB):
+    """sobol_indices of each row of fA and fB, and (d, N) block of fAB"""
+    both = np.concatenate((fA, fB), axis=-1)
+    #centered values give the same indices, with much less sampling noise when the mean is large
+    mean = both.mean(axis=-1)[:, np.newaxis]
+    fA, fB, fAB = fA-mean, fB-mean, fAB-mean[:, np.newaxis]
+    var = np.var(both, axis=-1)[:, np.newaxis]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first = np.mean(fB[:, np.newaxis]*(fAB-fA[:, np.newaxis]), axis=-1)/var
+        total = .5*np.mean((fA[:, np.newaxis]-fAB)**2, axis=-1)/var
+    return first, total
+
+
+def _evaluate(args):
+    designs, outputs, kwargs = args
+    perf = evaluate_designs(designs, rho=1., **kwargs)
+    return [perf[name] for name in outputs], perf['converged']
+
+
+def sobol_analysis(rotor, parameters, outputs=('Cp', 'net_thrust', 'net_power'), n_base=1024, max_base=65536,
+                   tol=.05, n_bootstrap=200, confidence=.95, n_workers=None, chunk_size=8192, seed=None):
+    """First order and total Sobol indices of the performance of an AutoBEM
+    rotor with respect to some of its inputs.
+
+    rotor: AutoBEM whose current inputs (geometry, number of elements,
+           airfoil, spacing, quadrature and free_stream) are used for the
+           inputs that are not varied. The rotor is not run.
+    parameters: (name, low, high) of each varied input, uniformly
+                distributed between low and high. Names are from
+                SENSITIVITY_VARS.
+    outputs: names of the BEMPerfData values to analyze, from PERF_VARS
+    n_base, max_base: the analysis starts with n_base rows in each sample
+                      matrix and doubles them until the indices converge or
+                      max_base is reached. Both are rounded up to powers of 2.
+    tol: the indices have converged when the confidence interval of every
+         index of every output is narrower than tol. 0 always goes on to
+         max_base.
+    n_bootstrap, confidence: number of bootstrap resamples, and the level of
+                             the confidence intervals taken from them
+    n_workers: number of worker processes the designs are solved on,
+               defaults to the number of cores. With n_workers=1 they are
+               solved in this process.
+    chunk_size: number of designs sent to a worker at a time
+
+    The sample matrices come from a Saltelli scheme over the Sobol sequence
+    in 2*len(parameters) dimensions, and every round of designs is solved
+    with evaluate_designs, (len(parameters)+2)*n rotors per round. Loads are
+    solved at unit air density and scaled by the density of each sample.
+    Designs where some blade element has no solution are counted, and kept
+    like in PowerCurve. Rows where some design has a non-finite output are
+    left out of the indices.
+
+    Returns a dict with
+
+    parameters: names of the parameters, in the order of the indices
+    indices: dict keyed by output, each a dict of S1 and ST, the first order
+             and total indices of the parameters, and S1_conf and ST_conf,
+             their (len(parameters), 2) confidence intervals
+    n_base: rows in each sample matrix when the analysis stopped
+    n_evaluations: number of rotor designs solved
+    n_unconverged: designs where some blade element had no solution
+    n_dropped: rows left out because some design had a non-finite output
+    converged: True if the indices converged before max_base
+    history: (n_base, widest confidence interval) after each round
+    """
+    names = [parameter[0] for parameter in parameters]
+    unknown = [name for name in names if name not in SENSITIVITY_VARS]
+    if unknown:
+        raise ValueError("cannot vary %s, the parameters must be some of %s" % (unknown, SENSITIVITY_VARS))
+    unknown = [name for name in outputs if name not in PERF_VARS]
+    if unknown:
+        raise ValueError("unknown outputs %s, expected some of %s" % (unknown, PERF_VARS))
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if n_workers < 1:
+        raise ValueError("n_workers must be at least 1, got %s" % n_workers)
+
+    d = len(names)
+    low = np.array([parameter[1] for parameter in parameters], dtype=float)
+    width = np.array([parameter[2] for parameter in parameters], dtype=float) - low
+    n_base = 1 << int(np.ceil(np.log2(n_base)))
+    max_base = max(1 << int(np.ceil(np.log2(max_base))), n_base)
+    rand = np.random.RandomState(seed)
+    alpha = 50.*(1-confidence)
+
+    #every design starts from the rotor's own inputs
+    base = [getattr(rotor, name) for name in DESIGN_VARS[:-1]] + [rotor.free_stream.V, rotor.free_stream.rho]
+    kwargs = dict(n_elements=rotor._n_elements, r_hub=rotor.r_hub, B=rotor.B, airfoil=rotor.airfoil,
+                  spacing=rotor.spacing, quadrature=rotor.quadrature)
+    columns = [SENSITIVITY_VARS.index(name) for name in names]
+
+    pool = multiprocessing.Pool(n_workers) if n_workers > 1 else None
+    #model values of A, B and each AB, one row per row of the sample matrices
+    values = dict((name, np.empty((0, d+2))) for name in outputs)
+    converged = np.empty((0, d+2), dtype=bool)
+    history = []
+    try:
+        n = 0
+        while True:
+            #the next rows of A and B, from the Sobol points not used yet
+            points = sobol_sequence(n_base-n, 2*d, start=n)
+            A = low + width*points[:, :d]
+            B = low + width*points[:, d:]
+            samples = [A, B]
+            for i in range(d):
+                AB = A.copy()
+                AB[:, i] = B[:, i]
+                samples.append(AB)
+
+            designs = np.empty(((d+2)*len(A), len(SENSITIVITY_VARS)))
+            designs[:] = base
+            designs[:, columns] = np.vstack(samples)
+            jobs = [(designs[start:start+chunk_size, :-1], outputs, kwargs)
+                    for start in range(0, len(designs), chunk_size)]
+            results = pool.map(_evaluate, jobs, chunksize=1) if pool is not None else map(_evaluate, jobs)
+
+            rho = designs[:, -1]
+            for j, name in enumerate(outputs):
+                new = np.concatenate([result[0][j] for result in results])
+                if name in ('net_thrust', 'net_power'):
+                    new = new*rho
+                values[name] = np.vstack((values[name], new.reshape(d+2, -1).T))
+            new = np.concatenate([result[1] for result in results])
+            converged = np.vstack((converged, new.reshape(d+2, -1).T))
+            n = n_base
+
+            rows = np.ones(n_base, dtype=bool)
+            for name in outputs:
+                rows &= np.isfinite(values[name]).all(axis=1)
+            if not rows.any():
+                raise ValueError("no row of the first %d samples has finite outputs" % n_base)
+            resample = rand.randint(0, rows.sum(), (n_bootstrap, rows.sum()))
+
+            indices = {}
+            widest = 0.
+            for name in outputs:
+                f = values[name][rows]
+                S1, ST = sobol_indices(f[:, 0], f[:, 1], f[:, 2:].T)
+                boot_S1, boot_ST = sobol_indices(f[:, 0], f[:, 1], f[:, 2:].T, resample)
+                S1_conf = np.percentile(boot_S1, [alpha, 100-alpha], axis=0).T
+                ST_conf = np.percentile(boot_ST, [alpha, 100-alpha], axis=0).T
+                indices[name] = dict(S1=S1, ST=ST, S1_conf=S1_conf, ST_conf=ST_conf)
+                widths = np.diff(np.vstack((S1_conf, ST_conf)))
+                #an output that does not vary has no indices, and never converges
+                widest = max(widest, np.inf if np.isnan(widths).any() else widths.max())
+            history.append((n_base, widest))
+
+            done = widest < tol
+            if done or n_base >= max_base:
+                break
+            n_base *= 2
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    return dict(parameters=names, indices=indices, n_base=n_base, n_evaluations=(d+2)*n_base,
+                n_unconverged=int((~converged).sum()), n_dropped=int(n_base-rows.sum()), converged=bool(done),
+                history=history)
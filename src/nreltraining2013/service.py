@@ -0,0 +1,364 @@
+"""Local HTTP service that answers rotor performance queries in micro-batches.
+
+Tools that need single AutoBEM-style evaluations all day can share one
+service instead of each building its own assembly. Every request is handled
+on its own thread, which hands the query to a MicroBatcher and waits. The
+batcher collects the queries that arrive within batch_window seconds of the
+first one (up to max_batch_size of them) and solves them together with
+evaluate_designs.
+
+Start a service with ``python -m nreltraining2013.service`` (``--help``
+lists the options) and query it with ServiceClient. The service only listens
+on the loopback interface.
+
+    POST /evaluate   a JSON query, or a list of queries, see DEFAULT_QUERY
+    GET  /metrics    latency and throughput of the service as JSON
+"""
+
+__all__ = ['DEFAULT_QUERY', 'RESULT_VARS', 'MicroBatcher', 'EvaluationServer', 'ServiceClient', 'serve']
+
+import argparse
+import httplib
+import json
+import socket
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from collections import OrderedDict, deque
+from Queue import Queue, Empty
+from SocketServer import ThreadingMixIn
+
+import numpy as np
+
+from .airfoils import DEFAULT_AIRFOIL, get_polar
+from .batch import DESIGN_VARS, PERF_VARS, evaluate_designs
+from .kernel import SPACINGS, QUADRATURES
+
+#fields of a query and their defaults, which match the AutoBEM defaults
+DEFAULT_QUERY = OrderedDict([('chord_hub', .7), ('chord_tip', .187), ('twist_hub', 29.), ('twist_tip', -3.58),
+                             ('rpm', 107.), ('r_tip', 5.), ('pitch', 0.), ('V', 7.), ('rho', 1.225),
+                             ('r_hub', .2), ('B', 3), ('n_elements', 6), ('airfoil', DEFAULT_AIRFOIL),
+                             ('spacing', 'linear'), ('quadrature', 'trapz')])
+
+#values in each result
+RESULT_VARS = PERF_VARS + ('converged',)
+
+#query fields that are the same for every design in one evaluate_designs call
+_STATIC_VARS = ('r_hub', 'B', 'n_elements', 'airfoil', 'spacing', 'quadrature')
+
+DEFAULT_PORT = 8642
+
+_LOCALHOST = ('127.0.0.1', 'localhost', '::1')
+
+
+def _parse_query(query):
+    """Fills in the defaults of query, and checks its fields"""
+    if not isinstance(query, dict):
+        raise ValueError("a query must be a JSON object, not %r" % (query,))
+    unknown = set(query) - set(DEFAULT_QUERY)
+    if unknown:
+        raise ValueError("unknown query fields %s, expected some of %s" % (sorted(unknown), list(DEFAULT_QUERY)))
+
+    point = DEFAULT_QUERY.copy()
+    point.update(query)
+    for name, default in DEFAULT_QUERY.iteritems():
+        if isinstance(default, basestring):
+            if not isinstance(point[name], basestring):
+                raise ValueError("'%s' must be a string, not %r" % (name, point[name]))
+        elif isinstance(point[name], bool) or not isinstance(point[name], (int, long, float)):
+            raise ValueError("'%s' must be a number, not %r" % (name, point[name]))
+    if point['spacing'] not in SPACINGS:
+        raise ValueError("spacing must be one of %s, not '%s'" % (SPACINGS, point['spacing']))
+    if point['quadrature'] not in QUADRATURES:
+        raise ValueError("quadrature must be one of %s, not '%s'" % (QUADRATURES, point['quadrature']))
+    if point['n_elements'] < 2 or point['n_elements'] != int(point['n_elements']):
+        raise ValueError("n_elements must be a whole number of at least 2, not %r" % point['n_elements'])
+    point['n_elements'] = int(point['n_elements'])
+    get_polar(point['airfoil'])
+    return point
+
+
+class _Pending(object):
+    """A query waiting in the batcher, and then its result"""
+
+    def __init__(self, point):
+        self.point = point
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher(object):
+    """Solves queries submitted from any number of threads in batches.
+
+    A batch starts with the first query that arrives while the batcher is
+    idle, and takes every query that arrives in the next batch_window
+    seconds, up to max_batch_size queries. Queries in a batch that share
+    the fields in _STATIC_VARS are solved in one evaluate_designs call, at
+    unit air density and then scaled by the density of each query, which is
+    exact since the blade element solution does not depend on density.
+
+    metrics returns the request latencies (over the last n_samples requests)
+    and throughput.
+    """
+
+    def __init__(self, batch_window=.005, max_batch_size=256, n_samples=10000):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1, got %s" % max_batch_size)
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+
+        self._queue = Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=n_samples)
+        self._batch_sizes = deque(maxlen=n_samples)
+        self._started = None
+        self._n_points = 0
+        self._n_batches = 0
+        self._n_errors = 0
+        self._solve_time = 0.
+
+    def start(self):
+        """Starts the batching thread, after one solve that loads the
+        airfoil tables and warms up the solver"""
+        if self._thread is not None:
+            return
+        default = _parse_query({})
+        self._solve_group(dict((name, default[name]) for name in _STATIC_VARS), [_Pending(default)])
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run, name='MicroBatcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops the batching thread once the queries already submitted are solved"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, query):
+        """Solves query, a dict of DEFAULT_QUERY fields, and returns a dict
+        keyed by RESULT_VARS. Blocks until the batch holding the query is
+        solved."""
+        return self.submit_many([query])[0]
+
+    def submit_many(self, queries):
+        """Solves a list of queries, which are queued together so they can
+        share a batch, and returns the list of their results"""
+        start = time.time()
+        pending = [_Pending(_parse_query(query)) for query in queries]
+        if self._thread is None:
+            raise RuntimeError("the batcher is not running, call start first")
+        for slot in pending:
+            self._queue.put(slot)
+        for slot in pending:
+            slot.done.wait()
+        with self._lock:
+            self._latencies.extend([time.time()-start]*len(pending))
+        for slot in pending:
+            if slot.error is not None:
+                raise slot.error
+        return [slot.result for slot in pending]
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                try:
+                    remaining = deadline - time.time()
+                    pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except Empty:
+                    break
+                if pending is None:
+                    stop = True
+                    break
+                batch.append(pending)
+            self._solve(batch)
+            if stop:
+                return
+
+    def _solve(self, batch):
+        start = time.time()
+        groups = OrderedDict()
+        for pending in batch:
+            groups.setdefault(tuple(pending.point[name] for name in _STATIC_VARS), []).append(pending)
+
+        n_errors = 0
+        for static, group in groups.iteritems():
+            try:
+                self._solve_group(dict(zip(_STATIC_VARS, static)), group)
+            except Exception as err:
+                n_errors += len(group)
+                for pending in group:
+                    pending.error = err
+            for pending in group:
+                pending.done.set()
+
+        with self._lock:
+            self._n_points += len(batch)
+            self._n_batches += 1
+            self._n_errors += n_errors
+            self._batch_sizes.append(len(batch))
+            self._solve_time += time.time()-start
+
+    def _solve_group(self, static, group):
+        designs = np.array([[pending.point[name] for name in DESIGN_VARS] for pending in group], dtype=float)
+        rho = np.array([pending.point['rho'] for pending in group], dtype=float)
+        perf = evaluate_designs(designs, n_elements=static['n_elements'], r_hub=static['r_hub'], B=static['B'],
+                                rho=1., airfoil=static['airfoil'], spacing=static['spacing'],
+                                quadrature=static['quadrature'])
+        perf['net_thrust'] *= rho
+        perf['net_power'] *= rho
+        for i, pending in enumerate(group):
+            pending.result = dict((name, perf[name][i].item()) for name in RESULT_VARS)
+
+    def metrics(self):
+        """Latency percentiles in s over the recent requests, batch sizes
+        and throughput in points per second since start"""
+        with self._lock:
+            latencies = np.array(self._latencies)
+            batch_sizes = np.array(self._batch_sizes)
+            n_points, n_batches, n_errors, solve_time = (self._n_points, self._n_batches, self._n_errors,
+                                                         self._solve_time)
+        uptime = time.time()-self._started if self._started is not None else 0.
+
+        metrics = OrderedDict([('uptime', uptime), ('n_points', n_points), ('n_batches', n_batches),
+                               ('n_errors', n_errors), ('queue_depth', self._queue.qsize()),
+                               ('throughput', n_points/uptime if uptime > 0 else 0.),
+                               ('mean_batch_size', batch_sizes.mean() if batch_sizes.size else 0.),
+                               ('max_batch_size', int(batch_sizes.max()) if batch_sizes.size else 0),
+                               ('mean_solve_time', solve_time/n_batches if n_batches else 0.)])
+        for q in (50, 90, 99, 100):
+            name = 'latency_max' if q == 100 else 'latency_p%d' % q
+            metrics[name] = float(np.percentile(latencies, q)) if latencies.size else 0.
+        return metrics
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def _send(self, status, body):
+        data = json.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._send(200, self.server.batcher.metrics())
+        else:
+            self._send(404, dict(error="no such path %s, use POST /evaluate or GET /metrics" % self.path))
+
+    def do_POST(self):
+        if self.path != '/evaluate':
+            self._send(404, dict(error="no such path %s, use POST /evaluate or GET /metrics" % self.path))
+            return
+        try:
+            queries = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError as err:
+            self._send(400, dict(error="request is not valid JSON: %s" % err))
+            return
+
+        many = isinstance(queries, list)
+        try:
+            results = self.server.batcher.submit_many(queries if many else [queries])
+        except ValueError as err:
+            self._send(400, dict(error=str(err)))
+        except Exception as err:
+            self._send(500, dict(error=str(err)))
+        else:
+            self._send(200, results if many else results[0])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EvaluationServer(ThreadingMixIn, HTTPServer):
+    """HTTP server on the loopback interface that answers queries with a
+    MicroBatcher. port=0 picks a free port, see server_address."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, batch_window=.005, max_batch_size=256):
+        if host not in _LOCALHOST:
+            raise ValueError("the service only runs on localhost, not %s" % host)
+        if host == '::1':
+            #read by HTTPServer.__init__ when it creates the socket
+            self.address_family = socket.AF_INET6
+        self.batcher = MicroBatcher(batch_window, max_batch_size)
+        HTTPServer.__init__(self, (host, port), _Handler)
+        self.batcher.start()
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self.batcher.stop()
+
+
+class ServiceClient(object):
+    """Client for an EvaluationServer at host and port"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=60.):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        connection = httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request(method, path, None if body is None else json.dumps(body),
+                               {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            result = json.loads(response.read())
+        finally:
+            connection.close()
+        if response.status == 400:
+            raise ValueError(result['error'])
+        if response.status != 200:
+            raise RuntimeError("service error %d: %s" % (response.status, result['error']))
+        return result
+
+    def evaluate(self, query):
+        """Result of query, a dict of DEFAULT_QUERY fields. A list of queries
+        returns a list of results."""
+        return self._request('POST', '/evaluate', query)
+
+    def metrics(self):
+        return self._request('GET', '/metrics')
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, batch_window=.005, max_batch_size=256):
+    """Runs an EvaluationServer until interrupted"""
+    server = EvaluationServer(host, port, batch_window, max_batch_size)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local rotor performance service, see nreltraining2013.service")
+    parser.add_argument('--host', default='127.0.0.1', choices=_LOCALHOST, help="loopback address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument('--window', type=float, default=.005,
+                        help="seconds a batch waits for more queries after its first one")
+    parser.add_argument('--batch-size', type=int, default=256, help="most queries solved in one batch")
+    args = parser.parse_args(argv)
+
+    print 'serving rotor performance on http://%s:%d' % ('[::1]' if args.host == '::1' else args.host, args.port)
+    serve(args.host, args.port, args.window, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Surrogate model stand-in for AutoBEM, trained from DOE cases"""
+
+__all__ = ['SurrogateBEM', 'SURROGATE_INPUTS']
+
+from math import pi
+
+import numpy as np
+
+from openmdao.main.api import Component, set_as_top
+from openmdao.lib.datatypes.api import Float, Int, VarTree, Enum, Str
+from openmdao.lib.surrogatemodels.api import KrigingSurrogate, ResponseSurface
+
+from .nreltraining2013 import AutoBEM, BEMPerfData, FlowConditions
+from .airfoils import DEFAULT_AIRFOIL
+from .kernel import SPACINGS, QUADRATURES
+
+#inputs the surrogate models are fitted over by default
+SURROGATE_INPUTS = ('chord_hub', 'chord_tip', 'twist_hub', 'twist_tip', 'rpm', 'r_tip')
+
+#BEMPerfData variables that get a surrogate model, the rest follow from them exactly
+_MODELED = ('Cp', 'Ct')
+
+_SURROGATES = {'kriging': KrigingSurrogate, 'response_surface': ResponseSurface}
+
+
+def _unpack(prediction, error):
+    """Value and error of a prediction. Kriging predicts a NormalDistribution,
+    the response surface a float that gets error instead."""
+    return getattr(prediction, 'mu', prediction), getattr(prediction, 'sigma', error)
+
+
+class SurrogateBEM(Component):
+    """Drop-in for AutoBEM that predicts data with surrogate models.
+
+    The models are fitted to Cp and Ct over the inputs named in params,
+    from cases added with add_training_cases or add_training_point, and
+    refitted on the next run after any new data. net_thrust, net_power, J
+    and tip_speed_ratio follow exactly from Cp, Ct and the inputs. The other
+    inputs are assumed to hold the values they had in the training data;
+    they are only passed on to the true AutoBEM used for infill.
+
+    error holds the estimated standard error of each value in data. Kriging
+    estimates it for each prediction. The response surface has one estimate
+    for the whole design space, the standard error of its fit, which is
+    infinite until there are more training points than terms in the fit, so
+    its infill points are simply drawn at random.
+
+    With infill_tol > 0, any run where the Cp error is larger than infill_tol
+    runs the true AutoBEM instead, and adds the result to the training data.
+    The infill method adds points where the error is largest before an
+    optimization starts.
+    """
+
+    #rotor inputs, as in BEM
+    r_hub = Float(0.2, iotype="in", desc="blade hub radius", units="m", low=0)
+    twist_hub = Float(29, iotype="in", desc="twist angle at the hub radius", units="deg")
+    chord_hub = Float(.7, iotype="in", desc="chord length at the rotor hub", units="m", low=.05)
+    r_tip = Float(5, iotype="in", desc="blade tip radius", units="m")
+    twist_tip = Float(-3.58, iotype="in", desc="twist angle at the tip radius", units="deg")
+    chord_tip = Float(.187, iotype="in", desc="chord length at the rotor hub", units="m", low=.05)
+    pitch = Float(0, iotype="in", desc="overall blade pitch", units="deg")
+    rpm = Float(107, iotype="in", desc="rotations per minute", low=0, units="min**-1")
+    B = Int(3, iotype="in", desc="number of blades", low=1)
+    airfoil = Str(DEFAULT_AIRFOIL, iotype="in", desc="name of the airfoil polar used by every blade element")
+    spacing = Enum('linear', SPACINGS, iotype="in", desc="how the stations are spread along the span")
+    quadrature = Enum('trapz', QUADRATURES, iotype="in", desc="rule used to integrate along the span")
+
+    free_stream = VarTree(FlowConditions(), iotype="in")
+
+    surrogate = Enum('kriging', ('kriging', 'response_surface'), iotype="in",
+                     desc="'kriging' interpolates the training data, 'response_surface' fits a quadratic")
+    infill_tol = Float(0., iotype="in", low=0,
+                       desc="Cp error above which the true AutoBEM is run and added to the training data, "
+                            "0 to never run it")
+
+    data = VarTree(BEMPerfData(), iotype="out")
+    error = VarTree(BEMPerfData(), iotype="out")
+    n_training = Int(iotype="out", desc="number of training points the surrogates were fitted to")
+
+    def __init__(self, n_elements=6, params=SURROGATE_INPUTS):
+        super(SurrogateBEM, self).__init__()
+
+        #needed initialization for VTs
+        self.add('data', BEMPerfData())
+        self.add('error', BEMPerfData())
+        self.add('free_stream', FlowConditions())
+
+        self.params = tuple(params)
+        self._n_elements = n_elements
+        self._X = []
+        self._Y = []
+        self._fit = None
+        self._model = None
+
+    def add_training_point(self, inputs, data):
+        """Adds one training point. inputs maps each name in params to its
+        value, data maps 'Cp' and 'Ct' to theirs (a BEMPerfData works too)."""
+        if not isinstance(data, dict):
+            data = dict((name, getattr(data, name)) for name in _MODELED)
+        x = [float(inputs[name]) for name in self.params]
+        y = [float(data[name]) for name in _MODELED]
+        if np.isfinite(x).all() and np.isfinite(y).all():
+            self._X.append(x)
+            self._Y.append(y)
+            self._fit = None
+
+    def add_training_cases(self, cases, prefix='b.'):
+        """Adds the cases recorded by a driver running an AutoBEM named by
+        prefix, such as the cases from a DOEdriver's recorder. The cases need
+        the params as inputs and data.Cp and data.Ct (or perf.data.Cp and
+        perf.data.Ct) as outputs. Failed cases are skipped. Returns the
+        number of cases added."""
+        n_training = len(self._X)
+        for case in cases:
+            if case.msg is not None:
+                continue
+            values = dict(case.items())
+            inputs = dict((name, values[prefix+name]) for name in self.params)
+            data = {}
+            for name in _MODELED:
+                for path in ('data.', 'perf.data.'):
+                    if prefix+path+name in values:
+                        data[name] = values[prefix+path+name]
+                        break
+                else:
+                    raise KeyError("case has no output for %sdata.%s" % (prefix, name))
+            self.add_training_point(inputs, data)
+        return len(self._X) - n_training
+
+    def train(self):
+        """Fits the surrogates to the training data"""
+        X = np.array(self._X)
+        Y = np.array(self._Y)
+        if len(X) < 2:
+            raise RuntimeError("%s needs at least 2 training points, it has %d" % (self.get_pathname(), len(X)))
+
+        #fit in scaled coordinates so that rpm does not swamp the chord lengths
+        lower = X.min(axis=0)
+        span = X.max(axis=0)-lower
+        span[span == 0] = 1.
+        mean = Y.mean(axis=0)
+        scale = Y.std(axis=0)
+        scale[scale == 0] = 1.
+        X_scaled = (X-lower)/span
+        Y_scaled = (Y-mean)/scale
+
+        models = []
+        for j in range(len(_MODELED)):
+            model = _SURROGATES[self.surrogate]()
+            model.train(X_scaled, Y_scaled[:, j])
+            models.append(model)
+
+        #standard error of the quadratic fit, kriging estimates its own error
+        fit_error = np.inf*np.ones(len(_MODELED))
+        n_terms = (X.shape[1]+1)*(X.shape[1]+2)//2
+        if self.surrogate == 'response_surface' and len(X) > n_terms:
+            fitted = np.array([[model.predict(x) for model in models] for x in X_scaled])
+            fit_error = (((fitted-Y_scaled)**2).sum(axis=0)/(len(X)-n_terms))**.5
+
+        self._fit = (self.surrogate, lower, span, mean, scale, models, fit_error)
+        self.n_training = len(X)
+
+    def predict(self, x):
+        """Predicted Cp and Ct at the param values x, and their errors"""
+        if self._fit is None or self._fit[0] != self.surrogate:
+            self.train()
+        surrogate, lower, span, mean, scale, models, fit_error = self._fit
+        x_scaled = (np.asarray(x, dtype=float)-lower)/span
+
+        value = np.empty(len(_MODELED))
+        error = np.empty(len(_MODELED))
+        for j, model in enumerate(models):
+            value[j], error[j] = _unpack(model.predict(x_scaled), fit_error[j])
+        return dict(zip(_MODELED, value*scale+mean)), dict(zip(_MODELED, error*scale))
+
+    def _true_performance(self, x):
+        """Runs the true AutoBEM at the current inputs, with params set to x"""
+        if self._model is None:
+            self._model = set_as_top(AutoBEM(n_elements=self._n_elements, vectorize=None))
+        model = self._model
+        for name in ('r_hub', 'twist_hub', 'chord_hub', 'r_tip', 'twist_tip', 'chord_tip',
+                     'pitch', 'rpm', 'B', 'airfoil', 'spacing', 'quadrature'):
+            setattr(model, name, getattr(self, name))
+        model.free_stream.rho = self.free_stream.rho
+        model.free_stream.V = self.free_stream.V
+        for name, value in zip(self.params, x):
+            setattr(model, name, value)
+        model.run()
+        return dict((name, getattr(model.data, name)) for name in _MODELED)
+
+    def infill(self, n_points=1, n_candidates=500, seed=None):
+        """Runs the true AutoBEM at n_points new points and adds them to the
+        training data. Each point is the one, out of n_candidates drawn at
+        random inside the bounds of the training data, with the largest
+        predicted Cp error. Returns the points as an array, one per row."""
+        random = np.random.RandomState(seed)
+        points = []
+        for i in range(n_points):
+            X = np.array(self._X)
+            lower = X.min(axis=0)
+            candidates = lower + random.rand(n_candidates, len(self.params))*(X.max(axis=0)-lower)
+            errors = [self.predict(x)[1]['Cp'] for x in candidates]
+            x = candidates[np.argmax(errors)]
+            self.add_training_point(dict(zip(self.params, x)), self._true_performance(x))
+            points.append(x)
+        return np.array(points)
+
+    def execute(self):
+        x = [getattr(self, name) for name in self.params]
+        value, error = self.predict(x)
+        if self.infill_tol > 0 and not error['Cp'] <= self.infill_tol:
+            value = self._true_performance(x)
+            error = dict((name, 0.) for name in _MODELED)
+            self.add_training_point(dict(zip(self.params, x)), value)
+
+        V_inf = self.free_stream.V
+        norm = .5*self.free_stream.rho*V_inf**2*pi*self.r_tip**2
+        J = V_inf/(self.rpm/60.0*2*self.r_tip)
+        tip_speed_ratio = self.rpm*2*pi/60*self.r_tip/V_inf
+
+        self.data = BEMPerfData()  # empty the variable tree
+        self.data.Cp = value['Cp']
+        self.data.Ct = value['Ct']
+        self.data.net_thrust = value['Ct']*norm
+        self.data.net_power = value['Cp']*norm*V_inf
+        self.data.J = J
+        self.data.tip_speed_ratio = tip_speed_ratio
+
+        self.error = BEMPerfData()
+        self.error.Cp = error['Cp']
+        self.error.Ct = error['Ct']
+        self.error.net_thrust = error['Ct']*norm
+        self.error.net_power = error['Cp']*norm*V_inf
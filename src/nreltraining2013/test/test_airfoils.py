@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+from math import pi
+
+import numpy as np
+
+from openmdao.main.api import set_as_top
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013 import airfoils
+from nreltraining2013.airfoils import Polar, SpanwisePolar, load_polar, register_polar, get_polar
+from nreltraining2013.nreltraining2013 import BladeElement, BladeElementArray
+
+
+class PolarTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        #polars registered by a test must not leak into the other tests
+        airfoils._registry.pop('test_thin', None)
+
+    def test_naca0012(self):
+        polar = get_polar('naca0012')
+        self.assertTrue(get_polar('naca0012') is polar)
+
+        C_D, C_L = polar.lookup(np.array([-.1, 0., 14*pi/180, 25*pi/180, 1.]))
+        self.assertTrue(np.allclose(C_L, [.001, 0., 1.05, .9, .001], rtol=1e-12, atol=1e-12))
+        self.assertTrue(np.allclose(C_D, [.001, 0., .12, .45, .001], rtol=1e-12, atol=1e-12))
+
+        dC_D, dC_L = polar.slopes(np.array([-.1, 14*pi/180, 25*pi/180]))
+        self.assertTrue(np.allclose(dC_L, [0., -.25*180/pi, .04*180/pi], rtol=1e-12, atol=1e-12))
+        self.assertTrue(np.allclose(dC_D, [0., .03*180/pi, .03*180/pi], rtol=1e-12, atol=1e-12))
+
+    def test_load_polar(self):
+        path = os.path.join(self.tempdir, 'flat.dat')
+        with open(path, 'w') as f:
+            f.write("# fill_value: 0.05\n"
+                    "-10.  -1.  nan\n"
+                    "  0.   0.  .01\n"
+                    " 10.   1.  .02\n")
+        polar = load_polar(path)
+        self.assertEqual(polar.name, 'flat')
+        self.assertEqual(polar.fill_value, .05)
+        self.assertEqual(len(polar.cd_alpha), 2)
+
+        C_D, C_L = polar.lookup(np.array([-5*pi/180, 5*pi/180, 20*pi/180]))
+        self.assertTrue(np.allclose(C_L, [-.5, .5, .05], rtol=1e-12, atol=1e-12))
+        self.assertTrue(np.allclose(C_D, [.05, .015, .05], rtol=1e-12, atol=1e-12))
+
+    def test_unknown_polar(self):
+        try:
+            get_polar('no_such_airfoil')
+        except ValueError as err:
+            self.assertTrue("no polar named 'no_such_airfoil'" in str(err))
+        else:
+            self.fail('ValueError expected')
+
+    def test_spanwise(self):
+        base = get_polar('naca0012')
+        half = Polar(base.cl_alpha, .5*base.cl, base.cd_alpha, base.cd, name='half')
+        polar = SpanwisePolar([1., 3.], [half, 'naca0012'])
+
+        alpha = np.array([.1, .1, .1, .1])
+        C_D, C_L = polar.lookup(alpha, np.array([0., 1., 2., 4.]))
+        full = base.lookup(.1)[1]
+        self.assertTrue(np.allclose(C_L, [.5*full, .5*full, .75*full, full], rtol=1e-12, atol=1e-12))
+
+        dC_D, dC_L = polar.span_slopes(alpha, np.array([0., 2., 4., 4.]))
+        self.assertTrue(np.allclose(dC_L, [0., .25*full, 0., 0.], rtol=1e-12, atol=1e-12))
+
+    def test_key(self):
+        base = get_polar('naca0012')
+        same = Polar(base.cl_alpha, base.cl, base.cd_alpha, base.cd, name='other')
+        thin = Polar(base.cl_alpha, 1.1*base.cl, base.cd_alpha, base.cd)
+        self.assertEqual(same.key, base.key)
+        self.assertNotEqual(thin.key, base.key)
+        self.assertNotEqual(SpanwisePolar([1., 3.], [base, thin]).key, SpanwisePolar([1., 3.], [base, base]).key)
+
+    def test_blade_element_airfoil(self):
+        base = get_polar('naca0012')
+        register_polar('test_thin', Polar(base.cl_alpha, 1.1*base.cl, base.cd_alpha, .9*base.cd))
+
+        be = set_as_top(BladeElement())
+        be.solver = 'bracket'
+        be.run()
+        phi = be.phi
+
+        be.airfoil = 'test_thin'
+        be.run()
+        self.assertTrue(be.converged)
+        self.assertNotAlmostEqual(be.phi, phi)
+
+        blade = set_as_top(BladeElementArray(n=1))
+        blade.r = np.array([be.r])
+        blade.twist = np.array([be.twist])
+        blade.chord = np.array([be.chord])
+        blade.airfoil = 'test_thin'
+        blade.run()
+        assert_rel_error(self, blade.phi[0], be.phi, 1e-10)
+        assert_rel_error(self, blade.delta_Cp[0], be.delta_Cp, 1e-10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.batch import evaluate_designs, DESIGN_VARS, PERF_VARS
+
+
+class EvaluateDesignsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.designs = np.array([[.7, .187, 29, -3.58, 107, 5, 0, 7],
+                                 [.5, .3, 25, 0., 120, 5, 0, 7],
+                                 [1., .2, 35, 2., 90, 6, 1, 8],
+                                 [.7, .187, 29, -3.58, 107, 5, 2, 10]])
+
+    def test_matches_AutoBEM(self):
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.driver.workflow.add('b')
+
+        results = evaluate_designs(self.designs)
+        self.assertTrue(results['converged'].all())
+
+        for i, design in enumerate(self.designs):
+            for name, value in zip(DESIGN_VARS, design):
+                if name == 'V':
+                    top.b.free_stream.V = value
+                else:
+                    top.b.set(name, value)
+            top.run()
+
+            for name in PERF_VARS:
+                assert_rel_error(self, results[name][i], top.b.data.get(name), 1e-6)
+
+    def test_chunks(self):
+        designs = np.tile(self.designs, (5, 1))
+        whole = evaluate_designs(designs)
+        chunked = evaluate_designs(designs, chunk_size=3)
+        for name in PERF_VARS:
+            self.assertTrue(np.allclose(whole[name], chunked[name], rtol=1e-12))
+            self.assertTrue(np.allclose(whole[name][:4], whole[name][4:8], rtol=1e-12))
+
+    def test_bad_shape(self):
+        try:
+            evaluate_designs(np.ones((3, 5)))
+        except ValueError as err:
+            self.assertTrue(str(err).startswith('designs must be a 2-D array with 8 columns'))
+        else:
+            self.fail('ValueError expected')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from nreltraining2013.benchmarks import compare_results, save_results, load_results, run_suite
+
+
+class CompareResultsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_compare(self):
+        baseline = {'run': dict(value=1., units='s', better='lower'),
+                    'rate': dict(value=100., units='cases/s', better='higher'),
+                    'build': dict(value=2., units='s', better='lower'),
+                    'gone': dict(value=1., units='s', better='lower')}
+        metrics = {'run': dict(value=1.2, units='s', better='lower'),
+                   'rate': dict(value=120., units='cases/s', better='higher'),
+                   'build': dict(value=2.1, units='s', better='lower'),
+                   'added': dict(value=1., units='s', better='lower')}
+
+        status = dict((row[0], row[-1]) for row in compare_results(metrics, baseline, tolerance=.1))
+        self.assertEqual(status, {'run': 'regression', 'rate': 'improved', 'build': 'ok',
+                                  'gone': 'missing', 'added': 'new'})
+
+    def test_round_trip(self):
+        metrics = run_suite(['components'], quick=True)
+        self.assertTrue('BladeElement.fsolve.execute' in metrics)
+
+        filename = os.path.join(self.tempdir, 'baseline.json')
+        save_results(filename, metrics)
+        rows = compare_results(metrics, load_results(filename))
+        self.assertTrue(all(row[-1] == 'ok' for row in rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013 import airfoils
+from nreltraining2013.airfoils import Polar, SpanwisePolar, register_polar, get_polar
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.cache import EvaluationCache, make_key
+
+
+class EvaluationCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_make_key(self):
+        self.assertEqual(make_key(1, 2.5, 'naca0012'), make_key(1., 2.5, 'naca0012'))
+        self.assertNotEqual(make_key(1, 2.5), make_key(1, 2.5+1e-15))
+        self.assertNotEqual(make_key('ab', 'c'), make_key('a', 'bc'))
+
+    def test_lru(self):
+        cache = EvaluationCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+
+        #'b' is now the least recently used
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_persistence(self):
+        filename = os.path.join(self.tempdir, 'results')
+        cache = EvaluationCache(max_size=1, filename=filename)
+        cache.put('a', {'Cp': .5})
+        cache.put('b', {'Cp': .4})
+        cache.close()
+
+        cache = EvaluationCache(max_size=1, filename=filename)
+        self.assertEqual(cache.get('a'), {'Cp': .5})
+        self.assertEqual(cache.get('b'), {'Cp': .4})
+        self.assertEqual(cache.hits, 2)
+        cache.close()
+
+
+class CachedAutoBEMTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_cache_hit(self):
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.add('c', AutoBEM(cache_size=4))
+        top.driver.workflow.add(['b', 'c'])
+
+        top.run()
+        Cp = top.c.data.Cp
+        assert_rel_error(self, Cp, top.b.data.Cp, 1e-12)
+
+        top.c.rpm = 120
+        top.run()
+        self.assertNotAlmostEqual(top.c.data.Cp, Cp)
+
+        top.c.rpm = 107
+        top.run()
+        assert_rel_error(self, top.c.data.Cp, Cp, 1e-12)
+        self.assertEqual(top.c.result_cache.hits, 1)
+        self.assertEqual(top.c.result_cache.misses, 2)
+        self.assertEqual(top.c.perf.exec_count, 2)
+
+    def test_cache_key(self):
+        top = set_as_top(Assembly())
+        top.add('c', AutoBEM(cache_size=8))
+        top.driver.workflow.add('c')
+        top.run()
+
+        #warm starts and a polar registered again with other tables are new evaluations
+        top.c.warm_start = True
+        top.run()
+        self.assertEqual(top.c.result_cache.misses, 2)
+
+        base = get_polar('naca0012')
+        top.c.airfoil = 'test_key'
+        try:
+            register_polar('test_key', Polar(base.cl_alpha, base.cl, base.cd_alpha, base.cd))
+            top.run()
+            Cp = top.c.data.Cp
+            register_polar('test_key', Polar(base.cl_alpha, 1.1*base.cl, base.cd_alpha, base.cd))
+            top.run()
+        finally:
+            airfoils._registry.pop('test_key', None)
+        self.assertEqual(top.c.result_cache.hits, 0)
+        self.assertNotAlmostEqual(top.c.data.Cp, Cp)
+
+        #so does the layout, a vectorized rotor does not reuse per element results from the same file
+        filename = os.path.join(self.tempdir, 'results')
+        for vectorize in (False, True):
+            top = set_as_top(Assembly())
+            top.add('c', AutoBEM(vectorize=vectorize, cache_size=4, cache_file=filename))
+            top.driver.workflow.add('c')
+            top.run()
+            top.c.result_cache.close()
+            self.assertEqual(top.c.result_cache.hits, 0)
+
+    def test_cache_file(self):
+        filename = os.path.join(self.tempdir, 'results')
+        for i in range(2):
+            top = set_as_top(Assembly())
+            top.add('c', AutoBEM(cache_size=4, cache_file=filename))
+            top.driver.workflow.add('c')
+            top.run()
+            top.c.result_cache.close()
+
+        self.assertEqual(top.c.result_cache.hits, 1)
+        self.assertEqual(top.c.perf.exec_count, 0)
+        assert_rel_error(self, top.c.data.Cp, 0.343, .001)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+
+import numpy as np
+
+from openmdao.main.api import Assembly, set_as_top
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.top = set_as_top(Assembly())
+        self.top.add('b', AutoBEM())
+        self.top.driver.workflow.add('b')
+
+    def test_report(self):
+        stats = self.top.b.instrument()
+        self.top.run()
+        self.top.b.rpm = 120
+        self.top.run()
+
+        report = stats.report()
+        components = report['components']
+        for name in self.top.b._elements + ['perf', 'radius_dist', 'chord_dist', 'twist_dist']:
+            self.assertEqual(components[name]['count'], 2)
+            self.assertTrue(components[name]['max_time'] <= components[name]['total_time'])
+        for name in self.top.b._elements:
+            self.assertTrue(components[name]['n_iter'] >= 2)
+            self.assertEqual(components[name]['unconverged'], 0)
+        self.assertEqual(components['perf']['n_iter'], 0)
+        self.assertEqual(report['assembly']['count'], 2)
+        self.assertTrue(report['framework_time'] >= 0)
+        self.assertTrue('BE0' in stats.format_report())
+
+    def test_tolerance_derivatives(self):
+        tracker = self.top.b.track_changes(tolerance=1e-2)
+        self.top.run()
+        self._set('chord_tip', .19)
+        self.top.run()
+        self.assertEqual(tracker.report()['components']['BE1']['within_tolerance'], 1)
+        self.assertNotEqual(self.top.b.BE1.phi, self.top.ref.BE1.phi)
+
+        #the skipped element is solved at its current inputs before its Jacobian is taken
+        J = self.top.b.BE1.provideJ()
+        self.assertEqual(self.top.b.BE1.phi, self.top.ref.BE1.phi)
+        self.assertTrue(np.array_equal(J, self.top.ref.BE1.provideJ()))
+        self.assertEqual(tracker.report()['components']['BE1']['count'], 2)
+        self.top.b.BE1.provideJ()
+        self.assertEqual(tracker.report()['components']['BE1']['count'], 2)
+
+        self.top.b.track_changes(False)
+        self.assertFalse('provideJ' in self.top.b.BE1.__dict__)
+
+    def test_disable(self):
+        stats = self.top.b.instrument()
+        self.top.run()
+        self.top.b.instrument(False)
+        self.assertFalse('execute' in self.top.b.BE0.__dict__)
+        self.top.run()
+        self.assertEqual(stats.report()['components']['BE0']['count'], 1)
+
+        stats.reset()
+        self.assertEqual(stats.report()['components']['BE0']['count'], 0)
+
+    def test_vectorized(self):
+        top = set_as_top(Assembly())
+        top.add('v', AutoBEM(vectorize=True))
+        top.driver.workflow.add('v')
+        stats = top.v.instrument()
+        top.run()
+
+        blade = stats.report()['components']['blade']
+        self.assertEqual(blade['count'], 1)
+        self.assertEqual(blade['n_iter'], top.v.blade.n_iter.sum())
+        self.assertEqual(blade['max_n_iter'], top.v.blade.n_iter.max())
+
+
+class ChangeTrackerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.top = set_as_top(Assembly())
+        self.top.add('b', AutoBEM())
+        self.top.add('ref', AutoBEM())
+        self.top.driver.workflow.add(['b', 'ref'])
+
+    def _set(self, name, value):
+        setattr(self.top.b, name, value)
+        setattr(self.top.ref, name, value)
+
+    def test_skips_unchanged(self):
+        tracker = self.top.b.track_changes()
+        self.top.run()
+        self._set('rpm', 120)
+        self.top.run()
+
+        components = tracker.report()['components']
+        for name in ['radius_dist', 'chord_dist', 'twist_dist']:
+            self.assertEqual((components[name]['count'], components[name]['unchanged']), (1, 1))
+        for name in self.top.b._elements + ['perf']:
+            self.assertEqual((components[name]['count'], components[name]['unchanged']), (2, 0))
+        self.assertEqual(tracker.report()['skipped'], 3)
+
+        self._set('free_stream.V', 8.)
+        self.top.run()
+        self._set('chord_tip', .2)
+        self.top.run()
+        components = tracker.report()['components']
+        self.assertEqual((components['BE0']['count'], components['BE0']['unchanged']), (3, 1))
+        self.assertEqual((components['BE5']['count'], components['BE5']['unchanged']), (4, 0))
+        for name in self.top.b.perf.data.list_vars():
+            self.assertEqual(getattr(self.top.b.data, name), getattr(self.top.ref.data, name))
+
+    def test_tolerance(self):
+        tracker = self.top.b.track_changes(tolerance=1e-2)
+        self.top.run()
+        self._set('chord_tip', .19)
+        self.top.run()
+
+        components = tracker.report()['components']
+        self.assertEqual(components['BE0']['unchanged'], 1)
+        for name in ['BE1', 'BE2', 'BE3', 'BE4']:
+            self.assertEqual(components[name]['within_tolerance'], 1)
+        self.assertEqual(components['BE5']['count'], 2)
+        self.assertTrue(abs(self.top.b.data.Cp-self.top.ref.data.Cp) < 1e-2*self.top.ref.data.Cp)
+
+    def test_disable(self):
+        tracker = self.top.b.track_changes()
+        stats = self.top.b.instrument()
+        self.top.run()
+        self.top.b.rpm = 120
+        self.top.run()
+        #the instrumentation only counts real runs
+        self.assertEqual(stats.report()['components']['radius_dist']['count'], 1)
+        self.assertEqual(tracker.report()['components']['radius_dist']['unchanged'], 1)
+
+        self.top.b.track_changes(False)
+        self.top.b.rpm = 110
+        self.top.run()
+        self.assertEqual(stats.report()['components']['radius_dist']['count'], 2)
+        self.top.b.instrument(False)
+        self.assertFalse('execute' in self.top.b.radius_dist.__dict__)
+        self.assertTrue(np.isfinite(self.top.b.data.Cp))
+
+
+if __name__ == "__main__":
+    unittest.main()
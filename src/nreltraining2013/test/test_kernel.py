@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+import unittest
+from math import pi
+
+import numpy as np
+
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013.nreltraining2013 import BladeElement, BEMPerf
+from nreltraining2013.kernel import (solve_element, element_loads, element_performance, inflow_residual,
+                                     rotor_performance, rotor_performance_derivatives, PERF_DERIV_OUTPUTS)
+
+_IMPORTS = """
+import sys
+import nreltraining2013.kernel, nreltraining2013.batch, nreltraining2013.timeseries
+import nreltraining2013.performance_map, nreltraining2013.recorders
+print(' '.join(sorted(name for name in sys.modules if name.split('.')[0] in ('openmdao', 'scipy'))))
+"""
+
+
+class KernelTestCase(unittest.TestCase):
+
+    def test_lightweight_import(self):
+        env = dict(os.environ)
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env['PYTHONPATH'] = os.pathsep.join([root] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', _IMPORTS], env=env).strip(), '')
+
+    def test_solve_element(self):
+        r, chord, twist, rpm, B, rho, V_inf = 3., .4, 5*pi/180, 107., 3, 1.225, 7.
+        lambda_r = rpm*2*pi/60*r/V_inf
+        sigma = B*chord/(2*pi*r)
+        expected = element_performance(r, .96, chord, twist, rpm, B, rho, V_inf)
+
+        for solver in ('fsolve', 'bracket'):
+            solution = solve_element(lambda_r, sigma, twist, r, solver=solver)
+            self.assertTrue(solution['converged'])
+            self.assertTrue(abs(inflow_residual(solution['phi'], lambda_r, sigma, twist, r)[0]) < 1e-8)
+            assert_rel_error(self, solution['phi'], float(expected['phi']), 1e-6)
+
+            loads = element_loads(solution['a'], solution['b'], solution['phi'], solution['alpha'],
+                                  r, .96, chord, rpm, B, rho, V_inf)
+            assert_rel_error(self, loads['delta_Cp'], float(expected['delta_Cp']), 1e-6)
+            assert_rel_error(self, loads['V_1'], float(expected['V_1']), 1e-6)
+
+            warm = solve_element(lambda_r, sigma, twist, r, solver=solver,
+                                 warm=(solution['a'], solution['b'], solution['phi']))
+            self.assertTrue(warm['n_iter'] <= solution['n_iter'])
+
+        self.assertRaises(ValueError, solve_element, lambda_r, sigma, twist, r, solver='newton')
+
+    def test_components_wrap_kernel(self):
+        element = BladeElement()
+        element.solver = 'bracket'
+        element.execute()
+        solution = solve_element(element.lambda_r, element.sigma, element.twist, element.r, solver='bracket')
+        self.assertEqual(element.phi, solution['phi'])
+        self.assertEqual(element.n_iter, solution['n_iter'])
+
+        perf = BEMPerf(n=5)
+        perf.delta_Ct = np.linspace(.01, .03, 5)
+        perf.delta_Cp = np.linspace(0., 1.2, 5)
+        perf.lambda_r = np.linspace(.3, 8., 5)
+        perf.quadrature = 'simpson'
+        perf.execute()
+        expected = rotor_performance(perf.delta_Ct, perf.delta_Cp, perf.lambda_r, perf.r, perf.rpm,
+                                     perf.free_stream.rho, perf.free_stream.V, 'simpson')
+        for name, value in expected.iteritems():
+            self.assertEqual(getattr(perf.data, name), value)
+
+        derivs = rotor_performance_derivatives(perf.delta_Ct, perf.delta_Cp, perf.lambda_r, perf.r, perf.rpm,
+                                               perf.free_stream.rho, perf.free_stream.V, 'simpson')
+        self.assertTrue(np.array_equal(perf.provideJ(), [derivs[name] for name in PERF_DERIV_OUTPUTS]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 
 import unittest
+import warnings
 
+import numpy as np
 
 from openmdao.main.api import Assembly, set_as_top
 from openmdao.lib.drivers.slsqpdriver import SLSQPdriver
@@ -11,6 +13,8 @@ from openmdao.lib.casehandlers.api import ListCaseRecorder
 from openmdao.util.testutil import assert_rel_error
 
 from nreltraining2013.nreltraining2013 import *
+from nreltraining2013.batch import evaluate_designs
+from nreltraining2013.kernel import inflow_residual
 
 
 class ActuatorDiskTestCase(unittest.TestCase):
@@ -41,6 +45,37 @@ class ActuatorDiskTestCase(unittest.TestCase):
         assert_rel_error(self, self.top.ad.a, 0.333, 0.005)
         assert_rel_error(self, self.top.ad.Cp, 0.593, 0.005)  # Betz Limit
 
+    def test_betz_optimum(self):
+        self.top.run()
+        assert_rel_error(self, self.top.ad.a_opt, 1/3., 1e-12)
+        assert_rel_error(self, self.top.ad.Cp_opt, 16/27., 1e-12)
+
+        optimum = betz_optimum(10., 10., 1.225)
+        assert_rel_error(self, self.top.ad.power_opt, optimum['power'], 1e-12)
+        assert_rel_error(self, optimum['Cp'], 16/27., 1e-12)
+
+    def test_sweep(self):
+        a = np.linspace(0, .5, 1501)
+        sweep = actuator_disk(a, 10., 10., 1.225)
+        assert_rel_error(self, a[sweep['Cp'].argmax()], 1/3., 1e-3)
+        self.assertTrue(np.allclose(sweep['power'], sweep['Cp']*.5*1.225*10.*10.**3))
+
+        #broadcast against a column of wind speeds
+        Vu = np.array([[5.], [10.]])
+        self.assertEqual(actuator_disk(a, Vu, 10., 1.225)['power'].shape, (2, 1501))
+
+        disks = ActuatorDiskArray(n=5)
+        disks.a = np.linspace(.1, .5, 5)
+        disks.Vu = np.linspace(6., 12., 5)
+        disks.run()
+        for i in range(5):
+            ad = ActuatorDisk()
+            ad.a = disks.a[i]
+            ad.Vu = disks.Vu[i]
+            ad.run()
+            for name in ('Vr', 'Vd', 'Ct', 'thrust', 'Cp', 'power', 'power_opt'):
+                assert_rel_error(self, disks.get(name)[i], ad.get(name), 1e-12)
+
 
 class AutoBEMTestCase(unittest.TestCase):
 
@@ -91,5 +126,328 @@ class AutoBEMTestCase(unittest.TestCase):
         assert_rel_error(self, self.top.b.data.Cp, 0.57, 0.01)
 
 
+class BladeElementTestCase(unittest.TestCase):
+
+    def test_bracket_solver(self):
+        fsolve_be = BladeElement()
+        bracket_be = BladeElement()
+        bracket_be.solver = 'bracket'
+        for be in (fsolve_be, bracket_be):
+            be.twist = .2
+            be.r = 4.
+            be.chord = .3
+            be.run()
+            self.assertTrue(be.converged)
+
+        for var in ('a', 'b', 'phi', 'alpha', 'delta_Ct', 'delta_Cp'):
+            assert_rel_error(self, bracket_be.get(var), fsolve_be.get(var), 1e-6)
+        self.assertTrue(bracket_be.n_iter < fsolve_be.n_iter)
+
+    def test_no_solution(self):
+        #the residual never changes sign here, both solvers give up near its closest approach to zero
+        for solver in ('fsolve', 'bracket'):
+            be = BladeElement()
+            be.solver = solver
+            be.twist = -.092
+            be.chord = .1676
+            be.r = 5.
+            be.rpm = 118.5
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                be.run()
+
+            self.assertFalse(be.converged)
+            assert_rel_error(self, be.phi, 1.525, .002)
+
+    def test_warm_start(self):
+        for solver in ('fsolve', 'bracket'):
+            cold_be = BladeElement()
+            warm_be = BladeElement()
+            warm_be.warm_start = True
+            for be in (cold_be, warm_be):
+                be.solver = solver
+                be.twist = .2
+                be.r = 4.
+                be.chord = .3
+                be.run()
+
+            #a small step, like a finite difference, is cheaper from the last solution
+            for be in (cold_be, warm_be):
+                be.twist = .2+1e-5
+                be.run()
+            self.assertTrue(warm_be.n_iter < cold_be.n_iter)
+            for var in ('a', 'b', 'phi', 'delta_Ct', 'delta_Cp'):
+                assert_rel_error(self, warm_be.get(var), cold_be.get(var), 1e-10)
+
+            #a large step still ends up at the cold start solution
+            for be in (cold_be, warm_be):
+                be.twist = .5
+                be.r = 1.
+                be.chord = .8
+                be.run()
+            self.assertTrue(warm_be.converged)
+            assert_rel_error(self, warm_be.phi, cold_be.phi, 1e-10)
+
+
+class BladeElementArrayTestCase(unittest.TestCase):
+
+    def test_matches_elements(self):
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.add('v', AutoBEM(vectorize=True))
+        top.driver.workflow.add(['b', 'v'])
+
+        top.run()
+
+        for i, name in enumerate(top.b._elements):
+            element = top.b.get(name)
+            for var in ('a', 'b', 'phi', 'alpha', 'delta_Ct', 'delta_Cp', 'lambda_r'):
+                assert_rel_error(self, top.v.blade.get(var)[i], element.get(var), 1e-6)
+
+        self.assertTrue(top.v.blade.converged.all())
+        assert_rel_error(self, top.v.data.Cp, top.b.data.Cp, 1e-6)
+        assert_rel_error(self, top.v.data.Ct, top.b.data.Ct, 1e-6)
+
+    def test_auto_vectorize(self):
+        top = set_as_top(Assembly())
+        top.add('small', AutoBEM(vectorize=None))
+        top.add('large', AutoBEM(n_elements=AUTO_VECTORIZE_ELEMENTS+1, vectorize=None))
+        top.add('default', AutoBEM(n_elements=AUTO_VECTORIZE_ELEMENTS+1))
+
+        self.assertEqual(top.small._elements[0], 'BE0')
+        self.assertEqual(top.large._elements, ['blade'])
+        self.assertEqual(len(top.large.blade.r), AUTO_VECTORIZE_ELEMENTS+1)
+        #existing models keep their elements unless they ask for the automatic layout
+        self.assertEqual(len(top.default._elements), AUTO_VECTORIZE_ELEMENTS+1)
+        self.assertEqual(top.default.BE0.solver, 'fsolve')
+
+    def test_solve_inflow(self):
+        be = BladeElement()
+        be.run()
+
+        phi, converged, n_iter = solve_inflow(be.lambda_r, be.sigma, be.twist)
+        self.assertTrue(converged)
+        self.assertTrue(n_iter < be.n_iter)
+        assert_rel_error(self, phi, be.phi, 1e-6)
+
+        #any shape of stations can be solved at once
+        phi, converged, n_iter = solve_inflow(np.ones((4, 3))*be.lambda_r, be.sigma, be.twist)
+        self.assertEqual(phi.shape, (4, 3))
+        self.assertTrue(converged.all())
+
+    def test_solve_inflow_no_solution(self):
+        #the first station is the one of BladeElementTestCase.test_no_solution, the second one is solvable
+        be = BladeElement()
+        be.twist = -.092
+        be.chord = .1676
+        be.r = 5.
+        be.rpm = 118.5
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            be.run()
+        lambda_r = np.array([be.lambda_r, 2.])
+        sigma = np.array([be.sigma, .1])
+        twist = np.array([be.twist, .3])
+
+        phi, converged, n_iter = solve_inflow(lambda_r, sigma, twist)
+        self.assertFalse(converged[0])
+        self.assertTrue(converged[1])
+
+        #the unconverged station is left where the residual comes closest to zero, not at the no induction angle
+        grid = np.linspace(1e-6, np.pi/2-1e-6, 100001)
+        residual = abs(inflow_residual(grid, lambda_r[0], sigma[0], twist[0])[0])
+        assert_rel_error(self, phi[0], grid[residual.argmin()], 1e-4)
+        assert_rel_error(self, phi[0], 1.525, .002)
+
+    def test_solve_inflow_warm_start(self):
+        lambda_r = np.array([2., 5., 8.])
+        sigma = np.array([.1, .05, .02])
+        twist = np.array([.3, .1, 0.])
+        phi, converged, n_iter = solve_inflow(lambda_r, sigma, twist)
+
+        cold_phi, converged, cold_n_iter = solve_inflow(lambda_r*(1+1e-6), sigma, twist)
+        warm_phi, converged, warm_n_iter = solve_inflow(lambda_r*(1+1e-6), sigma, twist, phi_start=phi)
+        self.assertTrue(converged.all())
+        self.assertTrue((warm_n_iter < cold_n_iter).all())
+        self.assertTrue(np.allclose(warm_phi, cold_phi, rtol=1e-10, atol=1e-10))
+
+        #stations without a usable guess fall back to the cold start
+        warm_phi, converged, warm_n_iter = solve_inflow(lambda_r, sigma, twist, phi_start=[np.nan, .01, 1.5])
+        self.assertTrue(converged.all())
+        self.assertTrue(np.allclose(warm_phi, phi, rtol=1e-10, atol=1e-10))
+
+    def test_warm_start(self):
+        top = set_as_top(Assembly())
+        top.add('v', AutoBEM(vectorize=True))
+        top.driver.workflow.add('v')
+        top.v.warm_start = True
+        top.run()
+        cold_n_iter = top.v.blade.n_iter.copy()
+
+        top.v.rpm += 1e-4
+        top.run()
+        self.assertTrue(top.v.blade.converged.all())
+        self.assertTrue(top.v.blade.n_iter.sum() < cold_n_iter.sum())
+
+
+class SpanwiseIntegrationTestCase(unittest.TestCase):
+
+    def test_span_fractions(self):
+        for spacing in SPACINGS:
+            span = span_fractions(9, spacing)
+            self.assertEqual((span[0], span[-1]), (0., 1.))
+            self.assertTrue((np.diff(span) > 0).all())
+        #tip spacing puts its smallest interval at the tip
+        self.assertEqual(np.diff(span_fractions(9, 'tip')).argmin(), 7)
+        self.assertRaises(ValueError, span_fractions, 9, 'root')
+
+    def test_quadrature_weights(self):
+        x = np.array([.1, .3, .35, .8, 1.2, 1.25, 2.])
+        for n in (3, 4, 7):
+            w = quadrature_weights(x[:n], 'simpson')
+            #simpson is exact for parabolas even with uneven intervals
+            assert_rel_error(self, np.dot(w, 1+x[:n]**2), (x[n-1]-x[0]) + (x[n-1]**3-x[0]**3)/3, 1e-12)
+        self.assertTrue(np.allclose(np.dot(quadrature_weights(x), x**2), np.trapz(x**2, x=x)))
+
+    def test_AutoBEM_spacing(self):
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM(n_elements=9))
+        top.driver.workflow.add('b')
+        top.b.spacing = 'tip'
+        top.b.quadrature = 'simpson'
+        top.run()
+
+        assert_rel_error(self, top.b.radius_dist.output[-2], .2+4.8*np.sin(.5*np.pi*7/8), 1e-10)
+        perf = evaluate_designs([[.7, .187, 29, -3.58, 107, 5, 0, 7]], n_elements=9,
+                                spacing='tip', quadrature='simpson')
+        assert_rel_error(self, top.b.data.Cp, perf['Cp'][0], 1e-6)
+        assert_rel_error(self, top.b.data.Ct, perf['Ct'][0], 1e-6)
+
+    def test_AdaptiveBEM(self):
+        #Cp from a densely resolved blade
+        span = np.linspace(0., 1., 2001)
+        elements = element_performance(.2+4.8*span, 1., .7-.513*span, (29-32.58*span)*np.pi/180,
+                                       107., 3, 1.225, 7.)
+        Cp = rotor_performance(elements['delta_Ct'], elements['delta_Cp'], elements['lambda_r'],
+                               5., 107., 1.225, 7., 'simpson')['Cp']
+
+        adaptive = AdaptiveBEM()
+        adaptive.tol = 1e-4
+        adaptive.run()
+        self.assertTrue(adaptive.converged)
+        self.assertTrue(adaptive.n_elements < 200)
+        assert_rel_error(self, adaptive.data.Cp, Cp, 1e-3)
+
+        adaptive.max_elements = 10
+        adaptive.run()
+        self.assertEqual(adaptive.n_elements, 10)
+        self.assertFalse(adaptive.converged)
+
+
+def fd_jacobian(comp, inputs, outputs, step=1e-6):
+    """Central difference Jacobian of a component, laid out like provideJ"""
+    columns = []
+    for name in inputs:
+        value = comp.get(name)
+        for i in range(np.size(value)):
+            deltas = []
+            for h in (step, -step):
+                if np.ndim(value):
+                    bumped = value.copy()
+                    bumped[i] += h
+                    comp.set(name, bumped)
+                else:
+                    comp.set(name, value+h)
+                comp.run()
+                deltas.append(np.hstack([np.ravel(comp.get(out)) for out in outputs]))
+            comp.set(name, value)
+            columns.append((deltas[0]-deltas[1])/(2*step))
+    comp.run()
+    return np.array(columns).T
+
+
+class DerivativesTestCase(unittest.TestCase):
+
+    def check_component(self, comp):
+        comp.run()
+        inputs, outputs = comp.list_deriv_vars()
+        J = comp.provideJ()
+        fd = fd_jacobian(comp, inputs, outputs)
+        self.assertEqual(J.shape, fd.shape)
+        self.assertTrue(np.allclose(J, fd, rtol=1e-5, atol=1e-8))
+
+    def test_ActuatorDisk(self):
+        ad = ActuatorDisk()
+        ad.a = .3
+        self.check_component(ad)
+
+    def test_ActuatorDiskArray(self):
+        disks = ActuatorDiskArray(n=4)
+        disks.a = np.array([.1, .2, .3, .4])
+        disks.Vu = np.array([5., 7., 9., 11.])
+        disks.Area = np.array([8., 9., 10., 11.])
+        self.check_component(disks)
+
+    def test_BEMPerf(self):
+        perf = BEMPerf(n=6)
+        perf.delta_Ct = np.array([.01, .23, .01, .02, .03, .03])
+        perf.delta_Cp = np.array([0, .13, .03, .24, .8, 1.17])
+        perf.lambda_r = np.linspace(.32, 8., 6)
+        self.check_component(perf)
+        perf.quadrature = 'simpson'
+        perf.lambda_r = .32 + 7.68*span_fractions(6, 'tip')
+        self.check_component(perf)
+
+    def test_SpanDistribution(self):
+        dist = SpanDistribution(n=6)
+        dist.start = .2
+        dist.end = 5.
+        self.check_component(dist)
+        dist.spacing = 'cosine'
+        self.check_component(dist)
+
+    def test_BladeElement(self):
+        be = BladeElement()
+        be.solver = 'bracket'
+        be.twist = .2
+        be.r = 4.
+        be.chord = .3
+        self.check_component(be)
+
+    def test_BladeElementArray(self):
+        be = BladeElementArray(n=6)
+        be.r = np.linspace(.2, 5, 6)
+        be.dr = .96
+        be.chord = np.linspace(.7, .187, 6)
+        be.twist = np.linspace(29, -3.58, 6)*np.pi/180
+        be.rpm = 107.
+        self.check_component(be)
+
+    def test_AutoBEM(self):
+        inputs = ['b.chord_hub', 'b.chord_tip', 'b.rpm', 'b.twist_hub', 'b.twist_tip', 'b.r_tip']
+        for vectorize in (False, True):
+            top = set_as_top(Assembly())
+            top.add('b', AutoBEM(vectorize=vectorize))
+            top.driver.workflow.add('b')
+            if not vectorize:
+                #fsolve only converges to ~1e-8, too loose for the finite differences
+                for name in top.b._elements:
+                    top.b.get(name).solver = 'bracket'
+            top.run()
+
+            J = top.driver.workflow.calc_gradient(inputs=inputs, outputs=['b.data.Cp'])
+
+            for i, name in enumerate(inputs):
+                value = top.get(name)
+                step = 1e-6*abs(value)
+                Cp = []
+                for h in (step, -step):
+                    top.set(name, value+h)
+                    top.run()
+                    Cp.append(top.b.data.Cp)
+                top.set(name, value)
+                assert_rel_error(self, J[0, i], (Cp[0]-Cp[1])/(2*step), 1e-4)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.lib.drivers.doedriver import DOEdriver
+from openmdao.lib.doegenerators.api import FullFactorial
+from openmdao.lib.casehandlers.api import ListCaseRecorder
+
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013 import parallel
+from nreltraining2013.parallel import autobem_top, doe_cases, run_cases, run_multistart
+
+PARAMETERS = [('b.chord_hub', .1, 2), ('b.chord_tip', .1, 2), ('b.rpm', 20, 300),
+              ('b.twist_hub', -5, 50), ('b.twist_tip', -5, 50)]
+OUTPUTS = ['b.data.tip_speed_ratio', 'b.data.Cp', 'b.data.Ct']
+
+
+def _broken_top():
+    raise RuntimeError("no model")
+
+
+class _Recorder(ListCaseRecorder):
+    """Notes when it is closed, and raises when asked to record more than
+    n_record cases"""
+
+    def __init__(self, n_record=None):
+        super(_Recorder, self).__init__()
+        self.n_record = n_record
+        self.closed = False
+
+    def record(self, case):
+        if len(self) == self.n_record:
+            raise RuntimeError("recorder is full")
+        super(_Recorder, self).record(case)
+
+    def close(self):
+        self.closed = True
+        super(_Recorder, self).close()
+
+
+class RunCasesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        #the serial DOE from test_AutoBEM_DOE
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.add('driver', DOEdriver())
+        top.driver.workflow.add('b')
+        top.driver.DOEgenerator = FullFactorial(2)
+        top.driver.recorders = [ListCaseRecorder()]
+        top.driver.case_outputs = OUTPUTS
+        for name, low, high in PARAMETERS:
+            top.driver.add_parameter(name, low=low, high=high)
+        top.run()
+        self.serial = list(top.driver.recorders[0].get_iterator())
+
+    def _check(self, cases):
+        self.assertEqual(len(cases), len(self.serial))
+        for case, serial in zip(cases, self.serial):
+            self.assertEqual(case.msg, serial.msg)
+            for name, low, high in PARAMETERS:
+                assert_rel_error(self, case[name], serial[name], 1e-12)
+            for name in OUTPUTS:
+                assert_rel_error(self, case[name], serial[name], 1e-12)
+
+    def test_matches_serial(self):
+        recorder = ListCaseRecorder()
+        bounds = [(low, high) for name, low, high in PARAMETERS]
+        cases = run_cases(autobem_top, [name for name, low, high in PARAMETERS],
+                          doe_cases(FullFactorial(2), bounds), OUTPUTS,
+                          recorders=[recorder], n_workers=3, chunk_size=5)
+        self._check(cases)
+        self._check(list(recorder.get_iterator()))
+
+    def test_in_process(self):
+        bounds = [(low, high) for name, low, high in PARAMETERS]
+        cases = run_cases(autobem_top, [name for name, low, high in PARAMETERS],
+                          doe_cases(FullFactorial(2), bounds), OUTPUTS, n_workers=1)
+        self._check(cases)
+
+    def test_failed_case(self):
+        cases = run_cases(autobem_top, ['b.no_such_input'], [[1.], [2.]], ['b.data.Cp'], n_workers=2)
+        self.assertEqual(len(cases), 2)
+        for case in cases:
+            self.assertTrue('no_such_input' in case.msg)
+
+    def test_failed_recording(self):
+        for n_workers in (1, 2):
+            kept = _Recorder()
+            full = _Recorder(n_record=1)
+            self.assertRaises(RuntimeError, run_cases, autobem_top, ['b.rpm'], [[100.], [110.], [120.]],
+                              ['b.data.Cp'], recorders=[kept, full], n_workers=n_workers)
+            #every recorder is closed, with the cases recorded before the failure
+            self.assertTrue(kept.closed)
+            self.assertTrue(full.closed)
+            self.assertEqual(len(kept), 2)
+            self.assertEqual(len(full), 1)
+
+    def test_broken_factory(self):
+        #fails right away, also with a pool, and leaves the model of this process alone
+        saved = parallel._top
+        for n_workers in (1, 2):
+            self.assertRaises(RuntimeError, run_cases, _broken_top, ['b.rpm'], [[100.]], ['b.data.Cp'],
+                              n_workers=n_workers)
+            self.assertTrue(parallel._top is saved)
+
+
+class MultistartTestCase(unittest.TestCase):
+
+    def test_latin_hypercube_starts(self):
+        results = run_multistart(autobem_top, PARAMETERS, 'b.data.Cp', n_starts=4, maximize=True, n_workers=2)
+        self.assertEqual(len(results['results']), 4)
+        best = results['best']
+        self.assertTrue(best['status'] in ('converged', 'stopped'))
+        self.assertTrue(best['objective'] > .5)
+        self.assertEqual(best['objective'], results['objectives'].max())
+        self.assertEqual(results['optima'].shape, (len(results['objectives']), len(PARAMETERS)))
+        for result in results['results']:
+            self.assertEqual(len(result['start']), len(PARAMETERS))
+            for value, (name, low, high) in zip(result['x'], PARAMETERS):
+                self.assertTrue(low-1e-9 <= value <= high+1e-9)
+
+    def test_in_process(self):
+        #the starting point of test_AutoBEM_Opt, with cancellation turned off
+        starts = [[.7, .187, 107, 29, -3.58], [1.5, 1.5, 250, 40, 40]]
+        results = run_multistart(autobem_top, PARAMETERS, 'b.data.Cp', starts=starts, maximize=True,
+                                 n_workers=1, margin=1e9)
+        self.assertEqual([result['status'] for result in results['results']], ['converged']*2)
+        self.assertEqual(results['results'][0]['start'], starts[0])
+        self.assertTrue(results['results'][0]['objective'] > .56)
+
+    def test_failed_run(self):
+        results = run_multistart(autobem_top, [('b.no_such_input', 0, 1)], 'b.data.Cp', starts=[[.5]], n_workers=1)
+        self.assertEqual(results['best'], None)
+        self.assertEqual(results['results'][0]['status'], 'failed')
+        self.assertTrue('no_such_input' in results['results'][0]['msg'])
+        self.assertEqual(results['optima'].shape, (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from openmdao.main.api import set_as_top
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013 import airfoils
+from nreltraining2013.airfoils import Polar, register_polar, get_polar
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.performance_map import PerformanceMap, build_performance_map, geometry_key
+
+
+class PerformanceMapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.rotor = set_as_top(AutoBEM())
+        self.tsr = np.linspace(2, 14, 61)
+        self.pitch = np.linspace(-5, 15, 41)
+        self.map = build_performance_map(self.rotor, self.tsr, self.pitch)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_matches_AutoBEM(self):
+        for V, rpm, pitch in ((7., 107., 0.), (9., 80., 2.5), (6., 130., -1.)):
+            self.rotor.free_stream.V = V
+            self.rotor.rpm = rpm
+            self.rotor.pitch = pitch
+            self.rotor.run()
+            Cp, Ct = self.map(self.rotor.data.tip_speed_ratio, pitch)
+            assert_rel_error(self, float(Cp), self.rotor.data.Cp, 1e-3)
+            assert_rel_error(self, float(Ct), self.rotor.data.Ct, 1e-3)
+
+            power, thrust = self.map.loads(V, rpm, pitch, self.rotor.free_stream.rho)
+            assert_rel_error(self, float(power), self.rotor.data.net_power, 1e-3)
+            assert_rel_error(self, float(thrust), self.rotor.data.net_thrust, 1e-3)
+
+    def test_interpolation(self):
+        #exact at the grid points, and linear along the grid lines
+        Cp, Ct = self.map(self.tsr[[3, 10]], self.pitch[[5, 20]])
+        self.assertTrue(np.allclose(Cp, self.map.Cp[[3, 10], [5, 20]], rtol=1e-12))
+        self.assertTrue(np.allclose(Ct, self.map.Ct[[3, 10], [5, 20]], rtol=1e-12))
+        Cp, Ct = self.map(.5*(self.tsr[3]+self.tsr[4]), self.pitch[5])
+        assert_rel_error(self, float(Cp), .5*(self.map.Cp[3, 5]+self.map.Cp[4, 5]), 1e-12)
+
+        Cp, Ct = self.map(np.ones((4, 3))*8., self.pitch[:3])
+        self.assertEqual(Cp.shape, (4, 3))
+        Cp, Ct = self.map([1., 20., np.nan, 8.], [0., 0., 0., 30.])
+        self.assertTrue(np.isnan(Cp).all())
+        self.assertTrue(np.isnan(Ct).all())
+
+    def test_save_and_load(self):
+        performance_map = build_performance_map(self.rotor, self.tsr, self.pitch, self.tempdir)
+        filename = os.path.join(self.tempdir, 'map_%s.npz' % geometry_key(self.rotor, self.tsr, self.pitch))
+        self.assertTrue(os.path.exists(filename))
+
+        loaded = PerformanceMap.load(filename)
+        self.assertTrue(np.array_equal(loaded.Cp, performance_map.Cp))
+        self.assertTrue(np.array_equal(loaded.converged, performance_map.converged))
+        self.assertEqual(loaded.geometry['r_tip'], self.rotor.r_tip)
+        self.assertEqual(loaded.key, performance_map.key)
+
+        #a different geometry gets its own map
+        self.rotor.chord_tip = .3
+        self.assertNotEqual(geometry_key(self.rotor, self.tsr, self.pitch), loaded.key)
+        other = build_performance_map(self.rotor, self.tsr, self.pitch, self.tempdir)
+        self.assertFalse(np.array_equal(other.Cp, loaded.Cp))
+        self.assertEqual(len(os.listdir(self.tempdir)), 2)
+
+    def test_polar_changed(self):
+        #a polar registered again under the same name with other tables gets a new map
+        base = get_polar('naca0012')
+        self.rotor.airfoil = 'test_map'
+        try:
+            register_polar('test_map', Polar(base.cl_alpha, base.cl, base.cd_alpha, base.cd))
+            first = build_performance_map(self.rotor, self.tsr, self.pitch, self.tempdir)
+            register_polar('test_map', Polar(base.cl_alpha, 1.1*base.cl, base.cd_alpha, base.cd))
+            second = build_performance_map(self.rotor, self.tsr, self.pitch, self.tempdir)
+        finally:
+            airfoils._registry.pop('test_map', None)
+        self.assertNotEqual(second.key, first.key)
+        self.assertFalse(np.array_equal(second.Cp, first.Cp))
+        self.assertEqual(len(os.listdir(self.tempdir)), 2)
+
+    def test_bad_grid(self):
+        self.assertRaises(ValueError, build_performance_map, self.rotor, [4., 2.], self.pitch)
+        self.assertRaises(ValueError, build_performance_map, self.rotor, self.tsr, [0.])
+
+
+if __name__ == "__main__":
+    unittest.main()
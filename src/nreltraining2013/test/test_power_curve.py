@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.power_curve import PowerCurve, weibull_bins
+
+
+class PowerCurveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.top = set_as_top(Assembly())
+        self.top.add('b', AutoBEM())
+        self.top.add('pc', PowerCurve(wind_speeds=[6., 7., 9.]))
+        self.top.driver.workflow.add(['b', 'pc'])
+
+    def test_matches_AutoBEM(self):
+        self.top.run()
+        for i, V in enumerate(self.top.pc.wind_speeds):
+            self.top.b.free_stream.V = V
+            self.top.run()
+            self.assertTrue(self.top.pc.converged[i])
+            assert_rel_error(self, self.top.pc.Cp[i], self.top.b.data.Cp, 1e-10)
+            assert_rel_error(self, self.top.pc.power[i], self.top.b.data.net_power, 1e-10)
+            assert_rel_error(self, self.top.pc.thrust[i], self.top.b.data.net_thrust, 1e-10)
+
+    def test_rated_power(self):
+        self.top.run()
+        power = self.top.pc.power.copy()
+
+        self.top.pc.rated_power = power[1]
+        self.top.run()
+        self.assertTrue(np.allclose(self.top.pc.power, [power[0], power[1], power[1]], rtol=1e-12))
+        assert_rel_error(self, self.top.pc.capacity_factor, self.top.pc.mean_power/power[1], 1e-12)
+
+    def test_AEP(self):
+        self.top.pc.wind_model = 'histogram'
+        self.top.pc.wind_hist = np.array([.5, .3, .2])
+        self.top.run()
+        mean_power = np.dot([.5, .3, .2], self.top.pc.power)
+        assert_rel_error(self, self.top.pc.mean_power, mean_power, 1e-12)
+        assert_rel_error(self, self.top.pc.AEP, mean_power*8.76, 1e-12)
+
+        self.top.pc.wind_model = 'weibull'
+        self.top.run()
+        freq = weibull_bins([6., 7., 9.], 2., 8.)
+        assert_rel_error(self, self.top.pc.mean_power, np.dot(freq, self.top.pc.power), 1e-12)
+
+    def test_weibull_bins(self):
+        freq = weibull_bins(np.arange(0., 60.), 2., 8.)
+        assert_rel_error(self, freq.sum(), 1., 1e-12)
+        #the bins are centered on the wind speeds
+        assert_rel_error(self, freq[1], np.exp(-(.5/8)**2)-np.exp(-(1.5/8)**2), 1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
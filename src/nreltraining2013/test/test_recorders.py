@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.main.case import Case
+from openmdao.lib.drivers.doedriver import DOEdriver
+from openmdao.lib.doegenerators.api import FullFactorial
+from openmdao.lib.casehandlers.api import ListCaseRecorder
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.recorders import ColumnarCaseRecorder, load_columns, append_columns
+
+
+def _case(i):
+    return Case(inputs=[('x', float(i)), ('n', i)],
+                outputs=[('y', i**2.), ('v', [i, 2.*i, 3.*i]), ('label', 'case%d' % i)],
+                msg='failed' if i == 3 else None)
+
+
+def _failed_case(i):
+    #what run_cases and DOEdriver record for a case that raised
+    return Case(inputs=[('x', float(i)), ('n', i)], outputs=[('y', None), ('v', None), ('label', None)],
+                msg='failed')
+
+
+class ColumnarCaseRecorderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'cases')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_record_and_load(self):
+        recorder = ColumnarCaseRecorder(self.path, chunk_size=4)
+        recorder.startup()
+        for i in range(10):
+            recorder.record(_case(i))
+        #two full chunks are on disk, the rest is still buffered
+        self.assertEqual(len(load_columns(self.path, ['x'])['x']), 8)
+        self.assertEqual(len(recorder), 10)
+        recorder.close()
+
+        columns = load_columns(self.path, ['y', 'v'])
+        self.assertEqual(sorted(columns), ['v', 'y'])
+        self.assertTrue(isinstance(columns['y'], np.memmap))
+        self.assertTrue(np.allclose(columns['y'], np.arange(10)**2))
+        self.assertEqual(columns['v'].shape, (10, 3))
+        self.assertTrue(np.allclose(columns['v'][:, 2], 3*np.arange(10)))
+
+        columns = load_columns(self.path)
+        self.assertEqual(columns['n'].dtype.kind, 'i')
+        self.assertEqual(list(np.nonzero(columns['case_failed'])[0]), [3])
+        self.assertFalse('label' in columns)
+        self.assertRaises(KeyError, load_columns, self.path, ['label'])
+
+    def test_append(self):
+        recorder = ColumnarCaseRecorder(self.path)
+        recorder.startup()
+        for i in range(5):
+            recorder.record(_case(i))
+        recorder.close()
+
+        recorder = ColumnarCaseRecorder(self.path)
+        recorder.startup()
+        for i in range(5, 7):
+            recorder.record(_case(i))
+        recorder.close()
+
+        self.assertTrue(np.allclose(load_columns(self.path, ['x'], mmap=False)['x'], np.arange(7)))
+        cases = list(recorder.get_iterator())
+        self.assertEqual(len(cases), 7)
+        self.assertEqual(cases[4]['v'], [4., 8., 12.])
+        self.assertEqual(cases[3].msg, 'case failed')
+        self.assertEqual(cases[2].msg, None)
+
+    def test_failed_cases(self):
+        #failed cases first, before any array output is known, and after it
+        recorder = ColumnarCaseRecorder(self.path, chunk_size=4)
+        recorder.startup()
+        for case in (_failed_case(0), _case(1), _failed_case(2), _case(4), _failed_case(5)):
+            recorder.record(case)
+        self.assertEqual(len(recorder), 5)
+        recorder.close()
+
+        columns = load_columns(self.path)
+        self.assertEqual(sorted(columns), ['case_failed', 'n', 'v', 'x', 'y'])
+        self.assertEqual(list(columns['case_failed']), [True, False, True, False, True])
+        self.assertTrue(np.allclose(columns['x'], [0, 1, 2, 4, 5]))
+        self.assertEqual(columns['v'].shape, (5, 3))
+        self.assertTrue(np.isnan(columns['v'][[0, 2, 4]]).all())
+        self.assertTrue(np.isnan(columns['y'][[0, 2, 4]]).all())
+        self.assertTrue(np.allclose(columns['v'][[1, 3]], [[1, 2, 3], [4, 8, 12]]))
+
+    def test_only_failed_cases(self):
+        #without a single complete case the outputs cannot get columns
+        recorder = ColumnarCaseRecorder(self.path, chunk_size=2)
+        recorder.startup()
+        for i in range(3):
+            recorder.record(_failed_case(i))
+        recorder.close()
+
+        columns = load_columns(self.path)
+        self.assertEqual(sorted(columns), ['case_failed', 'n', 'x'])
+        self.assertTrue(columns['case_failed'].all())
+        self.assertEqual(len(columns['x']), 3)
+
+    def test_shape_mismatch(self):
+        recorder = ColumnarCaseRecorder(self.path)
+        recorder.startup()
+        recorder.record(_case(1))
+        recorder.record(Case(inputs=[('x', 1.), ('n', 1)], outputs=[('y', 1.), ('v', [1., 2.])]))
+        self.assertRaises(ValueError, recorder.close)
+
+    def test_append_columns(self):
+        self.assertEqual(append_columns(self.path, dict(x=np.arange(3.), v=np.ones((3, 2)))), 3)
+        self.assertEqual(append_columns(self.path, dict(x=[3., 4.], v=np.zeros((2, 2)))), 5)
+        columns = load_columns(self.path)
+        self.assertTrue(np.allclose(columns['x'], np.arange(5)))
+        self.assertEqual(columns['v'].shape, (5, 2))
+        self.assertRaises(KeyError, append_columns, self.path, dict(x=[5.]))
+        self.assertRaises(ValueError, append_columns, self.path, dict(x=[5., 6.], v=np.zeros((1, 2))))
+        self.assertEqual(len(load_columns(self.path)['x']), 5)
+
+    def test_doe(self):
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.add('driver', DOEdriver())
+        top.driver.DOEgenerator = FullFactorial(3)
+        top.driver.add_parameter('b.rpm', low=60, high=120)
+        top.driver.add_parameter('b.pitch', low=-2, high=2)
+        top.driver.case_outputs = ['b.perf.data.Cp', 'b.perf.delta_Ct']
+        top.driver.workflow.add('b')
+        top.driver.recorders = [ColumnarCaseRecorder(self.path, chunk_size=4), ListCaseRecorder()]
+        top.run()
+
+        columns = load_columns(self.path, ['b.rpm', 'b.perf.data.Cp', 'b.perf.delta_Ct'])
+        self.assertEqual(columns['b.perf.delta_Ct'].shape, (9, 6))
+        for i, case in enumerate(top.driver.recorders[1].get_iterator()):
+            self.assertEqual(columns['b.rpm'][i], case['b.rpm'])
+            self.assertEqual(columns['b.perf.data.Cp'][i], case['b.perf.data.Cp'])
+            self.assertTrue(np.allclose(columns['b.perf.delta_Ct'][i], case['b.perf.delta_Ct']))
+
+
+if __name__ == "__main__":
+    unittest.main()
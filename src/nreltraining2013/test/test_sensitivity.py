@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+
+from openmdao.main.api import set_as_top
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.sensitivity import sobol_sequence, sobol_indices, sobol_analysis
+
+PARAMETERS = [('chord_hub', .6, .8), ('twist_hub', 25, 33), ('pitch', -2, 2), ('rpm', 95, 120),
+              ('free_stream.V', 6, 9), ('free_stream.rho', 1.1, 1.3)]
+
+
+def ishigami(X):
+    return np.sin(X[:, 0]) + 7*np.sin(X[:, 1])**2 + .1*X[:, 2]**4*np.sin(X[:, 0])
+
+
+class SobolTestCase(unittest.TestCase):
+
+    def test_sequence(self):
+        points = sobol_sequence(8, 3)
+        self.assertTrue(np.array_equal(points[:4], [[0, 0, 0], [.5, .5, .5], [.75, .25, .25], [.25, .75, .75]]))
+
+        #every block of 2**k points hits each interval of width 2**-k once
+        for start in (0, 512):
+            points = sobol_sequence(512, 25, start)
+            for j in range(25):
+                self.assertEqual(len(set((points[:, j]*512).astype(int))), 512)
+        self.assertTrue(np.array_equal(sobol_sequence(4, 5, 4), sobol_sequence(8, 5)[4:]))
+        self.assertRaises(ValueError, sobol_sequence, 4, 26)
+
+    def test_ishigami(self):
+        points = sobol_sequence(8192, 6)*2*np.pi - np.pi
+        A, B = points[:, :3], points[:, 3:]
+        fAB = []
+        for i in range(3):
+            AB = A.copy()
+            AB[:, i] = B[:, i]
+            fAB.append(ishigami(AB))
+        S1, ST = sobol_indices(ishigami(A), ishigami(B), fAB)
+        self.assertTrue(np.allclose(S1, [.3139, .4424, 0.], atol=.02))
+        self.assertTrue(np.allclose(ST, [.5576, .4424, .2437], atol=.02))
+
+        resample = np.random.RandomState(0).randint(0, 8192, (20, 8192))
+        boot_S1, boot_ST = sobol_indices(ishigami(A), ishigami(B), fAB, resample)
+        self.assertEqual(boot_S1.shape, (20, 3))
+        self.assertTrue(np.allclose(boot_ST.mean(axis=0), ST, atol=.02))
+
+
+class SobolAnalysisTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rotor = set_as_top(AutoBEM())
+
+    def test_indices(self):
+        results = sobol_analysis(self.rotor, PARAMETERS, n_base=256, max_base=512, tol=0., n_workers=2, seed=1)
+        self.assertEqual(results['parameters'], [name for name, low, high in PARAMETERS])
+        self.assertEqual(results['n_base'], 512)
+        self.assertEqual(results['n_evaluations'], 8*512)
+        self.assertEqual([n for n, width in results['history']], [256, 512])
+        self.assertFalse(results['converged'])
+
+        for name in ('Cp', 'net_thrust', 'net_power'):
+            indices = results['indices'][name]
+            self.assertEqual(indices['S1_conf'].shape, (6, 2))
+            self.assertTrue((indices['ST_conf'][:, 0] <= indices['ST_conf'][:, 1]).all())
+            self.assertTrue((indices['S1'] < indices['ST'] + .05).all())
+        #Cp does not depend on the air density, and the wind speed drives the power
+        self.assertEqual(results['indices']['Cp']['ST'][-1], 0.)
+        self.assertEqual(np.argmax(results['indices']['net_power']['ST']), 4)
+
+        serial = sobol_analysis(self.rotor, PARAMETERS, n_base=256, max_base=512, tol=0., n_workers=1, seed=1)
+        self.assertTrue(np.array_equal(serial['indices']['Cp']['ST'], results['indices']['Cp']['ST']))
+
+    def test_early_stopping(self):
+        results = sobol_analysis(self.rotor, PARAMETERS[:4], outputs=('Ct',), n_base=200, tol=1., n_workers=1)
+        self.assertTrue(results['converged'])
+        self.assertEqual(results['n_base'], 256)
+        self.assertEqual(len(results['history']), 1)
+
+    def test_bad_inputs(self):
+        self.assertRaises(ValueError, sobol_analysis, self.rotor, [('B', 1, 3)])
+        self.assertRaises(ValueError, sobol_analysis, self.rotor, PARAMETERS, outputs=('data.Cp',))
+
+
+if __name__ == "__main__":
+    unittest.main()
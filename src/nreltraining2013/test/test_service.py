@@ -0,0 +1,102 @@
+import socket
+import threading
+import unittest
+
+import numpy as np
+
+from nreltraining2013.batch import evaluate_designs
+from nreltraining2013.service import MicroBatcher, EvaluationServer, ServiceClient
+
+
+def _expected(query, n_elements=6):
+    return evaluate_designs([[.7, .187, 29., -3.58, query.get('rpm', 107.), 5., 0., query['V']]],
+                            n_elements=n_elements, rho=query.get('rho', 1.225))
+
+
+class MicroBatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.batcher = MicroBatcher(batch_window=.05, max_batch_size=8)
+        self.batcher.start()
+
+    def tearDown(self):
+        self.batcher.stop()
+
+    def test_concurrent_queries(self):
+        queries = [dict(V=5.+i*.5, rpm=90.+i, rho=1.1+.01*i, n_elements=6 if i % 2 else 10) for i in range(12)]
+        results = [None]*len(queries)
+
+        def submit(i):
+            results[i] = self.batcher.submit(queries[i])
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(queries))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for query, result in zip(queries, results):
+            expected = _expected(query, query['n_elements'])
+            self.assertTrue(np.allclose(result['net_power'], expected['net_power'], rtol=1e-12))
+            self.assertTrue(np.allclose(result['Ct'], expected['Ct'], rtol=1e-12))
+            self.assertEqual(result['converged'], expected['converged'][0])
+
+        metrics = self.batcher.metrics()
+        self.assertEqual(metrics['n_points'], 12)
+        self.assertTrue(metrics['n_batches'] < 12)
+        self.assertTrue(metrics['max_batch_size'] <= 8)
+        self.assertTrue(0 < metrics['latency_p50'] <= metrics['latency_max'])
+
+    def test_bad_queries(self):
+        self.assertRaises(ValueError, self.batcher.submit, dict(V='fast'))
+        self.assertRaises(ValueError, self.batcher.submit, dict(wind=7.))
+        self.assertRaises(ValueError, self.batcher.submit, dict(spacing='random'))
+        self.assertRaises(ValueError, self.batcher.submit, dict(airfoil='no_such_airfoil'))
+        self.assertEqual(self.batcher.metrics()['n_points'], 0)
+
+
+class EvaluationServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = EvaluationServer(port=0, batch_window=.01)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.client = ServiceClient(port=self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_evaluate(self):
+        result = self.client.evaluate(dict(V=8., rpm=100.))
+        self.assertTrue(np.allclose(result['Cp'], _expected(dict(V=8., rpm=100.))['Cp'], rtol=1e-12))
+
+        results = self.client.evaluate([dict(V=V) for V in (6., 7., 8.)])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(np.allclose(results[1]['net_thrust'], _expected(dict(V=7.))['net_thrust'], rtol=1e-12))
+
+        self.assertRaises(ValueError, self.client.evaluate, dict(V=[7.]))
+        self.assertEqual(self.client.metrics()['n_points'], 4)
+
+    def test_localhost_only(self):
+        self.assertRaises(ValueError, EvaluationServer, host='0.0.0.0', port=0)
+
+    def test_ipv6(self):
+        try:
+            server = EvaluationServer(host='::1', port=0)
+        except socket.error:
+            self.skipTest("no IPv6 loopback on this machine")
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            client = ServiceClient('::1', server.server_address[1])
+            self.assertEqual(client.evaluate(dict(V=8.))['Cp'], self.client.evaluate(dict(V=8.))['Cp'])
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
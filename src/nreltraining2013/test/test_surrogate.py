@@ -0,0 +1,78 @@
+import unittest
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.lib.drivers.doedriver import DOEdriver
+from openmdao.lib.doegenerators.api import FullFactorial
+from openmdao.lib.casehandlers.api import ListCaseRecorder
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.surrogate import SurrogateBEM
+
+PARAMS = ('chord_hub', 'chord_tip', 'rpm')
+
+
+class SurrogateBEMTestCase(unittest.TestCase):
+
+    def setUp(self):
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.add('driver', DOEdriver())
+        top.driver.DOEgenerator = FullFactorial(3)
+        top.driver.add_parameter('b.chord_hub', low=.4, high=1.)
+        top.driver.add_parameter('b.chord_tip', low=.1, high=.4)
+        top.driver.add_parameter('b.rpm', low=80, high=130)
+        top.driver.case_outputs = ['b.perf.data.Cp', 'b.perf.data.Ct']
+        top.driver.recorders = [ListCaseRecorder()]
+        top.driver.workflow.add('b')
+        top.run()
+        self.cases = list(top.driver.recorders[0].get_iterator())
+
+        self.true = set_as_top(AutoBEM())
+        self.surrogate = SurrogateBEM(params=PARAMS)
+        self.assertEqual(self.surrogate.add_training_cases(self.cases), 27)
+
+    def _set(self, **values):
+        for name, value in values.iteritems():
+            setattr(self.true, name, value)
+            setattr(self.surrogate, name, value)
+        self.true.run()
+        self.surrogate.run()
+
+    def test_kriging(self):
+        #kriging reproduces its training data
+        self._set(chord_hub=.7, chord_tip=.25, rpm=105.)
+        assert_rel_error(self, self.surrogate.data.Cp, self.true.data.Cp, 1e-3)
+        assert_rel_error(self, self.surrogate.data.net_thrust, self.true.data.net_thrust, 1e-3)
+        assert_rel_error(self, self.surrogate.data.tip_speed_ratio, self.true.data.tip_speed_ratio, 1e-12)
+        self.assertEqual(self.surrogate.n_training, 27)
+
+        self._set(chord_hub=.55, chord_tip=.3, rpm=95.)
+        self.assertTrue(self.surrogate.error.Cp > 0)
+        self.assertTrue(abs(self.surrogate.data.Cp-self.true.data.Cp) < .05)
+
+    def test_response_surface(self):
+        self.surrogate.surrogate = 'response_surface'
+        self._set(chord_hub=.55, chord_tip=.3, rpm=95.)
+        self.assertTrue(0 < self.surrogate.error.Cp < 1)
+        self.assertTrue(abs(self.surrogate.data.Cp-self.true.data.Cp) < .05)
+
+    def test_infill(self):
+        points = self.surrogate.infill(n_points=2, seed=1)
+        self.assertEqual(points.shape, (2, 3))
+        self.surrogate.run()
+        self.assertEqual(self.surrogate.n_training, 29)
+
+        #an error above infill_tol runs the true model
+        self.surrogate.infill_tol = 1e-12
+        self._set(chord_hub=.55, chord_tip=.3, rpm=95.)
+        self.assertEqual(self.surrogate.data.Cp, self.true.data.Cp)
+        self.assertEqual(self.surrogate.error.Cp, 0.)
+
+        #the true model integrates the stations the same way
+        self._set(spacing='tip', quadrature='simpson')
+        self.assertEqual(self.surrogate.data.Cp, self.true.data.Cp)
+
+
+if __name__ == "__main__":
+    unittest.main()
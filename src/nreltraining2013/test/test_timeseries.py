@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from openmdao.main.api import set_as_top
+from openmdao.util.testutil import assert_rel_error
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.recorders import append_columns, load_columns
+from nreltraining2013.timeseries import stream_performance
+
+
+class StreamPerformanceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.rotor = set_as_top(AutoBEM())
+        random = np.random.RandomState(0)
+        self.V = np.round(4+6*random.rand(500), 1)
+        self.rho = 1.225+.03*random.randn(500)
+        self.V[7] = np.nan
+        self.V[9] = 0.
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def assert_same_summary(self, summary, expected):
+        self.assertEqual(sorted(summary), sorted(expected))
+        for name in expected:
+            self.assertTrue(np.allclose(summary[name], expected[name], rtol=1e-10, atol=0))
+
+    def test_matches_AutoBEM(self):
+        path = os.path.join(self.tempdir, 'results')
+        summary = stream_performance(self.rotor, dict(V=self.V, rho=self.rho), path, chunk_size=64)
+        self.assertEqual(summary['n_records'], 500)
+        self.assertEqual(summary['n_missing'], 2)
+
+        results = load_columns(path)
+        self.assertEqual(len(results['power']), 500)
+        self.assertTrue(np.isnan(results['power'][[7, 9]]).all())
+        for i in (0, 1, 100, 499):
+            self.rotor.free_stream.V = self.V[i]
+            self.rotor.free_stream.rho = self.rho[i]
+            self.rotor.run()
+            assert_rel_error(self, results['Cp'][i], self.rotor.data.Cp, 1e-10)
+            assert_rel_error(self, results['power'][i], max(self.rotor.data.net_power, 0.), 1e-10)
+            assert_rel_error(self, results['thrust'][i], self.rotor.data.net_thrust, 1e-10)
+
+        power = results['power'][np.isfinite(results['power'])]
+        assert_rel_error(self, summary['mean_power'], power.mean(), 1e-10)
+        assert_rel_error(self, summary['energy'], power.sum()*600./3.6e6, 1e-10)
+
+    def test_csv(self):
+        source = os.path.join(self.tempdir, 'scada.csv')
+        with open(source, 'w') as f:
+            f.write('time,V,rho\n')
+            for i, (V, rho) in enumerate(zip(self.V, self.rho)):
+                f.write('%d,%s,%r\n' % (600*i, '' if np.isnan(V) else repr(V), rho))
+        output = os.path.join(self.tempdir, 'results.csv')
+        summary = stream_performance(self.rotor, source, output, chunk_size=100, rated_power=15e3)
+
+        expected = stream_performance(self.rotor, dict(V=self.V, rho=self.rho), rated_power=15e3)
+        self.assert_same_summary(summary, expected)
+        results = np.genfromtxt(output, delimiter=',', names=True)
+        self.assertEqual(len(results), 500)
+        self.assertTrue(np.nanmax(results['power']) <= 15e3)
+        assert_rel_error(self, summary['capacity_factor'], summary['mean_power']/15e3, 1e-12)
+
+    def test_constant_rho(self):
+        path = os.path.join(self.tempdir, 'wind')
+        for start in range(0, 500, 200):
+            append_columns(path, dict(V=self.V[start:start+200]))
+        self.rotor.free_stream.rho = 1.1
+        summary = stream_performance(self.rotor, path, rho_column=None)
+        expected = stream_performance(self.rotor, dict(V=self.V, rho=1.1*np.ones(500)))
+        self.assert_same_summary(summary, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
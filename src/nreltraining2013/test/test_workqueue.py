@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+from openmdao.main.api import Assembly, set_as_top
+from openmdao.lib.drivers.doedriver import DOEdriver
+from openmdao.lib.doegenerators.api import FullFactorial
+from openmdao.lib.casehandlers.api import ListCaseRecorder
+
+from nreltraining2013.nreltraining2013 import AutoBEM
+from nreltraining2013.parallel import autobem_top, doe_cases
+from nreltraining2013.workqueue import create_queue, run_queue, queue_status, merge_queue, run_sharded
+from nreltraining2013.workqueue import _claim, _owner
+
+PARAMETERS = [('b.chord_hub', .1, 2), ('b.chord_tip', .1, 2), ('b.rpm', 20, 300),
+              ('b.twist_hub', -5, 50), ('b.twist_tip', -5, 50)]
+NAMES = [name for name, low, high in PARAMETERS]
+BOUNDS = [(low, high) for name, low, high in PARAMETERS]
+OUTPUTS = ['b.data.tip_speed_ratio', 'b.data.Cp', 'b.data.Ct']
+
+
+class WorkQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmp, 'queue')
+
+        top = set_as_top(Assembly())
+        top.add('b', AutoBEM())
+        top.add('driver', DOEdriver())
+        top.driver.workflow.add('b')
+        top.driver.DOEgenerator = FullFactorial(2)
+        top.driver.recorders = [ListCaseRecorder()]
+        top.driver.case_outputs = OUTPUTS
+        for name, low, high in PARAMETERS:
+            top.driver.add_parameter(name, low=low, high=high)
+        top.run()
+        self.serial = list(top.driver.recorders[0].get_iterator())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _check(self, cases):
+        self.assertEqual(len(cases), len(self.serial))
+        for case, serial in zip(cases, self.serial):
+            self.assertEqual(case.msg, serial.msg)
+            for name in NAMES + OUTPUTS:
+                self.assertEqual(case[name], serial[name])
+
+    def test_matches_serial(self):
+        recorder = ListCaseRecorder()
+        cases = run_sharded(autobem_top, NAMES, doe_cases(FullFactorial(2), BOUNDS), OUTPUTS, self.directory,
+                            recorders=[recorder], n_workers=3, shard_size=5)
+        self._check(cases)
+        self._check(list(recorder.get_iterator()))
+        self.assertEqual(queue_status(self.directory)['n_done'], 7)
+
+    def test_resume(self):
+        n_shards = create_queue(self.directory, NAMES, doe_cases(FullFactorial(2), BOUNDS), OUTPUTS, shard_size=5)
+        self.assertEqual(n_shards, 7)
+        self.assertEqual(create_queue(self.directory, NAMES, doe_cases(FullFactorial(2), BOUNDS), OUTPUTS,
+                                      shard_size=5), 7)
+        self.assertRaises(ValueError, create_queue, self.directory, NAMES, doe_cases(FullFactorial(2), BOUNDS),
+                          OUTPUTS, shard_size=4)
+
+        self.assertEqual(run_queue(self.directory, autobem_top, n_workers=1, max_shards=2), 2)
+        self.assertRaises(ValueError, merge_queue, self.directory)
+
+        #a process on this machine that died two cases into shard 3, the second one half written
+        serial = self.serial[15]
+        shards = os.path.join(self.directory, 'shards')
+        claim = os.path.join(shards, '00003.%s-999999999-dead' % socket.gethostname())
+        os.rename(os.path.join(shards, '00003.todo'), claim)
+        with open(claim, 'w') as f:
+            f.write(json.dumps([15, [serial[name] for name in OUTPUTS], None]) + '\n[16, [1.')
+
+        status = queue_status(self.directory)
+        self.assertEqual((status['n_done'], status['n_claimed'], status['n_pending']), (2, 1, 4))
+        self.assertEqual(status['n_cases_done'], 11)
+
+        self.assertEqual(run_queue(self.directory, autobem_top, n_workers=2), 5)
+        self.assertEqual(queue_status(self.directory)['n_cases_done'], 32)
+        self.assertEqual(os.listdir(shards), [])
+        self._check(merge_queue(self.directory))
+
+    def test_old_queue(self):
+        #queues created an hour before they are worked on, their shard files are older than the lease
+        created = time.time()-3600.
+        single = os.path.join(self.tmp, 'single')
+        for directory, shard_size in ((single, 32), (self.directory, 5)):
+            create_queue(directory, NAMES, doe_cases(FullFactorial(2), BOUNDS), OUTPUTS, shard_size=shard_size)
+            shards = os.path.join(directory, 'shards')
+            for name in os.listdir(shards):
+                os.utime(os.path.join(shards, name), (created, created))
+
+        #a shard just claimed by a live owner is not taken over by the next one
+        self.assertEqual(_claim(single, _owner(), lease=60.)[0], 0)
+        self.assertEqual(_claim(single, _owner(), lease=60.), None)
+
+        #so two workers run every shard once
+        self.assertEqual(run_queue(self.directory, autobem_top, n_workers=2, lease=60.), 7)
+        self._check(merge_queue(self.directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
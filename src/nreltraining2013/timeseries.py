@@ -0,0 +1,167 @@
+"""Streaming evaluation of rotor performance over long wind time series"""
+
+__all__ = ['OUTPUT_COLUMNS', 'read_chunks', 'stream_performance']
+
+import os
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+
+from .batch import DESIGN_VARS, evaluate_designs
+from .recorders import append_columns, load_columns
+
+#columns written for each record, in order
+OUTPUT_COLUMNS = ('V', 'rho', 'power', 'thrust', 'Cp', 'Ct', 'converged')
+
+#rotor inputs copied into every design, in DESIGN_VARS order
+_ROTOR_VARS = DESIGN_VARS[:-1]
+
+
+def _csv_chunks(filename, names, chunk_size):
+    with open(filename) as f:
+        header = [name.strip() for name in f.readline().split(',')]
+        try:
+            usecols = [header.index(name) for name in names]
+        except ValueError as err:
+            raise KeyError("%s: %s" % (filename, err))
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                return
+            #blank or unreadable values come back as nan
+            values = np.genfromtxt(lines, delimiter=',', usecols=usecols, dtype=float)
+            values = values.reshape(len(lines), len(names))
+            yield [values[:, j] for j in range(len(names))]
+
+
+def read_chunks(source, names, chunk_size=65536):
+    """Iterates over source chunk_size records at a time, yielding a list
+    with one 1-D float array per column named in names.
+
+    source is a dict of arrays (memory maps work, and are only read a chunk
+    at a time), the directory of a columnar store written by
+    ColumnarCaseRecorder or append_columns, or a CSV file whose first line
+    names the columns. Other CSV columns, such as time stamps, are ignored.
+    """
+    if isinstance(source, basestring):
+        if not os.path.isdir(source):
+            return _csv_chunks(source, names, chunk_size)
+        source = load_columns(source, names)
+    columns = [source[name] for name in names]
+    n_records = len(columns[0])
+    return ([np.asarray(column[start:start+chunk_size], dtype=float) for column in columns]
+            for start in range(0, n_records, chunk_size))
+
+
+class _CSVWriter(object):
+
+    def __init__(self, filename):
+        self._file = open(filename, 'w')
+        self._file.write(','.join(OUTPUT_COLUMNS)+'\n')
+
+    def write(self, results):
+        np.savetxt(self._file, np.column_stack([results[name] for name in OUTPUT_COLUMNS]),
+                   delimiter=',', fmt='%.8g')
+
+    def close(self):
+        self._file.close()
+
+
+class _StoreWriter(object):
+
+    def __init__(self, path):
+        self._path = path
+
+    def write(self, results):
+        append_columns(self._path, results)
+
+    def close(self):
+        pass
+
+
+def stream_performance(rotor, source, output=None, chunk_size=65536, wind_column='V', rho_column='rho',
+                       dt=600., rated_power=0.):
+    """Evaluates the performance of an AutoBEM rotor at every record of a
+    wind time series, chunk_size records at a time.
+
+    rotor: AutoBEM whose current inputs (geometry, rpm, pitch, B, airfoil,
+           spacing and quadrature) are used for every record. The rotor is
+           not run, each chunk is solved with evaluate_designs.
+    source: records to evaluate, see read_chunks. wind_column names the free
+            stream velocity column (m/s) and rho_column the air density
+            column (kg/m**3). With rho_column=None every record uses
+            rotor.free_stream.rho.
+    output: where the results go, one row per record with the columns in
+            OUTPUT_COLUMNS. A filename ending in .csv gets a CSV file,
+            anything else is the directory of a columnar store, which is
+            appended to if it already exists. None keeps only the summary.
+    dt: time covered by each record in s, 600 for 10 minute records.
+    rated_power: generator rating in W the power is capped at, 0 for no cap.
+
+    Each chunk solves only the distinct wind speeds it holds, at unit air
+    density, and scales the loads by the density of each record, which is
+    exact since the blade element solution does not depend on density.
+    Records with a missing or non-positive wind speed or density get nan
+    results and are left out of the summary. Memory use depends on
+    chunk_size, not on the length of the series.
+
+    Returns a dict with the number of records n_records, the number missing
+    n_missing, the number where some blade element has no solution
+    n_unconverged, the energy produced over the series in kW*h, and
+    mean_power and capacity_factor over the valid records.
+    """
+    if output is None:
+        writer = None
+    elif output.lower().endswith('.csv'):
+        writer = _CSVWriter(output)
+    else:
+        writer = _StoreWriter(output)
+
+    names = [wind_column] if rho_column is None else [wind_column, rho_column]
+    design = [getattr(rotor, name) for name in _ROTOR_VARS]
+    n_records = n_valid = n_unconverged = 0
+    total_power = 0.
+    try:
+        for columns in read_chunks(source, names, chunk_size):
+            V = columns[0]
+            rho = np.ones_like(V)*rotor.free_stream.rho if rho_column is None else columns[1]
+            with np.errstate(invalid='ignore'):
+                valid = (V > 0) & (rho > 0)
+
+            results = OrderedDict((name, np.nan*np.ones_like(V)) for name in OUTPUT_COLUMNS)
+            results['V'] = V
+            results['rho'] = rho
+            results['converged'] = np.zeros(V.shape, dtype=bool)
+
+            speeds, inverse = np.unique(V[valid], return_inverse=True)
+            designs = np.empty((speeds.size, len(DESIGN_VARS)))
+            designs[:, :-1] = design
+            designs[:, -1] = speeds
+            perf = evaluate_designs(designs, n_elements=rotor._n_elements, r_hub=rotor.r_hub, B=rotor.B, rho=1.,
+                                    airfoil=rotor.airfoil, spacing=rotor.spacing, quadrature=rotor.quadrature)
+
+            #the rotor does not draw power from the grid to keep turning
+            power = np.maximum(perf['net_power'][inverse]*rho[valid], 0.)
+            if rated_power > 0:
+                power = np.minimum(power, rated_power)
+            results['power'][valid] = power
+            results['thrust'][valid] = perf['net_thrust'][inverse]*rho[valid]
+            results['Cp'][valid] = perf['Cp'][inverse]
+            results['Ct'][valid] = perf['Ct'][inverse]
+            results['converged'][valid] = perf['converged'][inverse]
+
+            if writer is not None:
+                writer.write(results)
+            n_records += V.size
+            n_valid += valid.sum()
+            n_unconverged += (~perf['converged'][inverse]).sum()
+            total_power += power.sum()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    mean_power = total_power/n_valid if n_valid else 0.
+    return dict(n_records=n_records, n_missing=int(n_records-n_valid), n_unconverged=int(n_unconverged),
+                energy=total_power*dt/3.6e6, mean_power=mean_power,
+                capacity_factor=mean_power/rated_power if rated_power > 0 else 0.)
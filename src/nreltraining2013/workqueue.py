@@ -0,0 +1,313 @@
+"""Resumable DOE runs, split into shards kept in a file-backed work queue.
+
+A queue is a directory holding the cases of a DOE and one file per shard of
+shard_size cases. Any number of processes, on this machine or on others that
+share the directory, call run_queue to work through it. A process claims a
+shard by renaming its file to a name holding the process's owner id, which
+only one process can do, and appends a line to the claimed file as each of
+its cases finishes. A finished shard is written to results/ and its claim is
+removed.
+
+Claims left by a process that died are taken over, with the cases already
+checkpointed in them kept, once the owner's process is gone (on the same
+machine) or the claim file has not been touched for lease seconds. A killed
+run therefore picks up where it stopped, and merge_queue returns the same
+cases, in the same order, as a serial DOEdriver run.
+
+    queue/queue.json          parameters, outputs and shard layout
+    queue/cases.npy           parameter values, one row per case
+    queue/shards/00012.todo   shard 12, not claimed yet
+    queue/shards/00013.<own>  shard 13, claimed by owner <own>
+    queue/results/00011.json  outputs of every case of shard 11
+"""
+
+__all__ = ['create_queue', 'run_queue', 'queue_status', 'merge_queue', 'run_sharded']
+
+import errno
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import time
+import uuid
+
+import numpy as np
+
+from openmdao.main.case import Case
+
+from . import parallel
+
+_TODO = 'todo'
+
+
+def _read_meta(directory):
+    with open(os.path.join(directory, 'queue.json')) as f:
+        return json.load(f)
+
+
+def _shard_cases(meta, shard):
+    start = shard*meta['shard_size']
+    return range(start, min(start+meta['shard_size'], meta['n_cases']))
+
+
+def _owner():
+    #host, pid and a token, so a restarted process never reuses a name
+    return '%s-%d-%s' % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+def _owner_alive(owner):
+    host, pid, token = owner.rsplit('-', 2)
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except OSError as err:
+        return err.errno == errno.EPERM
+    return True
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _restore(value):
+    return np.array(value) if isinstance(value, list) else value
+
+
+def create_queue(directory, parameters, cases, outputs, shard_size=64):
+    """Creates a work queue in directory for running cases, and returns the
+    number of shards.
+
+    parameters, cases and outputs are as for run_cases in
+    nreltraining2013.parallel. If directory already holds a queue for the
+    same DOE it is left as it is, so every process of a run can call this.
+    A queue for a different DOE raises ValueError.
+    """
+    if shard_size < 1:
+        raise ValueError("shard_size must be at least 1, got %s" % shard_size)
+    parameters = list(parameters)
+    outputs = list(outputs)
+    values = np.array([list(case) for case in cases], dtype=float).reshape(-1, len(parameters))
+    n_shards = -(-len(values)//shard_size)
+    meta = dict(parameters=parameters, outputs=outputs, n_cases=len(values), shard_size=shard_size,
+                n_shards=n_shards)
+
+    if not os.path.exists(directory):
+        #built aside and renamed, so other processes never see half a queue
+        tmp = '%s.%s.tmp' % (directory.rstrip(os.sep), _owner())
+        os.makedirs(os.path.join(tmp, 'shards'))
+        os.mkdir(os.path.join(tmp, 'results'))
+        np.save(os.path.join(tmp, 'cases.npy'), values)
+        with open(os.path.join(tmp, 'queue.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        for shard in range(n_shards):
+            open(os.path.join(tmp, 'shards', '%05d.%s' % (shard, _TODO)), 'w').close()
+        try:
+            os.rename(tmp, directory)
+            return n_shards
+        except OSError:
+            #another process created the queue first
+            shutil.rmtree(tmp)
+
+    if _read_meta(directory) != meta or not np.array_equal(np.load(os.path.join(directory, 'cases.npy')), values):
+        raise ValueError("%s already holds a queue for a different DOE" % directory)
+    return n_shards
+
+
+def _claim(directory, owner, lease):
+    """Claims a shard for owner, unclaimed shards first and then shards whose
+    owner is gone. Returns the shard number and the path of the claim, or
+    None when there is nothing left to claim."""
+    shards = os.path.join(directory, 'shards')
+    names = sorted(os.listdir(shards), key=lambda name: (not name.endswith('.' + _TODO), name))
+    for name in names:
+        shard, current = name.split('.', 1)
+        path = os.path.join(shards, name)
+        if current != _TODO:
+            try:
+                stale = time.time() - os.path.getmtime(path) > lease or not _owner_alive(current)
+            except OSError:
+                continue
+            if not stale:
+                continue
+        claim = os.path.join(shards, '%s.%s' % (shard, owner))
+        try:
+            os.rename(path, claim)
+        except OSError:
+            #claimed by another process in the meantime
+            continue
+        #a rename keeps the old mtime, start the lease now so the claim does not look stale right away
+        os.utime(claim, None)
+        return int(shard), claim
+    return None
+
+
+def _checkpoint(claim):
+    """Cases already finished in a claim, keyed by case number. A line cut
+    short by a crash is dropped from the file."""
+    with open(claim, 'r+') as f:
+        text = f.read()
+        end = text.rfind('\n') + 1
+        f.truncate(end)
+    done = {}
+    for line in text[:end].splitlines():
+        index, output_values, msg = json.loads(line)
+        done[index] = (output_values, msg)
+    return done
+
+
+def _work(args):
+    """Runs shards until none can be claimed, and returns how many it finished"""
+    directory, factory, lease, max_shards = args
+    meta = _read_meta(directory)
+    values = np.load(os.path.join(directory, 'cases.npy'))
+    parameters, outputs = meta['parameters'], meta['outputs']
+    owner = _owner()
+
+    saved = parallel._top
+    n_finished = 0
+    try:
+        parallel._init_worker(factory)
+        while max_shards is None or n_finished < max_shards:
+            claimed = _claim(directory, owner, lease)
+            if claimed is None:
+                break
+            shard, claim = claimed
+            done = _checkpoint(claim)
+            with open(claim, 'a') as f:
+                for index in _shard_cases(meta, shard):
+                    if index in done:
+                        continue
+                    [(case_values, output_values, msg)] = parallel._run_chunk((parameters, outputs,
+                                                                               [values[index].tolist()]))
+                    done[index] = ([_jsonable(value) for value in output_values], msg)
+                    #every line written also renews the lease on the claim
+                    f.write(json.dumps([index, done[index][0], msg]) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            result = os.path.join(directory, 'results', '%05d.json' % shard)
+            with open('%s.%s.tmp' % (result, owner), 'w') as f:
+                json.dump([done[index] for index in _shard_cases(meta, shard)], f)
+            os.rename('%s.%s.tmp' % (result, owner), result)
+            try:
+                os.remove(claim)
+            except OSError:
+                #the lease ran out and another process took the shard over
+                pass
+            n_finished += 1
+    finally:
+        parallel._top = saved
+    return n_finished
+
+
+def run_queue(directory, factory, n_workers=None, lease=300., max_shards=None):
+    """Works through the queue in directory until no shard is left to claim.
+
+    factory: picklable callable that returns a new top level assembly, as
+             for run_cases. Each worker builds one model and runs every shard
+             it claims on it.
+    n_workers: number of worker processes, defaults to the number of cores.
+               With n_workers=1 the shards run in this process.
+    lease: seconds after the last finished case before a claim held by a
+           process on another machine may be taken over. It has to be longer
+           than the slowest case. Claims of dead processes on this machine
+           are taken over right away.
+    max_shards: number of shards each worker finishes before stopping, None
+                for no limit
+
+    Returns the number of shards finished by this call. Shards that other
+    processes are still working on are not waited for, see queue_status.
+    """
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if n_workers < 1:
+        raise ValueError("n_workers must be at least 1, got %s" % n_workers)
+
+    job = (directory, factory, lease, max_shards)
+    if n_workers == 1:
+        return _work(job)
+    pool = multiprocessing.Pool(n_workers)
+    try:
+        return sum(pool.map(_work, [job]*n_workers, chunksize=1))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def queue_status(directory):
+    """Returns a dict with the number of shards n_shards of the queue in
+    directory, how many are n_done, n_claimed and n_pending, and the number
+    of cases n_cases and finished cases n_cases_done"""
+    meta = _read_meta(directory)
+    done = set(int(name.split('.', 1)[0]) for name in os.listdir(os.path.join(directory, 'results'))
+               if name.endswith('.json'))
+    n_cases_done = sum(len(_shard_cases(meta, shard)) for shard in done)
+    n_pending = n_claimed = 0
+    for name in os.listdir(os.path.join(directory, 'shards')):
+        if name.endswith('.' + _TODO):
+            n_pending += 1
+        elif int(name.split('.', 1)[0]) not in done:
+            n_claimed += 1
+            try:
+                with open(os.path.join(directory, 'shards', name)) as f:
+                    n_cases_done += f.read().count('\n')
+            except IOError:
+                pass
+    return dict(n_shards=meta['n_shards'], n_done=len(done), n_claimed=n_claimed, n_pending=n_pending,
+                n_cases=meta['n_cases'], n_cases_done=n_cases_done)
+
+
+def merge_queue(directory, recorders=()):
+    """Collects the cases of a finished queue in case order, hands them to
+    recorders and returns them. Raises ValueError if some shard is not
+    finished yet."""
+    meta = _read_meta(directory)
+    values = np.load(os.path.join(directory, 'cases.npy'))
+    parameters, outputs = meta['parameters'], meta['outputs']
+    results = os.path.join(directory, 'results')
+    missing = [shard for shard in range(meta['n_shards'])
+               if not os.path.exists(os.path.join(results, '%05d.json' % shard))]
+    if missing:
+        raise ValueError("%d of the %d shards in %s are not finished, first missing is shard %d" %
+                         (len(missing), meta['n_shards'], directory, missing[0]))
+
+    for recorder in recorders:
+        recorder.startup()
+
+    recorded = []
+    try:
+        for shard in range(meta['n_shards']):
+            with open(os.path.join(results, '%05d.json' % shard)) as f:
+                shard_results = json.load(f)
+            for index, (output_values, msg) in zip(_shard_cases(meta, shard), shard_results):
+                case = Case(inputs=zip(parameters, values[index].tolist()),
+                            outputs=zip(outputs, [_restore(value) for value in output_values]), msg=msg)
+                for recorder in recorders:
+                    recorder.record(case)
+                recorded.append(case)
+    finally:
+        for recorder in recorders:
+            recorder.close()
+
+    return recorded
+
+
+def run_sharded(factory, parameters, cases, outputs, directory, recorders=(), n_workers=None, shard_size=64,
+                lease=300.):
+    """Runs a DOE through the work queue in directory and records the results,
+    like run_cases in nreltraining2013.parallel.
+
+    Creates the queue if it does not exist yet, works through it and merges
+    it. Calling this again after an interrupted run resumes it. Raises
+    ValueError if shards claimed by other live processes are still running
+    when this process runs out of work, call merge_queue once they finish.
+    """
+    create_queue(directory, parameters, cases, outputs, shard_size)
+    run_queue(directory, factory, n_workers, lease)
+    return merge_queue(directory, recorders)